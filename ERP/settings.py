@@ -175,4 +175,16 @@ AI_SERVICES = {
     "attendance_event": "http://localhost:5678/webhook-test/attendance/event",
 }
 
-AI_TIMEOUT_SECONDS = 60
\ No newline at end of file
+AI_TIMEOUT_SECONDS = 60
+
+# عدد الـ processes لتوليد الرواتب (1 = serial)
+PAYROLL_WORKERS = 1
+
+# خطوط TrueType اللي بتنضمّ بـ PDF الكشوف (لازم يكون فيها عربي)؛ fonts-dejavu-core
+PAYSLIP_FONTS = {
+    "regular": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "bold": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+}
+
+# أشهر الحضور الأقدم من هيك (ومدفوعة بـ PayrollRun PAID) بتنتقل لـ AttendanceRecordArchive
+ATTENDANCE_ARCHIVE_AFTER_MONTHS = 12
@@ -48,6 +48,14 @@ class IsAdminOrManager(BasePermission):
             and getattr(request.user, "role", None) in ["admin", "manager"]
         )
 
+class IsAdminHROrManager(BasePermission):
+    def has_permission(self, request, view):
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and getattr(request.user, "role", None) in ["admin", "hr", "manager"]
+        )
+
 class IsOwnerOrAdmin(BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated)
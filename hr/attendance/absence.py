@@ -0,0 +1,95 @@
+"""
+إغلاق يوم الحضور: لكل موظف فعّال ما إله سجل بهاليوم منعمل AttendanceRecord صريح
+(ABSENT / ON_LEAVE / HOLIDAY)، لحتى الـ dashboards والملخص اليومي يعدّوا الغياب
+متل الرواتب (اللي بتعتبر اليوم بدون سجل غياب).
+
+لكل شركة: query وحدة (NOT EXISTS) للموظفين بدون سجل + query وحدة لطلبات الإجازة الموافق عليها،
+والكتابة bulk_create على دفعات.
+"""
+from __future__ import annotations
+
+from datetime import date
+
+from django.db import transaction
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.attendance.services import ShiftIndex
+from hr.attendance.summary import rebuild_attendance_summary
+from hr.attendance.workdays import company_working_days
+from hr.employees.models import Employee, EmployeeStatus
+from hr.ess.models import LeaveRequest, LeaveStatus
+
+
+ABSENCE_BATCH_SIZE = 1000
+
+
+def _day_status(company_id: int, day: date) -> str | None:
+    """
+    عطلة رسمية → HOLIDAY للكل، يوم دوام → ABSENT (أو ON_LEAVE)، العطلة الأسبوعية → ولا شي.
+    """
+    workdays = company_working_days(company_id)
+    if workdays.holidays_mask(day, day):
+        return AttendanceStatus.HOLIDAY
+    if workdays.is_working_day(day):
+        return AttendanceStatus.ABSENT
+    return None
+
+
+def generate_absence_records(company, day: date) -> dict:
+    """
+    بيرجع عدد السجلات اللي انعملت لكل حالة. إذا انعاد لنفس اليوم ما بيكرر شي
+    (بس الموظفين اللي لسا ما إلهم سجل، و ignore_conflicts لـ check-in بنفس اللحظة).
+    """
+    counts = {
+        AttendanceStatus.ABSENT.value: 0,
+        AttendanceStatus.ON_LEAVE.value: 0,
+        AttendanceStatus.HOLIDAY.value: 0,
+    }
+    day_status = _day_status(company.id, day)
+    if day_status is None:
+        return counts
+
+    missing = list(
+        Employee.objects
+        .filter(company=company, status=EmployeeStatus.ACTIVE, hire_date__lte=day)
+        .exclude(attendance_records__date=day)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if not missing:
+        return counts
+
+    on_leave = set()
+    if day_status == AttendanceStatus.ABSENT:
+        on_leave = set(
+            LeaveRequest.objects
+            .filter(
+                employee__company=company,
+                status=LeaveStatus.APPROVED,
+                start_date__lte=day,
+                end_date__gte=day,
+            )
+            .values_list("employee_id", flat=True)
+        )
+
+    shifts = ShiftIndex.load(missing, day, day)
+    records = []
+    for employee_id in missing:
+        status = AttendanceStatus.ON_LEAVE if employee_id in on_leave else day_status
+        records.append(
+            AttendanceRecord(
+                employee_id=employee_id,
+                date=day,
+                shift=shifts.shift_for(employee_id, day),
+                status=status,
+            )
+        )
+        counts[status] += 1
+
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_create(records, batch_size=ABSENCE_BATCH_SIZE, ignore_conflicts=True)
+        # مع ignore_conflicts ما منعرف مين انكتب فعلاً، فالملخص بينعاد حسابه لهاليوم (GROUP BY وحدة)
+        rebuild_attendance_summary(company_id=company.id, start=day, end=day)
+    # ما في mark_payroll_dirty: الرواتب أصلاً بتعتبر اليوم بدون سجل غياب، والإجازة والعطلة
+    # بينحسبوا من LeaveRequest والتقويم، فالنتيجة ما بتتغير
+    return counts
@@ -1,5 +1,17 @@
 from django.contrib import admin
-from .models import Shift, EmployeeShiftAssignment, AttendanceRecord
+from .models import (
+    Shift,
+    EmployeeShiftAssignment,
+    AttendanceRecord,
+    CompanyCalendar,
+    CalendarDay,
+    AttendanceOutboxEvent,
+    AttendanceDailySummary,
+    AttendanceRecomputeJob,
+    AttendanceRecordArchive,
+    AttendanceMonthlyRollup,
+)
+from .outbox import requeue_dead_events
 
 
 @admin.register(Shift)
@@ -20,4 +32,81 @@ class EmployeeShiftAssignmentAdmin(admin.ModelAdmin):
 class AttendanceRecordAdmin(admin.ModelAdmin):
     list_display = ("employee", "date", "shift", "status", "check_in", "check_out", "total_hours", "is_overtime")
     list_filter = ("status", "shift", "employee__company")
-    search_fields = ("employee__employee_code", "employee__user__username")
\ No newline at end of file
+    search_fields = ("employee__employee_code", "employee__user__username")
+
+
+@admin.register(CompanyCalendar)
+class CompanyCalendarAdmin(admin.ModelAdmin):
+    list_display = ("company", "weekly_rest_days", "updated_at")
+    search_fields = ("company__code", "company__name")
+
+
+@admin.register(CalendarDay)
+class CalendarDayAdmin(admin.ModelAdmin):
+    list_display = ("company", "date", "day_type", "name")
+    list_filter = ("day_type", "company")
+    search_fields = ("name", "company__code")
+    date_hierarchy = "date"
+
+
+@admin.register(AttendanceOutboxEvent)
+class AttendanceOutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_type", "status", "attempts", "available_at", "created_at", "delivered_at")
+    list_filter = ("status", "event_type")
+    readonly_fields = ("created_at", "delivered_at", "last_error")
+    actions = ["requeue"]
+
+    @admin.action(description="Requeue dead events")
+    def requeue(self, request, queryset):
+        count = requeue_dead_events(queryset)
+        self.message_user(request, f"Requeued {count} event(s).")
+
+
+
+@admin.register(AttendanceDailySummary)
+class AttendanceDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ("company", "department", "date", "total", "present", "absent", "late", "remote", "on_leave", "anomalies")
+    list_filter = ("company",)
+    date_hierarchy = "date"
+
+
+@admin.register(AttendanceRecomputeJob)
+class AttendanceRecomputeJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "shift",
+        "company",
+        "start_date",
+        "end_date",
+        "status",
+        "processed",
+        "total",
+        "changed",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+
+
+@admin.register(AttendanceRecordArchive)
+class AttendanceRecordArchiveAdmin(admin.ModelAdmin):
+    list_display = ("employee", "date", "status", "check_in", "check_out", "total_hours", "archived_at")
+    list_filter = ("status",)
+    date_hierarchy = "date"
+
+
+@admin.register(AttendanceMonthlyRollup)
+class AttendanceMonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "employee",
+        "year",
+        "month",
+        "records",
+        "days_present",
+        "days_late",
+        "days_absent",
+        "total_hours",
+        "overtime_hours",
+        "archived",
+    )
+    list_filter = ("company", "year", "archived")
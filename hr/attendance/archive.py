@@ -0,0 +1,277 @@
+"""
+أرشفة الحضور: الأشهر المسكّرة (PayrollRun PAID للشهر) بينعملّها AttendanceMonthlyRollup
+لكل موظف، واللي أقدم من ATTENDANCE_ARCHIVE_AFTER_MONTHS بتنتقل rows تبعها
+لـ AttendanceRecordArchive، فـ AttendanceRecord بيضل بحجم السنة الأخيرة تقريباً.
+
+AttendanceDailySummary ما بيتأثر (الـ signals بتتجاهل الحذف وقت archiving())، و
+rebuild_attendance_summary بيجمع من AttendanceRecordArchive كمان، فالـ dashboards القديمة بتضل صح.
+
+الـ dashboards التانية (manager/dashboard، manager/ai) بتقرأ AttendanceRecord لآخر 30 يوم بس،
+فما منأرشف شهر بيطلع جوّا LIVE_ATTENDANCE_DAYS مهما كان ATTENDANCE_ARCHIVE_AFTER_MONTHS صغير،
+ومش محتاجين rollup إلا للـ ESS (employee_month_attendance).
+تعديل سجل بشهر مسكّر لسا ما انأرشف بيشيل الـ rollup تبعه (invalidate_monthly_rollups).
+"""
+from __future__ import annotations
+
+import calendar
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from hr.attendance.models import (
+    AttendanceMonthlyRollup,
+    AttendanceRecord,
+    AttendanceRecordArchive,
+    AttendanceStatus,
+)
+from hr.payroll.models import PayrollRun, PayrollRunStatus
+
+
+ARCHIVE_CHUNK_SIZE = 2000
+# أطول نافذة بتقراها الـ dashboards من AttendanceRecord مباشرة (آخر 30 يوم + اليوم)
+LIVE_ATTENDANCE_DAYS = 31
+
+ROLLUP_STATUS_FIELDS = {
+    AttendanceStatus.PRESENT: "days_present",
+    AttendanceStatus.LATE: "days_late",
+    AttendanceStatus.ABSENT: "days_absent",
+    AttendanceStatus.ON_LEAVE: "days_on_leave",
+    AttendanceStatus.REMOTE: "days_remote",
+    AttendanceStatus.HOLIDAY: "days_holiday",
+}
+ROLLUP_SUM_FIELDS = ["total_hours", "overtime_hours", "late_minutes", "early_leave_minutes"]
+ROLLUP_FIELDS = ["records", *ROLLUP_STATUS_FIELDS.values(), *ROLLUP_SUM_FIELDS]
+
+_ARCHIVE_VALUES = [
+    "id",
+    "employee_id",
+    "date",
+    "shift_id",
+    "check_in",
+    "check_out",
+    "status",
+    "total_hours",
+    "late_minutes",
+    "early_leave_minutes",
+    "overtime_hours",
+    "is_overtime",
+    "notes",
+    "created_at",
+]
+
+
+_archiving = ContextVar("attendance_archiving", default=False)
+
+
+class ArchiveMismatch(Exception):
+    """
+    rows بالأرشيف ما بتطابق المصدر (id أو (employee, date) موجودين من قبل بقيم تانية).
+    """
+
+
+def archiving() -> bool:
+    """
+    True جوّا archive_month: حذف السجلات نقل مش حذف، فلا منقّص الملخص ولا منعلّم رواتب dirty.
+    """
+    return _archiving.get()
+
+
+@contextmanager
+def _archiving_records():
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def archive_after_months() -> int:
+    return getattr(settings, "ATTENDANCE_ARCHIVE_AFTER_MONTHS", 12)
+
+
+def month_bounds(year: int, month: int) -> tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _months_before(day: date, months: int) -> tuple[int, int]:
+    index = day.year * 12 + (day.month - 1) - months
+    return index // 12, index % 12 + 1
+
+
+def closed_months(company_id: int) -> list[tuple[int, int]]:
+    """
+    (year, month) اللي إلها PayrollRun PAID، من الأقدم.
+    """
+    return sorted(set(
+        PayrollRun.objects
+        .filter(company_id=company_id, status=PayrollRunStatus.PAID)
+        .values_list("year", "month")
+    ))
+
+
+def build_monthly_rollups(company_id: int, year: int, month: int, archived: bool = False) -> int:
+    """
+    GROUP BY وحدة على AttendanceRecord للشهر → upsert لـ AttendanceMonthlyRollup. بيرجع عدد الموظفين.
+    """
+    start, end = month_bounds(year, month)
+    aggregates = {
+        "records": Count("id"),
+        **{
+            field: Count("id", filter=Q(status=status))
+            for status, field in ROLLUP_STATUS_FIELDS.items()
+        },
+        **{field: Sum(field) for field in ROLLUP_SUM_FIELDS},
+    }
+    rows = (
+        AttendanceRecord.objects
+        .filter(employee__company_id=company_id, date__gte=start, date__lte=end)
+        .order_by()
+        .values("employee_id")
+        .annotate(**aggregates)
+    )
+
+    rollups = []
+    for row in rows:
+        for field in ROLLUP_SUM_FIELDS:
+            row[field] = row[field] or 0
+        rollups.append(AttendanceMonthlyRollup(
+            company_id=company_id,
+            year=year,
+            month=month,
+            archived=archived,
+            **row,
+        ))
+
+    # موظف ما ضل إله rows بالشهر (انحذفوا / انتقل شركة)
+    AttendanceMonthlyRollup.objects.filter(company_id=company_id, year=year, month=month).exclude(
+        employee_id__in=[r.employee_id for r in rollups],
+    ).delete()
+    AttendanceMonthlyRollup.objects.bulk_create(
+        rollups,
+        batch_size=ARCHIVE_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=["employee", "year", "month"],
+        update_fields=[*ROLLUP_FIELDS, "company", "archived", "updated_at"],
+    )
+    return len(rollups)
+
+
+def invalidate_monthly_rollups(keys) -> int:
+    """
+    سجل انعدّل / انحذف بشهر إله rollup لسا مش مؤرشف (السجلات لسا بـ AttendanceRecord):
+    منشيل الـ rollup، فـ employee_month_attendance بيرجع للـ aggregate لحد ما archive_company يبنيه من جديد.
+    keys: (employee_id, date). بيرجع عدد الـ rollups اللي انشالت.
+    """
+    months = {(employee_id, day.year, day.month) for employee_id, day in keys if employee_id and day}
+    if not months or archiving():
+        return 0
+    q = Q()
+    for employee_id, year, month in months:
+        q |= Q(employee_id=employee_id, year=year, month=month)
+    deleted, _ = AttendanceMonthlyRollup.objects.filter(q, archived=False).delete()
+    return deleted
+
+
+def archive_month(company_id: int, year: int, month: int, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> int:
+    """
+    الـ rollup (archived=True) ونقل الـ rows بنفس الـ transaction. بيرجع عدد السجلات اللي انتقلت.
+    """
+    start, end = month_bounds(year, month)
+    records = (
+        AttendanceRecord.objects
+        .filter(employee__company_id=company_id, date__gte=start, date__lte=end)
+        .order_by("pk")
+    )
+
+    moved = 0
+    with transaction.atomic():
+        build_monthly_rollups(company_id, year, month, archived=True)
+        while True:
+            rows = list(records.values(*_ARCHIVE_VALUES)[:chunk_size])
+            if not rows:
+                break
+            AttendanceRecordArchive.objects.bulk_create(
+                [AttendanceRecordArchive(**row) for row in rows],
+                ignore_conflicts=True,
+            )
+            # ignore_conflicts بيسكت عن row ما انكتبت، فمنتأكد إنه كل row بالأرشيف متل المصدر قبل الحذف
+            ids = [row["id"] for row in rows]
+            archived = {
+                row["id"]: row
+                for row in AttendanceRecordArchive.objects.filter(pk__in=ids).values(*_ARCHIVE_VALUES)
+            }
+            mismatched = [row["id"] for row in rows if archived.get(row["id"]) != row]
+            if mismatched:
+                raise ArchiveMismatch(
+                    f"{len(mismatched)} attendance record(s) of {year}-{month:02d} do not match "
+                    f"the archive (ids {mismatched[:10]}); nothing was archived."
+                )
+            with _archiving_records():
+                AttendanceRecord.objects.filter(pk__in=ids).delete()
+            moved += len(rows)
+    return moved
+
+
+def archive_company(company_id: int, today: date, after_months: int | None = None, dry_run: bool = False) -> dict:
+    """
+    rollup لكل شهر مسكّر لسا ما انأرشف، وأرشفة اللي أقدم من after_months.
+    """
+    after_months = archive_after_months() if after_months is None else after_months
+    oldest_live = today - timedelta(days=LIVE_ATTENDANCE_DAYS)
+    cutoff = min(_months_before(today, after_months), (oldest_live.year, oldest_live.month))
+    already_archived = set(
+        AttendanceMonthlyRollup.objects
+        .filter(company_id=company_id, archived=True)
+        .values_list("year", "month")
+        .distinct()
+    )
+
+    result = {"rolled_up": [], "archived": [], "records_moved": 0}
+    for year, month in closed_months(company_id):
+        if (year, month) in already_archived:
+            continue
+        if (year, month) < cutoff:
+            result["archived"].append((year, month))
+            if not dry_run:
+                result["records_moved"] += archive_month(company_id, year, month)
+        else:
+            result["rolled_up"].append((year, month))
+            if not dry_run:
+                build_monthly_rollups(company_id, year, month)
+    return result
+
+
+def employee_month_attendance(employee_id: int, year: int, month: int) -> dict:
+    """
+    للـ ESS: من الـ rollup إذا الشهر مسكّر، وإلا aggregate وحدة على AttendanceRecord.
+    """
+    rollup = (
+        AttendanceMonthlyRollup.objects
+        .filter(employee_id=employee_id, year=year, month=month)
+        .values(*ROLLUP_FIELDS)
+        .first()
+    )
+    if rollup is not None:
+        return rollup
+
+    start, end = month_bounds(year, month)
+    row = (
+        AttendanceRecord.objects
+        .filter(employee_id=employee_id, date__gte=start, date__lte=end)
+        .aggregate(
+            records=Count("id"),
+            **{
+                field: Count("id", filter=Q(status=status))
+                for status, field in ROLLUP_STATUS_FIELDS.items()
+            },
+            **{field: Sum(field) for field in ROLLUP_SUM_FIELDS},
+        )
+    )
+    for field in ROLLUP_SUM_FIELDS:
+        row[field] = row[field] or (Decimal("0.00") if field.endswith("hours") else 0)
+    return row
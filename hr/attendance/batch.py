@@ -0,0 +1,187 @@
+"""
+حساب total_hours / late / early / overtime / status لدفعة سجلات حضور مرة وحدة بـ NumPy،
+بدل AttendanceRecord.fill_derived_fields لكل سجل (datetimes و Decimals لكل row).
+للاستيراد بالجملة ولـ jobs إعادة الحساب.
+
+الأوقات epoch seconds (NaN = فاضي)، والحساب كله integers بالـ microseconds
+مع ROUND_HALF_UP بنفس نقاط التقريب تبع الموديل، فالنتيجة مطابقة لـ save().
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from hr.attendance.models import AttendanceStatus, _local_dt
+
+
+_US_PER_MINUTE = 60 * 1_000_000
+# ساعة × 100 (الـ hundredths) بالـ microseconds
+_US_PER_HUNDREDTH_HOUR = 36_000_000
+_DAY_SECONDS = 24 * 60 * 60
+
+
+def _to_us(seconds) -> tuple[np.ndarray, np.ndarray]:
+    """
+    epoch seconds (float، NaN = فاضي) → (microseconds int64، mask للموجود).
+    """
+    arr = np.asarray(seconds, dtype=np.float64)
+    valid = ~np.isnan(arr)
+    us = np.zeros(arr.shape, dtype=np.int64)
+    us[valid] = np.round(arr[valid] * 1_000_000).astype(np.int64)
+    return us, valid
+
+
+def _hundredths_half_up(us: np.ndarray) -> np.ndarray:
+    """
+    microseconds → ساعات × 100 مقرّبة ROUND_HALF_UP (بعيد عن الصفر متل Decimal).
+    """
+    sign = np.where(us < 0, -1, 1)
+    return sign * ((np.abs(us) + _US_PER_HUNDREDTH_HOUR // 2) // _US_PER_HUNDREDTH_HOUR)
+
+
+@dataclass
+class AttendanceBatchResult:
+    total_hours: np.ndarray           # ساعات × 100
+    late_minutes: np.ndarray
+    early_leave_minutes: np.ndarray
+    overtime_hours: np.ndarray        # ساعات × 100
+    is_overtime: np.ndarray
+    status: np.ndarray
+
+
+def compute_attendance_batch(
+    check_in,
+    check_out,
+    shift_start,
+    shift_end,
+    overnight,
+    allowed_late_minutes,
+    required_hours,
+    status=None,
+) -> AttendanceBatchResult:
+    """
+    كل الـ arguments arrays بنفس الطول (سجل لكل index):
+      check_in / check_out: epoch seconds أو NaN.
+      shift_start / shift_end: epoch seconds لبداية/نهاية الشفت بتاريخ السجل، NaN = بدون شفت.
+      overnight: True → النهاية بتنزاح يوم (متل _scheduled_window).
+      allowed_late_minutes: int، required_hours: ساعات (مثلاً 8.00).
+      status: حالة السجل الحالية (الافتراضي present). present + تأخير → late.
+    """
+    in_us, has_in = _to_us(check_in)
+    out_us, has_out = _to_us(check_out)
+    start_us, has_shift = _to_us(shift_start)
+    end_us, _ = _to_us(shift_end)
+    n = in_us.shape[0]
+
+    end_us = end_us + np.where(np.asarray(overnight, dtype=bool), _DAY_SECONDS * 1_000_000, 0)
+    allowed_us = np.asarray(allowed_late_minutes, dtype=np.int64) * _US_PER_MINUTE
+    required = np.round(np.asarray(required_hours, dtype=np.float64) * 100).astype(np.int64)
+
+    both = has_in & has_out
+    total = np.where(both, _hundredths_half_up(out_us - in_us), 0)
+
+    scheduled = has_shift & has_in
+    late = np.where(scheduled, np.maximum(0, (in_us - start_us - allowed_us) // _US_PER_MINUTE), 0)
+
+    closed = scheduled & has_out
+    early = np.where(closed & (out_us < end_us), np.maximum(0, (end_us - out_us) // _US_PER_MINUTE), 0)
+    overtime = np.where(closed & (out_us > end_us), _hundredths_half_up(out_us - end_us), 0)
+
+    # شغل أكتر من الساعات المطلوبة بيتحسب overtime حتى لو طلع بوقته
+    extra = scheduled & (required > 0) & (total > required)
+    overtime = np.where(extra, np.maximum(overtime, total - required), overtime)
+
+    if status is None:
+        status = np.full(n, AttendanceStatus.PRESENT.value, dtype=object)
+    else:
+        status = np.asarray(status, dtype=object)
+    status = np.where((late > 0) & (status == AttendanceStatus.PRESENT.value), AttendanceStatus.LATE.value, status)
+
+    return AttendanceBatchResult(
+        total_hours=total.astype(np.int64),
+        late_minutes=late.astype(np.int64),
+        early_leave_minutes=early.astype(np.int64),
+        overtime_hours=overtime.astype(np.int64),
+        is_overtime=overtime > 0,
+        status=status,
+    )
+
+
+def _epoch(value) -> float:
+    return value.timestamp() if value is not None else np.nan
+
+
+def compute_records(records) -> AttendanceBatchResult:
+    """
+    بيبني الـ arrays من AttendanceRecords (الشفت لازم يكون محمّل) وبيحسبهم.
+    بداية/نهاية الشفت بتنحسب مرة لكل (تاريخ، وقت) متل _scheduled_window.
+    """
+    records = list(records)
+    n = len(records)
+    check_in = np.full(n, np.nan)
+    check_out = np.full(n, np.nan)
+    shift_start = np.full(n, np.nan)
+    shift_end = np.full(n, np.nan)
+    overnight = np.zeros(n, dtype=bool)
+    allowed = np.zeros(n, dtype=np.int64)
+    required = np.zeros(n, dtype=np.float64)
+    status = np.empty(n, dtype=object)
+
+    local_cache: dict = {}
+
+    def local_epoch(day, t, next_day=False):
+        key = (day, t, next_day)
+        value = local_cache.get(key)
+        if value is None:
+            dt = _local_dt(day, t)
+            if next_day:
+                dt = dt + timedelta(days=1)
+            value = local_cache[key] = dt.timestamp()
+        return value
+
+    for i, rec in enumerate(records):
+        check_in[i] = _epoch(rec.check_in)
+        check_out[i] = _epoch(rec.check_out)
+        status[i] = rec.status
+        shift = rec.shift
+        if shift is None:
+            continue
+        shift_start[i] = local_epoch(rec.date, shift.start_time)
+        if shift.is_overnight:
+            # compute_attendance_batch بيزيد يوم؛ هيك بيطلع نفس (aware + timedelta) حتى مع DST
+            shift_end[i] = local_epoch(rec.date, shift.end_time, next_day=True) - _DAY_SECONDS
+            overnight[i] = True
+        else:
+            shift_end[i] = local_epoch(rec.date, shift.end_time)
+        allowed[i] = int(shift.allowed_late_minutes or 0)
+        required[i] = float(shift.required_daily_hours or 0)
+
+    return compute_attendance_batch(
+        check_in, check_out, shift_start, shift_end, overnight, allowed, required, status=status,
+    )
+
+
+def _hours(value) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+def fill_derived_fields_batch(records) -> list:
+    """
+    نفس AttendanceRecord.fill_derived_fields بس لدفعة سجلات. بيرجع نفس الـ list.
+    """
+    records = list(records)
+    if not records:
+        return records
+
+    result = compute_records(records)
+    for i, rec in enumerate(records):
+        rec.total_hours = _hours(result.total_hours[i])
+        rec.late_minutes = int(result.late_minutes[i])
+        rec.early_leave_minutes = int(result.early_leave_minutes[i])
+        rec.overtime_hours = _hours(result.overtime_hours[i])
+        rec.is_overtime = bool(result.is_overtime[i])
+        rec.status = result.status[i]
+    return records
@@ -0,0 +1,29 @@
+"""
+الـ cache بين الـ requests (bitmaps أيام الدوام، شفت الموظف) بينفع بس إذا كل الـ processes
+بيشوفوا نفس الـ cache: الـ invalidation بالـ version keys (hr/attendance/signals.py) بيزيد
+الـ version بالـ cache تبع الـ process اللي عمل التعديل بس. مع LocMemCache (الافتراضي لما
+ما في CACHES) الـ web workers التانيين و run_payroll_jobs كانوا يضلّوا على البيانات القديمة
+لحد ما يخلص الـ timeout، فبهالحالة ما منستعمل cache أبداً ومنقرأ من الـ DB.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def shared_cache():
+    """
+    الـ default cache إذا مشترك بين الـ processes (redis / memcached / db / file)، وإلا None.
+    """
+    backend = getattr(settings, "CACHES", {}).get(DEFAULT_CACHE_ALIAS, {}).get(
+        "BACKEND", "django.core.cache.backends.locmem.LocMemCache",
+    )
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return None
+    return caches[DEFAULT_CACHE_ALIAS]
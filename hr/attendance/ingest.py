@@ -0,0 +1,386 @@
+"""
+استقبال بصمات بالجملة من أجهزة البصمة / البوابات (NDJSON أو CSV):
+كل سطر (employee_code, timestamp, direction). الموظفين والشفتات والسجلات الموجودة
+بينجابوا بـ queries قليلة، البصمات بتتجمّع لسجل واحد لكل (موظف، يوم)،
+والكتابة upsert على دفعات بدل save() لكل بصمة.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.attendance.services import ShiftIndex
+from hr.attendance.summary import sync_record_summaries
+from hr.employees.models import Employee
+from hr.payroll.services import mark_payroll_dirty_many
+
+try:
+    from hr.attendance.batch import fill_derived_fields_batch
+except ImportError:  # numpy مش منزّل
+    fill_derived_fields_batch = None
+
+
+INGEST_FORMATS = ("ndjson", "csv")
+INGEST_BATCH_SIZE = 1000
+INGEST_ERRORS_LIMIT = 1000
+
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+DIRECTIONS = {
+    "in": DIRECTION_IN,
+    "check_in": DIRECTION_IN,
+    "out": DIRECTION_OUT,
+    "check_out": DIRECTION_OUT,
+}
+
+# بصمة خروج بتنحسب على سجل اليوم اللي قبل (شفت ليلي) إذا الدخول من أقل من هيك
+OVERNIGHT_PAIRING_WINDOW = timedelta(hours=24)
+
+UPSERT_FIELDS = [
+    "shift",
+    "check_in",
+    "check_out",
+    "status",
+    "total_hours",
+    "late_minutes",
+    "early_leave_minutes",
+    "overtime_hours",
+    "is_overtime",
+]
+
+
+@dataclass
+class Punch:
+    line: int
+    employee_code: str
+    timestamp: datetime
+    direction: str
+
+
+@dataclass
+class IngestResult:
+    lines: int = 0
+    accepted: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: list[dict] = field(default_factory=list)
+    errors_count: int = 0
+
+    def error(self, line: int, message: str, employee_code: str | None = None):
+        self.errors_count += 1
+        if len(self.errors) < INGEST_ERRORS_LIMIT:
+            self.errors.append({"line": line, "employee_code": employee_code, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "success": self.errors_count == 0,
+            "lines": self.lines,
+            "accepted": self.accepted,
+            "records_created": self.created,
+            "records_updated": self.updated,
+            "errors_count": self.errors_count,
+            "errors": self.errors,
+        }
+
+
+def _parse_punch(line: int, data) -> Punch:
+    if not isinstance(data, dict):
+        raise ValueError("Expected an object with employee_code, timestamp and direction.")
+
+    code = str(data.get("employee_code") or "").strip()
+    if not code:
+        raise ValueError("employee_code is required.")
+
+    direction = DIRECTIONS.get(str(data.get("direction") or "").strip().lower())
+    if direction is None:
+        raise ValueError("direction must be 'in' or 'out'.")
+
+    raw_ts = str(data.get("timestamp") or "").strip()
+    try:
+        ts = parse_datetime(raw_ts)
+    except ValueError:
+        ts = None
+    if ts is None:
+        raise ValueError("timestamp must be an ISO 8601 datetime.")
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts, timezone.get_current_timezone())
+
+    return Punch(line=line, employee_code=code, timestamp=ts, direction=direction)
+
+
+def iter_ndjson(lines):
+    """
+    lines: iterable of str/bytes → (line_no, data | None, error | None)
+    """
+    for n, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8-sig" if n == 1 else "utf-8")
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            yield n, json.loads(raw), None
+        except json.JSONDecodeError as e:
+            yield n, None, f"Invalid JSON: {e.msg}."
+
+
+def iter_csv_rows(lines):
+    """
+    أول سطر headers (employee_code,timestamp,direction). رقم السطر بيشمل الـ header.
+    """
+    def text_lines():
+        for n, raw in enumerate(lines, start=1):
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8-sig" if n == 1 else "utf-8")
+            yield raw
+
+    reader = csv.DictReader(text_lines())
+    for row in reader:
+        if not any((v or "").strip() for v in row.values() if isinstance(v, str)):
+            continue
+        yield reader.line_num, row, None
+
+
+def parse_punches(lines, file_format: str, result: IngestResult) -> list[Punch]:
+    if file_format not in INGEST_FORMATS:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    rows = iter_csv_rows(lines) if file_format == "csv" else iter_ndjson(lines)
+    punches = []
+    for n, data, error in rows:
+        result.lines += 1
+        if error:
+            result.error(n, error)
+            continue
+        try:
+            punches.append(_parse_punch(n, data))
+        except ValueError as e:
+            code = data.get("employee_code") if isinstance(data, dict) else None
+            result.error(n, str(e), code)
+    return punches
+
+
+@dataclass
+class _DayRecord:
+    record: AttendanceRecord
+    lines: list[int] = field(default_factory=list)
+    touched: bool = False
+
+
+def _pair_punches(
+    employee: Employee,
+    punches: list[Punch],
+    days: dict[date, _DayRecord],
+    shifts: ShiftIndex,
+    result: IngestResult,
+) -> None:
+    """
+    بيطبّق بصمات موظف (مرتبة حسب الوقت) على سجلاته اليومية: أول دخول وآخر خروج،
+    والخروج بعد نص الليل بيروح لسجل امبارح إذا دخوله لسا مفتوح أو شفته ليلي.
+    """
+    for punch in punches:
+        local_day = timezone.localtime(punch.timestamp).date()
+
+        if punch.direction == DIRECTION_IN:
+            day = days.get(local_day)
+            if day is None:
+                day = days[local_day] = _DayRecord(
+                    AttendanceRecord(
+                        employee=employee,
+                        date=local_day,
+                        shift=shifts.shift_for(employee.id, local_day),
+                        status=AttendanceStatus.PRESENT,
+                    )
+                )
+            rec = day.record
+            if rec.check_in is None or punch.timestamp < rec.check_in:
+                rec.check_in = punch.timestamp
+            rec.status = AttendanceStatus.PRESENT
+            day.lines.append(punch.line)
+            day.touched = True
+            continue
+
+        target = None
+        for candidate in (local_day, local_day - timedelta(days=1)):
+            day = days.get(candidate)
+            if day is None or day.record.check_in is None or day.record.check_in >= punch.timestamp:
+                continue
+            if candidate != local_day:
+                if punch.timestamp - day.record.check_in > OVERNIGHT_PAIRING_WINDOW:
+                    continue
+                overnight = day.record.shift is not None and day.record.shift.is_overnight
+                if day.record.check_out is not None and not overnight:
+                    continue
+            target = day
+            break
+
+        if target is None:
+            result.error(punch.line, "No check-in found before this check-out.", punch.employee_code)
+            continue
+
+        rec = target.record
+        if rec.check_out is None or punch.timestamp > rec.check_out:
+            rec.check_out = punch.timestamp
+        target.lines.append(punch.line)
+        target.touched = True
+
+
+def _claim_concurrent_rows(new_records: list[AttendanceRecord]) -> list[AttendanceRecord]:
+    """
+    check-in عادي ممكن يعمل السجل بعد الـ select_for_update تبع الدفعة (ما كان في row يتقفل).
+    منقرا هالـ rows (مع lock) ومنحوّل سجلاتنا لـ update عليها: الدخول الأبكر والخروج الأخير،
+    و _summary_state تبعها لحتى sync_record_summaries يطرح مساهمتها بدل ما ينحسب السجل مرتين.
+    بيرجع السجلات اللي صارت update.
+    """
+    if not new_records:
+        return []
+    concurrent = {
+        (row.employee_id, row.date): row
+        for row in (
+            AttendanceRecord.objects
+            .select_for_update(of=("self",))
+            .filter(
+                employee_id__in={rec.employee_id for rec in new_records},
+                date__in={rec.date for rec in new_records},
+            )
+            .order_by()
+        )
+    }
+    claimed = []
+    for rec in new_records:
+        row = concurrent.get((rec.employee_id, rec.date))
+        if row is None:
+            continue
+        rec.pk = row.pk
+        rec._state.adding = False
+        rec._summary_state = row.summary_state()
+        if row.check_in is not None and (rec.check_in is None or row.check_in < rec.check_in):
+            rec.check_in = row.check_in
+        if row.check_out is not None and (rec.check_out is None or row.check_out > rec.check_out):
+            rec.check_out = row.check_out
+        claimed.append(rec)
+    return claimed
+
+
+def _ingest_chunk(employees: dict[int, Employee], punches: dict[int, list[Punch]], result: IngestResult):
+    all_days = [timezone.localtime(p.timestamp).date() for items in punches.values() for p in items]
+    start = min(all_days) - timedelta(days=1)
+    end = max(all_days)
+
+    with transaction.atomic():
+        existing: dict[int, dict[date, _DayRecord]] = {employee_id: {} for employee_id in punches}
+        for rec in (
+            AttendanceRecord.objects
+            .select_for_update(of=("self",))
+            .filter(employee_id__in=list(punches), date__gte=start, date__lte=end)
+            .select_related("shift")
+            .order_by()
+        ):
+            existing[rec.employee_id][rec.date] = _DayRecord(rec)
+
+        shifts = ShiftIndex.load(list(punches), start, end)
+        for employee_id, items in punches.items():
+            items.sort(key=lambda p: p.timestamp)
+            _pair_punches(employees[employee_id], items, existing[employee_id], shifts, result)
+
+        new_records = []
+        changed_records = []
+        dirty: dict[int, tuple[date, date]] = {}
+        for employee_id, days in existing.items():
+            for day in days.values():
+                if not day.touched:
+                    continue
+                rec = day.record
+                if rec.shift_id is None:
+                    rec.shift = shifts.shift_for(employee_id, rec.date)
+                try:
+                    rec.clean()
+                except ValidationError as e:
+                    message = " ".join(e.messages)
+                    for line in day.lines:
+                        result.error(line, message, employees[employee_id].employee_code)
+                    continue
+
+                (new_records if rec.pk is None else changed_records).append(rec)
+                result.accepted += len(day.lines)
+
+                lo, hi = dirty.get(employee_id, (rec.date, rec.date))
+                dirty[employee_id] = (min(lo, rec.date), max(hi, rec.date))
+
+        claimed = _claim_concurrent_rows(new_records)
+        if claimed:
+            new_records = [rec for rec in new_records if rec.pk is None]
+            changed_records += claimed
+
+        for records in (new_records, changed_records):
+            if fill_derived_fields_batch is not None:
+                fill_derived_fields_batch(records)
+            else:
+                for rec in records:
+                    rec.fill_derived_fields()
+
+        # update_conflicts لسجل انعمل بين _claim_concurrent_rows والـ INSERT (نافذة صغيرة)
+        AttendanceRecord.objects.bulk_create(
+            new_records,
+            batch_size=INGEST_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["employee", "date"],
+            update_fields=UPSERT_FIELDS,
+        )
+        AttendanceRecord.objects.bulk_update(changed_records, UPSERT_FIELDS, batch_size=INGEST_BATCH_SIZE)
+        result.created += len(new_records)
+        result.updated += len(changed_records)
+
+        # bulk_create ما بيبعت post_save، فالملخص اليومي وعلامات الرواتب منحطهم هون
+        sync_record_summaries(new_records + changed_records)
+        mark_payroll_dirty_many(dirty, reason="attendancerecord:ingested")
+
+
+def ingest_punches(company, lines, file_format: str = "ndjson") -> IngestResult:
+    """
+    lines: iterable of str/bytes (سطر لكل بصمة). بيرجع IngestResult فيه الأخطاء لكل سطر.
+    """
+    result = IngestResult()
+    punches = parse_punches(lines, file_format, result)
+    if not punches:
+        return result
+
+    codes = {p.employee_code for p in punches}
+    employees_by_code = {
+        emp.employee_code: emp
+        for emp in Employee.objects.filter(company=company, employee_code__in=codes)
+    }
+
+    by_employee: dict[int, list[Punch]] = {}
+    for punch in punches:
+        emp = employees_by_code.get(punch.employee_code)
+        if emp is None:
+            result.error(punch.line, "Employee not found in your company.", punch.employee_code)
+            continue
+        by_employee.setdefault(emp.id, []).append(punch)
+
+    employees = {emp.id: emp for emp in employees_by_code.values()}
+
+    # دفعات حسب عدد البصمات، والموظف الواحد ما بينقسم على دفعتين
+    chunk: dict[int, list[Punch]] = {}
+    size = 0
+    for employee_id in sorted(by_employee):
+        chunk[employee_id] = by_employee[employee_id]
+        size += len(by_employee[employee_id])
+        if size >= INGEST_BATCH_SIZE:
+            _ingest_chunk(employees, chunk, result)
+            chunk = {}
+            size = 0
+    if chunk:
+        _ingest_chunk(employees, chunk, result)
+
+    result.errors.sort(key=lambda e: e["line"])
+    return result
@@ -0,0 +1,151 @@
+"""
+Load test لمسار check-in / check-out: شركة synthetic جوّا transaction (rollback بالآخر)،
+وبصمات بتوصل بمعدّل ثابت (open loop، الافتراضي 2000 بالدقيقة متل ذروة الصبح).
+الـ latency = وقت انتهاء الطلب - وقت وصوله المفترض، فإذا السيرفر أبطأ من المعدّل
+الانتظار بيبيّن بالـ p99. جزء من الطلبات بينعاد بنفس الـ Idempotency-Key (retry من الموبايل).
+"""
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from typing import Callable
+
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from hr.employees.models import Employee, EmployeeStatus
+from hr.payroll.benchmarks import _git_commit
+from hr.payroll.synthetic import build_synthetic_company
+
+
+DEFAULT_EMPLOYEES = 2000
+DEFAULT_RATE_PER_MINUTE = 2000
+DEFAULT_RETRY_RATIO = 0.05
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    nearest-rank.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _summary(latencies: list[float], service: list[float], statuses: dict, queries: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_minute": round(len(latencies) / elapsed * 60, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies, default=0), 2),
+        },
+        "service_ms": {
+            "p50": round(percentile(service, 50), 2),
+            "p99": round(percentile(service, 99), 2),
+        },
+        "queries_per_request": round(queries / len(latencies), 2) if latencies else 0,
+        "statuses": statuses,
+    }
+
+
+def _burst(client, url: str, punches: list[tuple], rate_per_minute: float) -> dict:
+    """
+    punches: [(user, employee_id, key)] بالترتيب. rate_per_minute=0 → بأسرع ما يمكن.
+    """
+    interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+    latencies = []
+    service = []
+    statuses: dict = {}
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_queries):
+        t0 = time.perf_counter()
+        for i, (user, employee_id, key) in enumerate(punches):
+            now = time.perf_counter()
+            arrival = t0 + i * interval if interval else now
+            if now < arrival:
+                time.sleep(arrival - now)
+
+            client.force_authenticate(user)
+            started = time.perf_counter()
+            response = client.post(url, {"employee_id": employee_id}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+            done = time.perf_counter()
+
+            service.append((done - started) * 1000)
+            latencies.append((done - arrival) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - t0
+
+    return _summary(latencies, service, statuses, queries, elapsed)
+
+
+def run_check_in_load_test(
+    employees: int = DEFAULT_EMPLOYEES,
+    rate_per_minute: float = DEFAULT_RATE_PER_MINUTE,
+    retry_ratio: float = DEFAULT_RETRY_RATIO,
+    seed: int = 0,
+    check_out: bool = True,
+    log: Callable[[str], None] | None = None,
+) -> dict:
+    from rest_framework.test import APIClient
+
+    log = log or (lambda msg: None)
+    rng = random.Random(seed)
+    report = {
+        "created_at": timezone.now().isoformat(),
+        "git_commit": _git_commit(),
+        "database": connection.vendor,
+        "employees": employees,
+        "rate_per_minute": rate_per_minute,
+        "retry_ratio": retry_ratio,
+        "phases": {},
+    }
+
+    with transaction.atomic():
+        t0 = time.perf_counter()
+        synthetic = build_synthetic_company(employees=employees, seed=seed, code=f"LOAD{employees}S{seed}")
+        log(f"seeded {synthetic.employees} employees in {round(time.perf_counter() - t0, 2)}s")
+
+        staff = list(
+            Employee.objects
+            .filter(company=synthetic.company, status=EmployeeStatus.ACTIVE)
+            .select_related("user")
+            .order_by("id")
+        )
+        client = APIClient()
+
+        phases = [("check_in", "attendance-check-in")]
+        if check_out:
+            phases.append(("check_out", "attendance-check-out"))
+
+        for phase, url_name in phases:
+            punches = [(emp.user, emp.id, uuid.uuid4().hex) for emp in staff]
+            rng.shuffle(punches)
+            # retry: نفس الطلب (نفس المفتاح) بعد شوي
+            for punch in rng.sample(punches, int(len(punches) * retry_ratio)):
+                punches.insert(min(len(punches), punches.index(punch) + rng.randint(1, 50)), punch)
+
+            result = _burst(client, reverse(url_name), punches, rate_per_minute)
+            report["phases"][phase] = result
+            log(
+                f"{phase}: {result['requests']} requests, p50 {result['latency_ms']['p50']} ms, "
+                f"p99 {result['latency_ms']['p99']} ms, {result['queries_per_request']} queries/request, "
+                f"statuses {result['statuses']}"
+            )
+
+        transaction.set_rollback(True)
+
+    return report
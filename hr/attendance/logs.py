@@ -0,0 +1,153 @@
+"""
+سجل الحضور (Attendance Logs) لفترة: صفحات بـ keyset cursor على (date, employee_id)
+بدل OFFSET، والتصدير CSV / NDJSON streaming. الـ rows من values() (بدون serializer
+ولا model instances)، فشهر لـ 5k موظف ما بيتحمّل كله بالذاكرة.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.payroll.exports import iter_csv
+
+
+LOG_PAGE_SIZE = 500
+LOG_MAX_PAGE_SIZE = 5000
+LOG_MAX_RANGE_DAYS = 93
+LOG_EXPORT_CHUNK_SIZE = 2000
+
+_VALUES = (
+    "id",
+    "date",
+    "employee_id",
+    "employee__employee_code",
+    "employee__user__first_name",
+    "employee__user__last_name",
+    "employee__user__username",
+    "check_in",
+    "check_out",
+    "total_hours",
+    "status",
+)
+
+EXPORT_HEADERS = [
+    "Date",
+    "Employee code",
+    "Employee name",
+    "Check in",
+    "Check out",
+    "Total hours",
+    "Status",
+]
+
+_STATUS_LABELS = dict(AttendanceStatus.choices)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(day: date, employee_id: int) -> str:
+    raw = f"{day.isoformat()}:{employee_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, employee_id = raw.split(":")
+        return date.fromisoformat(day), int(employee_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor.")
+
+
+def log_queryset(company, start: date, end: date, employee_id=None, status=None):
+    qs = AttendanceRecord.objects.filter(employee__company=company, date__gte=start, date__lte=end)
+    if employee_id is not None:
+        qs = qs.filter(employee_id=employee_id)
+    if status:
+        qs = qs.filter(status=status)
+    return qs.order_by("date", "employee_id").values(*_VALUES)
+
+
+def _local(value):
+    return timezone.localtime(value) if value is not None else None
+
+
+def _full_name(row) -> str:
+    name = f"{row['employee__user__first_name']} {row['employee__user__last_name']}".strip()
+    return name or row["employee__user__username"]
+
+
+def log_row(row) -> dict:
+    """
+    نفس مفاتيح AttendanceRecordSerializer (total_hours نص متل DecimalField تبع الـ serializer).
+    """
+    check_in = _local(row["check_in"])
+    check_out = _local(row["check_out"])
+    return {
+        "id": row["id"],
+        "date": row["date"],
+        "date_label": row["date"].strftime("%b %d, %Y"),
+        "employee": row["employee_id"],
+        "employee_code": row["employee__employee_code"],
+        "employee_name": _full_name(row),
+        "check_in": check_in,
+        "check_in_time": check_in.strftime("%H:%M") if check_in else None,
+        "check_out": check_out,
+        "check_out_time": check_out.strftime("%H:%M") if check_out else None,
+        "total_hours": str(row["total_hours"]),
+        "status": row["status"],
+        "status_label": _STATUS_LABELS.get(row["status"], row["status"]),
+    }
+
+
+def log_page(qs, cursor: str | None = None, limit: int = LOG_PAGE_SIZE) -> tuple[list[dict], str | None]:
+    """
+    صفحة وحدة بعد الـ cursor. بيرجع (rows، cursor الصفحة الجاية أو None).
+    """
+    if cursor:
+        day, employee_id = decode_cursor(cursor)
+        qs = qs.filter(Q(date__gt=day) | Q(date=day, employee_id__gt=employee_id))
+
+    rows = list(qs[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["date"], last["employee_id"])
+    return [log_row(row) for row in rows], next_cursor
+
+
+def _iter_rows(qs):
+    return qs.iterator(chunk_size=LOG_EXPORT_CHUNK_SIZE)
+
+
+def iter_log_csv(qs):
+    def rows():
+        yield EXPORT_HEADERS
+        for row in _iter_rows(qs):
+            check_in = _local(row["check_in"])
+            check_out = _local(row["check_out"])
+            yield [
+                row["date"].isoformat(),
+                row["employee__employee_code"],
+                _full_name(row),
+                check_in.isoformat() if check_in else None,
+                check_out.isoformat() if check_out else None,
+                row["total_hours"],
+                row["status"],
+            ]
+
+    return iter_csv(rows())
+
+
+def iter_log_ndjson(qs):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in _iter_rows(qs):
+        yield encoder.encode(log_row(row)) + "\n"
@@ -5,6 +5,15 @@ from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
 from hr.employees.models import Employee
+from hr.org_structure.models import Company, Department
+
+
+# الجمعة (0 = الاثنين ... 6 = الأحد)
+DEFAULT_WEEKLY_REST_DAYS = [4]
+
+
+def default_weekly_rest_days():
+    return list(DEFAULT_WEEKLY_REST_DAYS)
 
 
 class Shift(models.Model):
@@ -77,6 +86,9 @@ def _local_dt(day, t):
     return timezone.make_aware(naive, timezone.get_current_timezone())
 
 
+SUMMARY_STATE_FIELDS = {"employee_id", "date", "status", "late_minutes", "early_leave_minutes", "is_overtime"}
+
+
 class AttendanceRecord(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="attendance_records")
     date = models.DateField()
@@ -109,17 +121,44 @@ class AttendanceRecord(models.Model):
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Idempotency-Key تبع الـ client لآخر check-in / check-out (retry بنفس المفتاح = نفس الجواب)
+    check_in_key = models.CharField(max_length=64, blank=True, default="")
+    check_out_key = models.CharField(max_length=64, blank=True, default="")
+
     class Meta:
         unique_together = (("employee", "date"),)
         ordering = ["-date", "employee__employee_code"]
         indexes = [
-            models.Index(fields=["date"]),
+            # keyset على (date, employee_id) بسجل الحضور (hr/attendance/logs.py)
+            models.Index(fields=["date", "employee"]),
             models.Index(fields=["employee", "date"]),
         ]
 
     def __str__(self):
         return f"{self.employee.employee_code} - {self.date} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الحالة زي ما هي بالـ DB، لحتى AttendanceDailySummary يتعدل بالفرق وقت الحفظ/الحذف
+        if SUMMARY_STATE_FIELDS.issubset(field_names):
+            instance._summary_state = instance.summary_state()
+        return instance
+
+    def is_anomaly(self) -> bool:
+        return bool(
+            self.status == AttendanceStatus.ABSENT
+            or self.late_minutes
+            or self.early_leave_minutes
+            or self.is_overtime
+        )
+
+    def summary_state(self):
+        """
+        (employee_id, date, status, anomaly): كل اللي بيأثر على AttendanceDailySummary.
+        """
+        return (self.employee_id, self.date, self.status, self.is_anomaly())
+
     def clean(self):
         if self.check_out and not self.check_in:
             raise ValidationError("لا يمكن تسجيل وقت الخروج بدون وقت الدخول.")
@@ -187,9 +226,10 @@ class AttendanceRecord(models.Model):
 
         return late_minutes, early_minutes, overtime_hours
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-
+    def fill_derived_fields(self):
+        """
+        total_hours / late / early / overtime من check_in و check_out والشفت (بدون DB).
+        """
         self.total_hours = self.calculate_total_hours()
         late_m, early_m, ot_h = self.calculate_late_early_overtime()
 
@@ -199,4 +239,273 @@ class AttendanceRecord(models.Model):
 
         self.is_overtime = bool(self.overtime_hours and self.overtime_hours > Decimal("0.00"))
 
-        super().save(*args, **kwargs)
\ No newline at end of file
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        self.fill_derived_fields()
+        super().save(*args, **kwargs)
+
+
+class CompanyCalendar(models.Model):
+    """
+    تقويم الدوام لشركة: أيام العطلة الأسبوعية. العطل الرسمية وأيام الدوام الاستثنائية بـ CalendarDay.
+    إذا ما في تقويم للشركة منستعمل DEFAULT_WEEKLY_REST_DAYS.
+    """
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, related_name="work_calendar")
+    weekly_rest_days = models.JSONField(
+        default=default_weekly_rest_days,
+        help_text="أيام العطلة الأسبوعية كأرقام (0 = الاثنين ... 6 = الأحد).",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        days = self.weekly_rest_days
+        if not isinstance(days, list) or any(not isinstance(d, int) or not 0 <= d <= 6 for d in days):
+            raise ValidationError("أيام العطلة الأسبوعية لازم تكون أرقام من 0 لـ 6.")
+
+    def __str__(self):
+        return f"{self.company.code} calendar"
+
+
+class CalendarDayType(models.TextChoices):
+    PUBLIC_HOLIDAY = "public_holiday", "Public Holiday"
+    WORKING_DAY = "working_day", "Special Working Day"
+
+
+class CalendarDay(models.Model):
+    """
+    استثناء على التقويم الأسبوعي: عطلة رسمية بيوم دوام، أو يوم دوام بيوم عطلة أسبوعية.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="calendar_days")
+    date = models.DateField()
+    day_type = models.CharField(
+        max_length=20,
+        choices=CalendarDayType.choices,
+        default=CalendarDayType.PUBLIC_HOLIDAY,
+    )
+    name = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        unique_together = (("company", "date"),)
+        ordering = ["company", "date"]
+
+    def __str__(self):
+        return f"{self.company.code} {self.date} ({self.day_type})"
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    DELIVERED = "delivered", "Delivered"
+    DEAD = "dead", "Dead"
+
+
+class AttendanceOutboxEvent(models.Model):
+    """
+    حدث حضور (check-in / check-out) لازم يوصل لخدمة الـ AI. بينكتب بنفس transaction الحضور،
+    والـ dispatcher (manage.py dispatch_attendance_events) بيبعته برا الـ request مع retry.
+    بعد OUTBOX_MAX_ATTEMPTS محاولات فاشلة بيصير dead وبيضل بالجدول للمراجعة.
+    """
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(
+        max_length=20,
+        choices=OutboxStatus.choices,
+        default=OutboxStatus.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="أول وقت مسموح فيه نحاول نبعته.")
+    claimed_by = models.CharField(max_length=64, blank=True, default="")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id} ({self.status})"
+
+
+class AttendanceDailySummary(models.Model):
+    """
+    عدّادات الحضور لكل (شركة، قسم، يوم). بتتحدّث بالفرق مع كل تعديل على AttendanceRecord
+    (hr/attendance/summary.py)، وبتنعاد من الصفر بـ manage.py rebuild_attendance_summary.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="attendance_summaries")
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="attendance_summaries",
+    )
+    date = models.DateField()
+
+    total = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    remote = models.IntegerField(default=0)
+    on_leave = models.IntegerField(default=0)
+    holiday = models.IntegerField(default=0)
+    # غياب أو تأخير أو خروج بكير أو overtime (نفس تعريف تنبيه الـ dashboard)
+    anomalies = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["-date", "company", "department"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company", "department", "date"],
+                name="attendance_summary_unique_department_day",
+            ),
+            # NULL ما بيتساوى بالـ unique العادي، فالموظفين بدون قسم إلهم constraint لحالهم
+            models.UniqueConstraint(
+                fields=["company", "date"],
+                condition=models.Q(department__isnull=True),
+                name="attendance_summary_unique_company_day_no_department",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["company", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.company.code} {self.date} ({self.department_id or '-'})"
+
+
+
+class RecomputeJobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+
+
+class AttendanceRecomputeJob(models.Model):
+    """
+    إعادة حساب الحقول المحسوبة لسجلات الحضور (بعد تعديل Shift، أو لشركة/فترة عند الطلب).
+    تعديل الشفت بيعمل job هون، والـ worker (manage.py run_attendance_jobs) بينفذ على دفعات.
+    """
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="recompute_jobs",
+    )
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="attendance_recompute_jobs",
+    )
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+
+    status = models.CharField(
+        max_length=20,
+        choices=RecomputeJobStatus.choices,
+        default=RecomputeJobStatus.QUEUED,
+    )
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    changed = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            # تعديلات ورا بعض على نفس الشفت قبل ما يبلّش الـ worker = job وحدة
+            models.UniqueConstraint(
+                fields=["shift"],
+                condition=models.Q(status=RecomputeJobStatus.QUEUED),
+                name="attendance_recompute_one_queued_per_shift",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        target = f"shift {self.shift_id}" if self.shift_id else f"company {self.company_id}"
+        return f"Recompute #{self.id} {target} ({self.status})"
+
+
+class AttendanceRecordArchive(models.Model):
+    """
+    سجلات حضور لأشهر مسكّرة (PayrollRun PAID) وأقدم من ATTENDANCE_ARCHIVE_AFTER_MONTHS،
+    منقولة من AttendanceRecord بنفس الـ id (manage.py archive_attendance).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="archived_attendance_records")
+    date = models.DateField()
+    shift = models.ForeignKey(Shift, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    check_in = models.DateTimeField(null=True, blank=True)
+    check_out = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=AttendanceStatus.choices)
+
+    total_hours = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal("0.00"))
+    late_minutes = models.PositiveIntegerField(default=0)
+    early_leave_minutes = models.PositiveIntegerField(default=0)
+    overtime_hours = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal("0.00"))
+    is_overtime = models.BooleanField(default=False)
+
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (("employee", "date"),)
+        ordering = ["-date", "employee__employee_code"]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.date} ({self.status}, archived)"
+
+
+class AttendanceMonthlyRollup(models.Model):
+    """
+    مجاميع الحضور لكل موظف بالشهر (للـ ESS والـ dashboards بدل الـ rows)،
+    لكل شهر مسكّر بـ PayrollRun PAID. archived = الـ rows انتقلت لـ AttendanceRecordArchive.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="attendance_rollups")
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="attendance_rollups")
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+
+    records = models.PositiveIntegerField(default=0)
+    days_present = models.PositiveIntegerField(default=0)
+    days_late = models.PositiveIntegerField(default=0)
+    days_absent = models.PositiveIntegerField(default=0)
+    days_on_leave = models.PositiveIntegerField(default=0)
+    days_remote = models.PositiveIntegerField(default=0)
+    days_holiday = models.PositiveIntegerField(default=0)
+
+    total_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    late_minutes = models.PositiveIntegerField(default=0)
+    early_leave_minutes = models.PositiveIntegerField(default=0)
+
+    archived = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("employee", "year", "month"),)
+        ordering = ["-year", "-month"]
+        indexes = [
+            models.Index(fields=["company", "year", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.year}-{self.month:02d}"
@@ -0,0 +1,171 @@
+"""
+Transactional outbox لأحداث الحضور: check-in / check-out بيكتبوا AttendanceOutboxEvent
+بنفس الـ transaction (بدون أي HTTP جوّا الـ lock)، والـ dispatcher بياخد دفعات ويبعتها
+لـ AI_SERVICES["attendance_event"] مع retry و exponential backoff و dead-letter.
+
+الـ claim بـ UPDATE مشروط (متل claim_next_job) مع lease، فبينفع أكتر من dispatcher بنفس الوقت،
+والحدث اللي dispatcher مات وهو عم يبعته بيرجع ينبعت بعد ما يخلص الـ lease (at-least-once).
+"""
+from __future__ import annotations
+
+import random
+import uuid
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from hr.attendance.models import AttendanceOutboxEvent, OutboxStatus
+
+
+OUTBOX_SERVICE_NAME = "attendance_event"
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_TIMEOUT_SECONDS = 5
+# فوق أسوأ وقت لإرسال دفعة (limit × timeout)
+OUTBOX_LEASE_MARGIN_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE_SECONDS = 5
+OUTBOX_BACKOFF_MAX_SECONDS = 60 * 60
+
+
+def enqueue_attendance_event(event_type: str, payload: dict) -> AttendanceOutboxEvent:
+    """
+    لازم تنادى جوّا الـ transaction تبع التعديل، فالحدث بينحفظ (أو بيرجع rollback) معه.
+    """
+    return AttendanceOutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+
+def outbox_endpoint() -> str | None:
+    return getattr(settings, "AI_SERVICES", {}).get(OUTBOX_SERVICE_NAME)
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """
+    base × 2^(attempts-1) مع سقف، + jitter لحد 20% لحتى ما يرجعوا كلهم بنفس اللحظة.
+    """
+    seconds = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=seconds * (1 + random.random() * 0.2))
+
+
+def _due(now):
+    return (
+        Q(status=OutboxStatus.PENDING, available_at__lte=now)
+        & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+    )
+
+
+def claim_outbox_batch(limit: int = OUTBOX_BATCH_SIZE, worker_id: str | None = None) -> list[AttendanceOutboxEvent]:
+    worker_id = worker_id or uuid.uuid4().hex
+    now = timezone.now()
+
+    ids = list(
+        AttendanceOutboxEvent.objects
+        .filter(_due(now))
+        .order_by("available_at", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    if not ids:
+        return []
+
+    # dispatcher تاني ممكن ياخد قسم منهم بنفس اللحظة: الشرط بالـ UPDATE بيضمن كل حدث لواحد بس
+    AttendanceOutboxEvent.objects.filter(_due(now), id__in=ids).update(
+        claimed_by=worker_id,
+        claimed_until=now + timedelta(seconds=limit * OUTBOX_TIMEOUT_SECONDS + OUTBOX_LEASE_MARGIN_SECONDS),
+    )
+    return list(
+        AttendanceOutboxEvent.objects
+        .filter(id__in=ids, claimed_by=worker_id, status=OutboxStatus.PENDING)
+        .order_by("id")
+    )
+
+
+def _send(session, url: str, event: AttendanceOutboxEvent) -> str | None:
+    """
+    بيرجع None إذا وصل، أو نص الخطأ.
+    """
+    try:
+        response = session.post(url, json=event.payload, timeout=OUTBOX_TIMEOUT_SECONDS)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+
+def dispatch_outbox_batch(
+    limit: int = OUTBOX_BATCH_SIZE,
+    session=None,
+    worker_id: str | None = None,
+) -> dict:
+    """
+    دفعة وحدة: claim → POST لكل حدث (نفس الـ connection) → UPDATE وحدة للي وصلوا
+    و bulk_update للي فشلوا (backoff أو dead).
+    """
+    url = outbox_endpoint()
+    if not url:
+        raise RuntimeError(f"AI service '{OUTBOX_SERVICE_NAME}' is not configured")
+
+    events = claim_outbox_batch(limit, worker_id=worker_id)
+    if not events:
+        return {"claimed": 0, "delivered": 0, "retried": 0, "dead": 0}
+
+    own_session = session is None
+    session = session or requests.Session()
+    delivered = []
+    failed = []
+    try:
+        for event in events:
+            error = _send(session, url, event)
+            if error is None:
+                delivered.append(event.id)
+            else:
+                failed.append((event, error))
+    finally:
+        if own_session:
+            session.close()
+
+    now = timezone.now()
+    if delivered:
+        AttendanceOutboxEvent.objects.filter(id__in=delivered).update(
+            status=OutboxStatus.DELIVERED,
+            attempts=F("attempts") + 1,
+            delivered_at=now,
+            claimed_until=None,
+            last_error="",
+        )
+
+    dead = 0
+    for event, error in failed:
+        event.attempts += 1
+        event.last_error = error[:2000]
+        event.claimed_until = None
+        if event.attempts >= OUTBOX_MAX_ATTEMPTS:
+            event.status = OutboxStatus.DEAD
+            dead += 1
+        else:
+            event.available_at = now + backoff_delay(event.attempts)
+    AttendanceOutboxEvent.objects.bulk_update(
+        [event for event, _ in failed],
+        ["attempts", "last_error", "claimed_until", "status", "available_at"],
+    )
+
+    return {
+        "claimed": len(events),
+        "delivered": len(delivered),
+        "retried": len(failed) - dead,
+        "dead": dead,
+    }
+
+
+def requeue_dead_events(queryset) -> int:
+    """
+    للـ admin: يرجّع أحداث dead للـ queue من أول وجديد.
+    """
+    return queryset.filter(status=OutboxStatus.DEAD).update(
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        available_at=timezone.now(),
+        claimed_by="",
+        claimed_until=None,
+    )
@@ -0,0 +1,281 @@
+"""
+لوحة الحضور المباشرة (SSE): check-in / check-out بينشروا حدث بعد الـ commit على PresenceBroker
+جوّا الـ process، وكل watcher مفتوح إله asyncio.Queue. بصمة وحدة = fan-out واحد لكل
+watchers الشركة، وعدّادات الشركة بتنحسب مرة وحدة بالحدث (من AttendanceDailySummary)
+بدل ما كل مدير يعمل refresh على summary/ كل كم ثانية.
+
+الـ broker بالذاكرة: مع أكتر من process (workers) كل واحد بيشوف بس البصمات اللي مرقت فيه،
+فلازم الـ ASGI يشتغل process واحد أو نستبدل الـ broker بـ pub/sub مشترك.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.attendance.summary import (
+    SUMMARY_COUNTERS,
+    SUMMARY_STATUS_FIELDS,
+    SummaryState,
+    company_day_counts,
+)
+from hr.employees.models import Employee
+
+
+PRESENCE_QUEUE_SIZE = 256
+PRESENCE_HEARTBEAT_SECONDS = 15
+PRESENCE_RETRY_MS = 5000
+
+_EMPLOYEE_VALUES = ["employee_code", "user__first_name", "user__last_name"]
+
+
+class PresenceSubscriber:
+    """
+    employee_ids=None → كل الشركة، وإلا بس هالموظفين (فريق المدير).
+    """
+
+    def __init__(self, company_id: int, employee_ids: set[int] | None = None, loop=None):
+        self.company_id = company_id
+        self.employee_ids = employee_ids
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=PRESENCE_QUEUE_SIZE)
+        self.dropped = 0
+
+    @property
+    def company_wide(self) -> bool:
+        return self.employee_ids is None
+
+    def wants(self, event: dict) -> bool:
+        return self.company_wide or event["employee_id"] in self.employee_ids
+
+    def _push(self, event: dict) -> None:
+        if self.queue.full():
+            # watcher بطيء: منرمي الأقدم بدل ما نوقّف الباقيين (الـ counters بالحدث الجاي بتصحّح)
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._push, event)
+        except RuntimeError:
+            pass  # الـ loop تسكّر، والـ finally تبع الـ stream رح يعمل unsubscribe
+
+
+class PresenceBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[PresenceSubscriber]] = defaultdict(set)
+
+    def subscribe(self, subscriber: PresenceSubscriber) -> None:
+        with self._lock:
+            self._subscribers[subscriber.company_id].add(subscriber)
+
+    def unsubscribe(self, subscriber: PresenceSubscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.company_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.company_id]
+
+    def subscribers(self, company_id: int) -> list[PresenceSubscriber]:
+        with self._lock:
+            return list(self._subscribers.get(company_id, ()))
+
+    def publish(self, company_id: int, event: dict, subscribers=None) -> int:
+        delivered = 0
+        for subscriber in self.subscribers(company_id) if subscribers is None else subscribers:
+            if subscriber.wants(event):
+                subscriber.deliver(event)
+                delivered += 1
+        return delivered
+
+
+broker = PresenceBroker()
+
+
+def _state(state: SummaryState | None) -> dict | None:
+    if state is None:
+        return None
+    _, _, status, anomaly = state
+    return {"status": status, "anomaly": anomaly}
+
+
+def _employee(employee_id: int) -> dict:
+    row = Employee.objects.filter(pk=employee_id).values(*_EMPLOYEE_VALUES).first() or {}
+    return {
+        "id": employee_id,
+        "code": row.get("employee_code"),
+        "name": f"{row.get('user__first_name') or ''} {row.get('user__last_name') or ''}".strip(),
+    }
+
+
+def publish_presence(company_id: int | None, event: str, record: AttendanceRecord, previous: SummaryState | None) -> int:
+    """
+    من on_commit تبع check-in / check-out. إذا ما حدا عم يتفرّج على الشركة ما في ولا query.
+    """
+    if company_id is None:
+        return 0
+    subscribers = broker.subscribers(company_id)
+    if not subscribers:
+        return 0
+
+    payload = {
+        "event": event,
+        "employee_id": record.employee_id,
+        "employee": _employee(record.employee_id),
+        "attendance_id": record.id,
+        "date": record.date.isoformat(),
+        "check_in": record.check_in,
+        "check_out": record.check_out,
+        "previous": _state(previous),
+        "current": _state(record.summary_state()),
+    }
+    if any(s.company_wide for s in subscribers):
+        payload["counters"] = company_day_counts(company_id, record.date)
+    return broker.publish(company_id, payload, subscribers)
+
+
+def team_day_states(employee_ids, day: date) -> dict[int, dict]:
+    """
+    {employee_id: {"status", "anomaly"}} لسجلات الفريق باليوم.
+    """
+    rows = AttendanceRecord.objects.filter(employee_id__in=employee_ids, date=day).values(
+        "employee_id", "status", "late_minutes", "early_leave_minutes", "is_overtime",
+    )
+    return {
+        row["employee_id"]: {
+            "status": row["status"],
+            "anomaly": bool(
+                row["status"] == AttendanceStatus.ABSENT
+                or row["late_minutes"]
+                or row["early_leave_minutes"]
+                or row["is_overtime"]
+            ),
+        }
+        for row in rows
+    }
+
+
+def apply_presence_delta(counters: dict, previous: dict | None, current: dict | None) -> None:
+    """
+    متل _contribution تبع الملخص: -1 للحالة القديمة و +1 للجديدة.
+    """
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is None:
+            continue
+        counters["total"] += sign
+        field = SUMMARY_STATUS_FIELDS.get(state["status"])
+        if field:
+            counters[field] += sign
+        if state["anomaly"]:
+            counters["anomalies"] += sign
+
+
+def team_counters(states: dict[int, dict]) -> dict:
+    counters = dict.fromkeys(SUMMARY_COUNTERS, 0)
+    for state in states.values():
+        apply_presence_delta(counters, None, state)
+    return counters
+
+
+def presence_snapshot(company_id: int, employee_ids: set[int] | None, day: date) -> tuple[dict, dict[int, dict]]:
+    """
+    أول رسالة بالـ stream (العدّادات + مين بصّم دخول اليوم)، وحالة كل موظف بالفريق
+    لحتى iter_presence_events يكمّل عدّادات الفريق محلياً.
+    """
+    records = AttendanceRecord.objects.filter(date=day, check_in__isnull=False)
+    states = {}
+    if employee_ids is None:
+        counters = company_day_counts(company_id, day)
+        records = records.filter(employee__company_id=company_id)
+    else:
+        states = team_day_states(employee_ids, day)
+        counters = team_counters(states)
+        records = records.filter(employee_id__in=employee_ids)
+
+    arrived = [
+        {
+            "employee": {
+                "id": row["employee_id"],
+                "code": row["employee__employee_code"],
+                "name": f"{row['employee__user__first_name'] or ''} {row['employee__user__last_name'] or ''}".strip(),
+            },
+            "attendance_id": row["id"],
+            "check_in": row["check_in"],
+            "check_out": row["check_out"],
+            "status": row["status"],
+        }
+        for row in records.order_by("check_in").values(
+            "id",
+            "employee_id",
+            "check_in",
+            "check_out",
+            "status",
+            *(f"employee__{name}" for name in _EMPLOYEE_VALUES),
+        )
+    ]
+    snapshot = {
+        "date": day.isoformat(),
+        "scope": "company" if employee_ids is None else "team",
+        "counters": counters,
+        "arrived": arrived,
+    }
+    return snapshot, states
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def iter_presence_events(company_id: int, employee_ids: set[int] | None):
+    """
+    الـ stream تبع watcher واحد. منعمل subscribe قبل الـ snapshot لحتى ما تضيع بصمة بيناتهم.
+    عدّادات الفريق منحسبها محلياً من حالة كل موظف (states)، فحدث وصل قبل الـ snapshot
+    وانحسب فيه ما بينعد مرتين. الـ stream بيضل مفتوح لأيام، فمع كل حدث وكل ping منشوف
+    التاريخ المحلي، وإذا تغيّر منبعت snapshot جديد لليوم الجديد.
+    """
+    subscriber = PresenceSubscriber(company_id, employee_ids)
+    broker.subscribe(subscriber)
+    try:
+        day = timezone.localdate()
+        snapshot, states = await sync_to_async(presence_snapshot)(company_id, employee_ids, day)
+        counters = snapshot["counters"]
+        yield f"retry: {PRESENCE_RETRY_MS}\n\n"
+        yield sse_message("snapshot", snapshot)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), PRESENCE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = None
+
+            if timezone.localdate() != day:
+                # بعد نص الليل: الـ snapshot الجديد فيه كمان البصمة اللي وصلت هلق (انعملت قبله)
+                day = timezone.localdate()
+                snapshot, states = await sync_to_async(presence_snapshot)(company_id, employee_ids, day)
+                counters = snapshot["counters"]
+                yield sse_message("snapshot", snapshot)
+
+            if event is None:
+                # comment بيخلّي الـ proxies ما تسكّر الاتصال
+                yield ": ping\n\n"
+                continue
+
+            if not subscriber.company_wide:
+                if event["date"] == snapshot["date"]:
+                    employee_id = event["employee_id"]
+                    apply_presence_delta(counters, states.get(employee_id), event["current"])
+                    states[employee_id] = event["current"]
+                event = {**event, "counters": dict(counters)}
+            yield sse_message(event["event"], event)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,168 @@
+"""
+مسار check-in / check-out تبع الموظف (وقت الذروة الصبح آلاف الطلبات بدقايق):
+- ما في lock على Employee، والشفت من الـ cache المشترك إذا في (cached_shift_for).
+- check-in = INSERT واحد على unique (employee, date)؛ إذا السجل موجود (ABSENT من الـ nightly job
+  أو retry) UPDATE مشروط (check_in IS NULL) بدل select_for_update.
+- الحقول المحسوبة بـ fill_derived_fields بدون full_clean، والملخص اليومي وعلامات الرواتب
+  منحطهم بنفسنا لأن bulk_create / update ما بيبعتوا signals.
+- Idempotency-Key: retry بنفس المفتاح بيرجع نفس الجواب (replayed) بدل "Already checked in".
+- بعد الـ commit منبعت الحدث لـ PresenceBroker (hr/attendance/presence.py) للوحة الحضور المباشرة.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.attendance.outbox import enqueue_attendance_event
+from hr.attendance.presence import publish_presence
+from hr.attendance.services import cached_shift_for
+from hr.attendance.summary import sync_record_summaries
+from hr.payroll.services import mark_payroll_dirty
+
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+DERIVED_FIELDS = [
+    "total_hours",
+    "late_minutes",
+    "early_leave_minutes",
+    "overtime_hours",
+    "is_overtime",
+    "status",
+]
+
+
+class PunchRejected(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@dataclass
+class PunchResult:
+    record: AttendanceRecord
+    replayed: bool = False
+
+
+def _fields(record: AttendanceRecord, names) -> dict:
+    return {name: getattr(record, name) for name in names}
+
+
+def _load(employee_id: int, day) -> AttendanceRecord | None:
+    return AttendanceRecord.objects.select_related("shift").filter(employee_id=employee_id, date=day).first()
+
+
+def _after_write(record: AttendanceRecord, event: str, payload: dict) -> None:
+    previous = getattr(record, "_summary_state", None)
+    sync_record_summaries([record])
+    mark_payroll_dirty(record.employee_id, record.date, record.date, reason=f"attendancerecord:{event}")
+    enqueue_attendance_event(event, payload)
+    # لوحة الحضور المباشرة: بس بعد الـ commit، والـ replay ما بيوصل لهون
+    transaction.on_commit(lambda: publish_presence(payload["company_id"], event, record, previous), robust=True)
+
+
+def record_check_in(employee_id: int, company_id: int | None, key: str = "") -> PunchResult:
+    now = timezone.now()
+    day = timezone.localdate()
+
+    record = AttendanceRecord(
+        employee_id=employee_id,
+        date=day,
+        shift=cached_shift_for(employee_id, day),
+        check_in=now,
+        status=AttendanceStatus.PRESENT,
+        check_in_key=key,
+    )
+    record.fill_derived_fields()
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                AttendanceRecord.objects.bulk_create([record])
+        except IntegrityError:
+            record = _check_in_existing(employee_id, day, now, key, record.shift)
+            if isinstance(record, PunchResult):
+                return record
+
+        _after_write(record, "check_in", {
+            "event": "check_in",
+            "employee_id": employee_id,
+            "attendance_id": record.id,
+            "timestamp": record.check_in.isoformat(),
+            "date": str(record.date),
+            "company_id": company_id,
+        })
+    return PunchResult(record)
+
+
+def _check_in_existing(employee_id: int, day, now, key: str, shift):
+    existing = _load(employee_id, day)
+    if existing is None:
+        # انحذف بين الـ INSERT وهلق
+        raise PunchRejected("Please retry.", status=409)
+
+    if existing.check_in is None:
+        existing.check_in = now
+        existing.check_in_key = key
+        existing.status = AttendanceStatus.PRESENT
+        if existing.shift_id is None:
+            existing.shift = shift
+        existing.fill_derived_fields()
+        updated = (
+            AttendanceRecord.objects
+            .filter(pk=existing.pk, check_in__isnull=True)
+            .update(**_fields(existing, ["check_in", "check_in_key", "shift", *DERIVED_FIELDS]))
+        )
+        if updated:
+            return existing
+        existing = _load(employee_id, day)
+
+    if key and existing.check_in_key == key:
+        return PunchResult(existing, replayed=True)
+    raise PunchRejected("Already checked in today.")
+
+
+def record_check_out(employee_id: int, company_id: int | None, key: str = "") -> PunchResult:
+    now = timezone.now()
+    day = timezone.localdate()
+
+    record = _load(employee_id, day)
+    if record is None or record.check_in is None:
+        raise PunchRejected("No check-in found for today.")
+
+    if record.check_out is not None:
+        if key and record.check_out_key == key:
+            return PunchResult(record, replayed=True)
+        raise PunchRejected("Already checked out today.")
+
+    record.check_out = now
+    record.check_out_key = key
+    record.fill_derived_fields()
+
+    with transaction.atomic():
+        updated = (
+            AttendanceRecord.objects
+            .filter(pk=record.pk, check_out__isnull=True)
+            .update(**_fields(record, ["check_out", "check_out_key", *DERIVED_FIELDS]))
+        )
+        if not updated:
+            # طلب تاني سبقنا
+            current = _load(employee_id, day)
+            if key and current is not None and current.check_out_key == key:
+                return PunchResult(current, replayed=True)
+            raise PunchRejected("Already checked out today.")
+
+        _after_write(record, "check_out", {
+            "event": "check_out",
+            "employee_id": employee_id,
+            "attendance_id": record.id,
+            "timestamp": record.check_out.isoformat(),
+            "date": str(record.date),
+            "total_hours": float(record.total_hours),
+            "company_id": company_id,
+        })
+    return PunchResult(record)
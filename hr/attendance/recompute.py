@@ -0,0 +1,234 @@
+"""
+إعادة حساب total_hours / late / early / overtime / status لسجلات حضور موجودة
+(بعد تعديل Shift، أو لشركة/فترة عند الطلب): دفعات حسب الـ pk، الحساب بالجملة
+(fill_derived_fields_batch إذا numpy موجود) بدون full_clean، والكتابة bulk_update
+للسجلات اللي تغيّرت بس. الملخص اليومي وعلامات الرواتب منحطهم بنفسنا (ما في signals).
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Callable
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from hr.attendance.models import (
+    AttendanceRecomputeJob,
+    AttendanceRecord,
+    AttendanceStatus,
+    RecomputeJobStatus,
+)
+from hr.attendance.summary import sync_record_summaries
+from hr.payroll.services import mark_payroll_dirty_many
+
+try:
+    from hr.attendance.batch import fill_derived_fields_batch
+except ImportError:  # numpy مش منزّل
+    fill_derived_fields_batch = None
+
+
+RECOMPUTE_CHUNK_SIZE = 2000
+
+RECOMPUTE_FIELDS = [
+    "status",
+    "total_hours",
+    "late_minutes",
+    "early_leave_minutes",
+    "overtime_hours",
+    "is_overtime",
+]
+
+# تعديل هدول بيغيّر الحساب
+SHIFT_TIMING_FIELDS = [
+    "start_time",
+    "end_time",
+    "is_overnight",
+    "allowed_late_minutes",
+    "required_daily_hours",
+]
+
+
+def _values(rec: AttendanceRecord) -> tuple:
+    return tuple(getattr(rec, name) for name in RECOMPUTE_FIELDS)
+
+
+def _recompute_chunk(records: list[AttendanceRecord]) -> list[AttendanceRecord]:
+    before = [_values(rec) for rec in records]
+    for rec in records:
+        # LATE جاي من التأخير: منرجعه PRESENT لحتى ينحسب من جديد حسب الشفت الحالي
+        if rec.status == AttendanceStatus.LATE and rec.check_in is not None:
+            rec.status = AttendanceStatus.PRESENT
+
+    if fill_derived_fields_batch is not None:
+        fill_derived_fields_batch(records)
+    else:
+        for rec in records:
+            rec.fill_derived_fields()
+
+    return [rec for rec, old in zip(records, before) if _values(rec) != old]
+
+
+def recompute_attendance_records(
+    shift_id: int | None = None,
+    company_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    chunk_size: int = RECOMPUTE_CHUNK_SIZE,
+    progress: Callable[[int, int, int], None] | None = None,
+) -> dict:
+    """
+    بيرجع {"total", "processed", "changed"}. progress(processed, total, changed) بعد كل دفعة.
+    """
+    qs = AttendanceRecord.objects.all()
+    if shift_id is not None:
+        qs = qs.filter(shift_id=shift_id)
+    if company_id is not None:
+        qs = qs.filter(employee__company_id=company_id)
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+
+    total = qs.count()
+    processed = 0
+    changed = 0
+    last_pk = 0
+
+    while True:
+        with transaction.atomic():
+            records = list(
+                qs
+                .filter(pk__gt=last_pk)
+                .select_related("shift")
+                .select_for_update(of=("self",))
+                .order_by("pk")[:chunk_size]
+            )
+            if not records:
+                break
+            last_pk = records[-1].pk
+
+            dirty = _recompute_chunk(records)
+            if dirty:
+                AttendanceRecord.objects.bulk_update(dirty, RECOMPUTE_FIELDS, batch_size=chunk_size)
+                sync_record_summaries(dirty)
+
+                ranges: dict[int, tuple[date, date]] = {}
+                for rec in dirty:
+                    lo, hi = ranges.get(rec.employee_id, (rec.date, rec.date))
+                    ranges[rec.employee_id] = (min(lo, rec.date), max(hi, rec.date))
+                mark_payroll_dirty_many(ranges, reason="attendancerecord:recomputed")
+
+        processed += len(records)
+        changed += len(dirty)
+        if progress:
+            progress(processed, total, changed)
+
+    return {"total": total, "processed": processed, "changed": changed}
+
+
+def enqueue_shift_recompute(shift_id: int) -> AttendanceRecomputeJob:
+    """
+    إذا في job لنفس الشفت لسا ما بلّشت منرجعها (رح تقرأ القيم الجديدة).
+    """
+    existing = AttendanceRecomputeJob.objects.filter(shift_id=shift_id, status=RecomputeJobStatus.QUEUED).first()
+    if existing:
+        return existing
+    try:
+        with transaction.atomic():
+            return AttendanceRecomputeJob.objects.create(shift_id=shift_id)
+    except IntegrityError:
+        return AttendanceRecomputeJob.objects.get(shift_id=shift_id, status=RecomputeJobStatus.QUEUED)
+
+
+def enqueue_attendance_recompute(
+    company_id: int,
+    start: date | None = None,
+    end: date | None = None,
+) -> AttendanceRecomputeJob:
+    """
+    job لشركة/فترة (بعد تعديل التقويم، أو manage.py recompute_attendance --queue).
+    نفس الشركة والفترة وهي لسا QUEUED = نفس الـ job.
+    """
+    existing = AttendanceRecomputeJob.objects.filter(
+        shift__isnull=True,
+        company_id=company_id,
+        start_date=start,
+        end_date=end,
+        status=RecomputeJobStatus.QUEUED,
+    ).first()
+    if existing:
+        return existing
+    return AttendanceRecomputeJob.objects.create(company_id=company_id, start_date=start, end_date=end)
+
+
+def claim_next_recompute_job() -> AttendanceRecomputeJob | None:
+    """
+    claim بـ UPDATE مشروط متل claim_next_job تبع الرواتب.
+    """
+    while True:
+        job = (
+            AttendanceRecomputeJob.objects
+            .filter(status=RecomputeJobStatus.QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        claimed = AttendanceRecomputeJob.objects.filter(pk=job.pk, status=RecomputeJobStatus.QUEUED).update(
+            status=RecomputeJobStatus.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def fail_stale_recompute_jobs(stale_after: timedelta) -> int:
+    cutoff = timezone.now() - stale_after
+    return AttendanceRecomputeJob.objects.filter(
+        status=RecomputeJobStatus.RUNNING,
+        heartbeat_at__lt=cutoff,
+    ).update(
+        status=RecomputeJobStatus.FAILED,
+        error_message="Worker stopped responding.",
+        finished_at=timezone.now(),
+    )
+
+
+def run_recompute_job(job: AttendanceRecomputeJob) -> AttendanceRecomputeJob:
+    def progress(processed, total, changed):
+        AttendanceRecomputeJob.objects.filter(pk=job.pk).update(
+            processed=processed,
+            total=total,
+            changed=changed,
+            heartbeat_at=timezone.now(),
+        )
+
+    try:
+        result = recompute_attendance_records(
+            shift_id=job.shift_id,
+            company_id=job.company_id,
+            start=job.start_date,
+            end=job.end_date,
+            progress=progress,
+        )
+    except Exception as e:
+        AttendanceRecomputeJob.objects.filter(pk=job.pk).update(
+            status=RecomputeJobStatus.FAILED,
+            error_message=str(e),
+            finished_at=timezone.now(),
+        )
+    else:
+        AttendanceRecomputeJob.objects.filter(pk=job.pk).update(
+            status=RecomputeJobStatus.SUCCEEDED,
+            total=result["total"],
+            processed=result["processed"],
+            changed=result["changed"],
+            finished_at=timezone.now(),
+        )
+
+    job.refresh_from_db()
+    return job
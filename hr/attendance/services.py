@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from django.db.models import QuerySet
+
+from hr.attendance.caching import shared_cache
+from hr.attendance.models import EmployeeShiftAssignment, Shift
+
+
+def _assignment_priority(assign: EmployeeShiftAssignment):
+    # نفس ترتيب order_by("-is_primary", "-start_date")
+    return (not assign.is_primary, -assign.start_date.toordinal())
+
+
+def _build_segments(assignments: list[EmployeeShiftAssignment]):
+    """
+    يحوّل assignments (ممكن تتداخل) لفترات منفصلة ومرتبة:
+    [(start, end, assignment)] بحيث كل يوم إلو assignment وحدة حسب الأولوية.
+    """
+    ranked = sorted(assignments, key=_assignment_priority)
+
+    # ordinals: end_date ممكن يكون date.max (assignment مفتوح) وما في date بعده
+    points = set()
+    for a in ranked:
+        points.add(a.start_date.toordinal())
+        points.add(a.end_date.toordinal() + 1)
+    points = sorted(points)
+
+    segments = []
+    for seg_start, next_start in zip(points, points[1:]):
+        seg_end = next_start - 1
+        winner = next(
+            (a for a in ranked if a.start_date.toordinal() <= seg_start and a.end_date.toordinal() >= seg_end),
+            None,
+        )
+        if winner is None:
+            continue
+        if segments and segments[-1][2] is winner and segments[-1][1].toordinal() + 1 == seg_start:
+            segments[-1] = (segments[-1][0], date.fromordinal(seg_end), winner)
+        else:
+            segments.append((date.fromordinal(seg_start), date.fromordinal(seg_end), winner))
+    return segments
+
+
+class ShiftIndex:
+    """
+    فهرس للشفتات: منحمّل EmployeeShiftAssignment لمجموعة موظفين وفترة بـ query وحدة،
+    ومنجاوب "أي شفت بيوم D" بـ bisect (O(log n)) بدل query لكل يوم.
+    """
+
+    def __init__(self, assignments=()):
+        by_employee: dict[int, list[EmployeeShiftAssignment]] = {}
+        for assign in assignments:
+            by_employee.setdefault(assign.employee_id, []).append(assign)
+
+        self._segments: dict[int, list[tuple[date, date, EmployeeShiftAssignment]]] = {}
+        self._starts: dict[int, list[date]] = {}
+        for employee_id, items in by_employee.items():
+            segments = _build_segments(items)
+            self._segments[employee_id] = segments
+            self._starts[employee_id] = [s[0] for s in segments]
+
+    @classmethod
+    def load(cls, employees, start: date, end: date) -> "ShiftIndex":
+        """
+        employees: QuerySet أو list of Employee أو list of ids.
+        """
+        qs = EmployeeShiftAssignment.objects.filter(start_date__lte=end, end_date__gte=start)
+        if isinstance(employees, QuerySet):
+            qs = qs.filter(employee__in=employees.values("id"))
+        else:
+            ids = [getattr(e, "id", e) for e in employees]
+            qs = qs.filter(employee_id__in=ids)
+        return cls(qs.select_related("shift").order_by())
+
+    def subset(self, employee_ids) -> "ShiftIndex":
+        out = ShiftIndex()
+        for employee_id in employee_ids:
+            if employee_id in self._segments:
+                out._segments[employee_id] = self._segments[employee_id]
+                out._starts[employee_id] = self._starts[employee_id]
+        return out
+
+    def assignment_for(self, employee_id: int, day: date) -> EmployeeShiftAssignment | None:
+        starts = self._starts.get(employee_id)
+        if not starts:
+            return None
+        i = bisect_right(starts, day) - 1
+        if i < 0:
+            return None
+        seg_start, seg_end, assign = self._segments[employee_id][i]
+        return assign if day <= seg_end else None
+
+    def shift_for(self, employee_id: int, day: date) -> Shift | None:
+        assign = self.assignment_for(employee_id, day)
+        return assign.shift if assign else None
+
+    def expand(self, employee_id: int, start: date, end: date) -> list[Shift | None]:
+        """
+        day → shift لكل أيام الفترة: result[(day - start).days]
+        """
+        days = (end - start).days + 1
+        result: list[Shift | None] = [None] * max(days, 0)
+        for seg_start, seg_end, assign in self._segments.get(employee_id, ()):
+            if seg_end < start or seg_start > end:
+                continue
+            lo = (max(seg_start, start) - start).days
+            hi = (min(seg_end, end) - start).days
+            result[lo:hi + 1] = [assign.shift] * (hi - lo + 1)
+        return result
+
+
+def get_employee_shift_for_date(employee, day: date) -> EmployeeShiftAssignment | None:
+    return ShiftIndex.load([employee], day, day).assignment_for(employee.id, day)
+
+
+# ---- cache للشفت (مسار check-in / check-out) ----
+# المفتاح فيه version للموظف (بيزيد مع أي تعديل على EmployeeShiftAssignment تبعه)
+# و version عام للشفتات (بيزيد مع تعديل Shift)، متل hr/attendance/workdays.py.
+# بس مع cache مشترك (hr/attendance/caching.py)، وإلا منقرأ الشفت من الـ DB كل مرة.
+
+SHIFT_CACHE_TIMEOUT = 60 * 60
+_NO_SHIFT = 0
+_SHIFTS_VERSION_KEY = "hr:shifts:version"
+
+
+def _employee_shift_version_key(employee_id) -> str:
+    return f"hr:shift-for:{employee_id}:version"
+
+
+def _bump(key: str) -> None:
+    cache = shared_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_employee_shift(employee_id) -> None:
+    _bump(_employee_shift_version_key(employee_id))
+
+
+def invalidate_shifts() -> None:
+    _bump(_SHIFTS_VERSION_KEY)
+
+
+def cached_shift_for(employee_id: int, day: date) -> Shift | None:
+    """
+    نفس get_employee_shift_for_date(...).shift بس من الـ cache (get_many وحدة لما يكون موجود).
+    """
+    cache = shared_cache()
+    if cache is None:
+        return ShiftIndex.load([employee_id], day, day).shift_for(employee_id, day)
+
+    version_key = _employee_shift_version_key(employee_id)
+    versions = cache.get_many([version_key, _SHIFTS_VERSION_KEY])
+    key = (
+        f"hr:shift-for:{employee_id}:{versions.get(version_key, 0)}:"
+        f"{versions.get(_SHIFTS_VERSION_KEY, 0)}:{day.isoformat()}"
+    )
+
+    value = cache.get(key)
+    if value is None:
+        value = ShiftIndex.load([employee_id], day, day).shift_for(employee_id, day) or _NO_SHIFT
+        cache.set(key, value, SHIFT_CACHE_TIMEOUT)
+    return value or None
@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from hr.attendance.archive import archiving, invalidate_monthly_rollups
+from hr.attendance.models import AttendanceRecord, CalendarDay, CompanyCalendar, EmployeeShiftAssignment, Shift
+from hr.attendance.recompute import SHIFT_TIMING_FIELDS, enqueue_shift_recompute
+from hr.attendance.services import invalidate_employee_shift, invalidate_shifts
+from hr.attendance.summary import apply_state_changes, move_employee_summaries, rebuild_attendance_summary
+from hr.attendance.workdays import invalidate_working_days
+from hr.employees.models import Employee
+from hr.org_structure.models import Department
+
+
+def calendar_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # هلق (لنفس الـ transaction) ومرة تانية بعد الـ commit، لحتى ما يضل بالـ cache
+    # bitmap حدا حسبه من بيانات قديمة قبل ما ينحفظ التعديل
+    company_id = instance.company_id
+    invalidate_working_days(company_id)
+    transaction.on_commit(lambda: invalidate_working_days(company_id))
+
+
+for _model in (CompanyCalendar, CalendarDay):
+    post_save.connect(calendar_changed, sender=_model, dispatch_uid=f"workdays_saved_{_model.__name__}")
+    post_delete.connect(calendar_changed, sender=_model, dispatch_uid=f"workdays_deleted_{_model.__name__}")
+
+
+def shift_assignment_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    employee_id = instance.employee_id
+    invalidate_employee_shift(employee_id)
+    transaction.on_commit(lambda: invalidate_employee_shift(employee_id))
+
+
+def shift_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_shifts()
+    transaction.on_commit(invalidate_shifts)
+
+
+def shift_pre_save(sender, instance, raw=False, **kwargs):
+    instance._timing_changed = False
+    if raw or instance.pk is None:
+        return
+    old = Shift.objects.filter(pk=instance.pk).values(*SHIFT_TIMING_FIELDS).first()
+    instance._timing_changed = old is not None and any(
+        old[name] != getattr(instance, name) for name in SHIFT_TIMING_FIELDS
+    )
+
+
+def shift_timing_saved(sender, instance, created=False, raw=False, **kwargs):
+    # السجلات القديمة عليها late / overtime / status محسوبين بالأوقات القديمة
+    if raw or created or not getattr(instance, "_timing_changed", False):
+        return
+    shift_id = instance.pk
+    transaction.on_commit(lambda: enqueue_shift_recompute(shift_id))
+
+
+pre_save.connect(shift_pre_save, sender=Shift, dispatch_uid="shift_recompute_pre_save")
+post_save.connect(shift_timing_saved, sender=Shift, dispatch_uid="shift_recompute_saved")
+post_save.connect(shift_assignment_changed, sender=EmployeeShiftAssignment, dispatch_uid="shift_cache_assignment_saved")
+post_delete.connect(shift_assignment_changed, sender=EmployeeShiftAssignment, dispatch_uid="shift_cache_assignment_deleted")
+post_save.connect(shift_changed, sender=Shift, dispatch_uid="shift_cache_shift_saved")
+post_delete.connect(shift_changed, sender=Shift, dispatch_uid="shift_cache_shift_deleted")
+
+
+# ---- AttendanceDailySummary ----
+
+def attendance_record_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.pk is None:
+        instance._summary_old = None
+        return
+    state = getattr(instance, "_summary_state", None)
+    if state is None:
+        # ما انجاب من الـ DB بـ query عادية (أو ناقصه حقول): منجيب القيم القديمة
+        old = (
+            AttendanceRecord.objects
+            .filter(pk=instance.pk)
+            .only("employee_id", "date", "status", "late_minutes", "early_leave_minutes", "is_overtime")
+            .first()
+        )
+        state = old.summary_state() if old else None
+    instance._summary_old = state
+
+
+def attendance_record_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, "_summary_old", None)
+    new = instance.summary_state()
+    apply_state_changes([(old, new)])
+    invalidate_monthly_rollups([state[:2] for state in (old, new) if state])
+    instance._summary_state = new
+
+
+def attendance_record_deleted(sender, instance, **kwargs):
+    # نقل للأرشيف: السجل لسا محسوب بالملخص
+    if archiving():
+        return
+    old = getattr(instance, "_summary_state", None) or instance.summary_state()
+    apply_state_changes([(old, None)])
+    invalidate_monthly_rollups([old[:2]])
+
+
+def employee_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._summary_placement = (
+        Employee.objects.filter(pk=instance.pk).values_list("company_id", "department_id").first()
+    )
+
+
+def employee_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    old = getattr(instance, "_summary_placement", None)
+    new = (instance.company_id, instance.department_id)
+    if old is not None and old != new:
+        move_employee_summaries(instance.pk, old, new)
+
+
+def department_deleted(sender, instance, **kwargs):
+    # موظفين القسم صاروا بدون قسم (SET_NULL بدون signals)، والـ rows تبعه راحت (CASCADE)
+    rebuild_attendance_summary(company_id=instance.company_id, without_department=True)
+
+
+pre_save.connect(attendance_record_pre_save, sender=AttendanceRecord, dispatch_uid="attendance_summary_pre_save")
+post_save.connect(attendance_record_saved, sender=AttendanceRecord, dispatch_uid="attendance_summary_saved")
+post_delete.connect(attendance_record_deleted, sender=AttendanceRecord, dispatch_uid="attendance_summary_deleted")
+pre_save.connect(employee_pre_save, sender=Employee, dispatch_uid="attendance_summary_employee_pre_save")
+post_save.connect(employee_saved, sender=Employee, dispatch_uid="attendance_summary_employee_saved")
+post_delete.connect(department_deleted, sender=Department, dispatch_uid="attendance_summary_department_deleted")
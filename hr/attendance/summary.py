@@ -0,0 +1,217 @@
+"""
+AttendanceDailySummary: عدّادات لكل (شركة، قسم، يوم) بدل COUNT على AttendanceRecord بكل request.
+
+كل سجل حضور بيساهم بـ +1 بخانة حالته (+ anomalies إذا فيه غياب/تأخير/خروج بكير/overtime).
+وقت الحفظ/الحذف منطرح مساهمته القديمة (AttendanceRecord._summary_state) ومنزيد الجديدة،
+بـ UPDATE ... SET x = x + delta بنفس الـ transaction. الكتابة الجماعية (bulk_create / bulk_update)
+لازم تنادي sync_record_summaries بنفسها لأنها ما بتبعت signals (وهي كمان بتشيل الـ monthly rollups
+اللي صارت قديمة، متل الـ signals).
+السجلات المأرشفة (AttendanceRecordArchive) بتضل محسوبة، فإعادة الحساب بتجمع من الجدولين.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from hr.attendance.archive import invalidate_monthly_rollups
+from hr.attendance.models import AttendanceDailySummary, AttendanceRecord, AttendanceRecordArchive, AttendanceStatus
+from hr.employees.models import Employee
+
+
+SUMMARY_STATUS_FIELDS = {
+    AttendanceStatus.PRESENT: "present",
+    AttendanceStatus.ABSENT: "absent",
+    AttendanceStatus.LATE: "late",
+    AttendanceStatus.REMOTE: "remote",
+    AttendanceStatus.ON_LEAVE: "on_leave",
+    AttendanceStatus.HOLIDAY: "holiday",
+}
+SUMMARY_COUNTERS = ["total", *SUMMARY_STATUS_FIELDS.values(), "anomalies"]
+
+ANOMALY_Q = (
+    Q(status=AttendanceStatus.ABSENT)
+    | Q(late_minutes__gt=0)
+    | Q(early_leave_minutes__gt=0)
+    | Q(is_overtime=True)
+)
+
+# (employee_id, date, status, anomaly)
+SummaryState = tuple
+
+
+def _contribution(status: str, anomaly: bool, sign: int) -> Counter:
+    out = Counter(total=sign)
+    field = SUMMARY_STATUS_FIELDS.get(status)
+    if field:
+        out[field] += sign
+    if anomaly:
+        out["anomalies"] += sign
+    return out
+
+
+def apply_state_changes(changes: list[tuple[SummaryState | None, SummaryState | None]]) -> int:
+    """
+    changes: [(الحالة القديمة أو None، الجديدة أو None)] → UPDATE بالفرق لكل (شركة، قسم، يوم).
+    الشركة والقسم من Employee الحالي بـ query وحدة.
+    """
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return 0
+
+    employee_ids = {s[0] for pair in changes for s in pair if s is not None}
+    placement = {
+        emp_id: (company_id, department_id)
+        for emp_id, company_id, department_id in (
+            Employee.objects.filter(id__in=employee_ids).values_list("id", "company_id", "department_id")
+        )
+    }
+
+    deltas: dict[tuple, Counter] = defaultdict(Counter)
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None or state[0] not in placement:
+                continue
+            employee_id, day, status, anomaly = state
+            company_id, department_id = placement[employee_id]
+            deltas[(company_id, department_id, day)].update(_contribution(status, anomaly, sign))
+
+    touched = 0
+    with transaction.atomic():
+        for (company_id, department_id, day), delta in deltas.items():
+            delta = {k: v for k, v in delta.items() if v}
+            if delta:
+                _apply_delta(company_id, department_id, day, delta)
+                touched += 1
+    return touched
+
+
+def _apply_delta(company_id: int, department_id: int | None, day: date, delta: dict) -> None:
+    rows = AttendanceDailySummary.objects.filter(company_id=company_id, department_id=department_id, date=day)
+    if rows.update(**{k: F(k) + v for k, v in delta.items()}):
+        return
+    try:
+        with transaction.atomic():
+            AttendanceDailySummary.objects.create(
+                company_id=company_id, department_id=department_id, date=day, **delta,
+            )
+    except IntegrityError:
+        # حدا تاني عمل الـ row بنفس اللحظة
+        rows.update(**{k: F(k) + v for k, v in delta.items()})
+
+
+def sync_record_summaries(records) -> int:
+    """
+    للكتابة الجماعية: بعد ما تنحفظ السجلات، منقارن _summary_state (من وقت التحميل) بالحالة الحالية.
+    """
+    changes = []
+    for rec in records:
+        new = rec.summary_state()
+        changes.append((getattr(rec, "_summary_state", None), new))
+        rec._summary_state = new
+    # total_hours / overtime مش بالـ state، فالـ rollup بينشال لكل سجل انكتب
+    invalidate_monthly_rollups(state[:2] for change in changes for state in change if state)
+    return apply_state_changes(changes)
+
+
+def move_employee_summaries(employee_id: int, old_placement: tuple, new_placement: tuple) -> None:
+    """
+    الموظف انتقل شركة/قسم: مساهمات سجلاته بتنتقل من الـ rows القديمة للجديدة.
+    """
+    if old_placement == new_placement:
+        return
+
+    per_day = _aggregate_records({"employee_id": employee_id}, ["date"])
+    with transaction.atomic():
+        for row in per_day:
+            day = row.pop("date")
+            counters = {k: v for k, v in row.items() if v}
+            if not counters:
+                continue
+            if old_placement[0] is not None:
+                _apply_delta(old_placement[0], old_placement[1], day, {k: -v for k, v in counters.items()})
+            if new_placement[0] is not None:
+                _apply_delta(new_placement[0], new_placement[1], day, counters)
+
+
+def _aggregate(records_qs, group_by: list[str]):
+    counters = {
+        "total": Count("id"),
+        **{
+            field: Count("id", filter=Q(status=status))
+            for status, field in SUMMARY_STATUS_FIELDS.items()
+        },
+        "anomalies": Count("id", filter=ANOMALY_Q),
+    }
+    return list(records_qs.order_by().values(*group_by).annotate(**counters))
+
+
+def _aggregate_records(filters: dict, group_by: list[str]) -> list[dict]:
+    """
+    _aggregate على AttendanceRecord و AttendanceRecordArchive بنفس الـ filters، مجموعين لكل group.
+    """
+    merged: dict[tuple, dict] = {}
+    for model in (AttendanceRecord, AttendanceRecordArchive):
+        for row in _aggregate(model.objects.filter(**filters), group_by):
+            key = tuple(row.pop(field) for field in group_by)
+            counters = merged.setdefault(key, dict.fromkeys(SUMMARY_COUNTERS, 0))
+            for field, value in row.items():
+                counters[field] += value
+    return [{**dict(zip(group_by, key)), **counters} for key, counters in merged.items()]
+
+
+def rebuild_attendance_summary(
+    company_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    without_department: bool = False,
+) -> int:
+    """
+    بيمسح الـ rows بالنطاق وبيعيد حسابها بـ GROUP BY على AttendanceRecord والأرشيف.
+    without_department: بس الموظفين بدون قسم (بعد حذف قسم).
+    """
+    summaries = AttendanceDailySummary.objects.all()
+    filters = {}
+    if company_id is not None:
+        summaries = summaries.filter(company_id=company_id)
+        filters["employee__company_id"] = company_id
+    if start is not None:
+        summaries = summaries.filter(date__gte=start)
+        filters["date__gte"] = start
+    if end is not None:
+        summaries = summaries.filter(date__lte=end)
+        filters["date__lte"] = end
+    if without_department:
+        summaries = summaries.filter(department__isnull=True)
+        filters["employee__department__isnull"] = True
+
+    with transaction.atomic():
+        rows = _aggregate_records(filters, ["employee__company_id", "employee__department_id", "date"])
+        summaries.delete()
+        AttendanceDailySummary.objects.bulk_create(
+            [
+                AttendanceDailySummary(
+                    company_id=row.pop("employee__company_id"),
+                    department_id=row.pop("employee__department_id"),
+                    **row,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def company_day_counts(company, start: date, end: date | None = None) -> dict:
+    """
+    مجموع العدّادات لكل الأقسام بالفترة (row وحدة بالـ SQL).
+    """
+    end = end or start
+    agg = (
+        AttendanceDailySummary.objects
+        .filter(company=company, date__gte=start, date__lte=end)
+        .aggregate(**{field: Sum(field) for field in SUMMARY_COUNTERS})
+    )
+    return {field: agg[field] or 0 for field in SUMMARY_COUNTERS}
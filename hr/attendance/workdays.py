@@ -0,0 +1,185 @@
+"""
+أيام الدوام لكل شركة كـ bitmap لكل سنة (bit i = اليوم رقم i من السنة يوم دوام).
+عدّ أيام الدوام بفترة = popcount على slice من الـ bitmap بدل ما نمشي يوم يوم.
+
+الـ bitmap بينحسب من CompanyCalendar (العطلة الأسبوعية) و CalendarDay (عطل رسمية / أيام دوام استثنائية)
+مرة وحدة لكل WorkingDays (يعني لكل payroll run / request). بين الـ requests بينحفظ بالـ cache
+بس إذا الـ cache مشترك (hr/attendance/caching.py)، وأي تعديل عالتقويم بيزيد version الشركة
+(hr/attendance/signals.py).
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from hr.attendance.caching import shared_cache
+from hr.attendance.models import (
+    CalendarDay,
+    CalendarDayType,
+    CompanyCalendar,
+    DEFAULT_WEEKLY_REST_DAYS,
+)
+
+
+WORKDAYS_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(company_id) -> str:
+    return f"hr:workdays:{company_id}:version"
+
+
+def _year_key(company_id, year: int, version: int) -> str:
+    return f"hr:workdays:{company_id}:{version}:{year}"
+
+
+def invalidate_working_days(company_id) -> None:
+    cache = shared_cache()
+    if cache is None:
+        return
+    key = _version_key(company_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _days_mask(start: date, days) -> int:
+    mask = 0
+    for day in days:
+        mask |= 1 << (day - start).days
+    return mask
+
+
+def compile_year(company_id, year: int) -> dict:
+    """
+    rest_days + bitmaps للعطل الرسمية وأيام الدوام الاستثنائية + bitmap أيام الدوام النهائي.
+    """
+    start = date(year, 1, 1)
+    n_days = (date(year + 1, 1, 1) - start).days
+
+    rest_days = (
+        CompanyCalendar.objects
+        .filter(company_id=company_id)
+        .values_list("weekly_rest_days", flat=True)
+        .first()
+    )
+    if rest_days is None:
+        rest_days = DEFAULT_WEEKLY_REST_DAYS
+    rest_days = sorted(set(rest_days))
+
+    holidays = []
+    working = []
+    for day, day_type in CalendarDay.objects.filter(
+        company_id=company_id,
+        date__year=year,
+    ).values_list("date", "day_type"):
+        (working if day_type == CalendarDayType.WORKING_DAY else holidays).append(day)
+
+    # أسبوع واحد من بداية السنة، منكرره لآخر السنة
+    week = 0
+    for i in range(7):
+        if (start + timedelta(days=i)).weekday() not in rest_days:
+            week |= 1 << i
+    weeks = (n_days + 6) // 7
+    bits = 0
+    for w in range(weeks):
+        bits |= week << (7 * w)
+    bits &= (1 << n_days) - 1
+
+    holiday_bits = _days_mask(start, holidays)
+    working_bits = _days_mask(start, working)
+    bits = (bits | working_bits) & ~holiday_bits
+
+    return {
+        "rest_days": rest_days,
+        "holidays": holiday_bits,
+        "working": working_bits,
+        "bits": bits,
+    }
+
+
+def _iter_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class WorkingDays:
+    """
+    أيام الدوام لشركة وحدة. السنين بتنحسب (أو بتنجاب من الـ cache المشترك) وقت الحاجة وبتضل
+    بالـ object، فبينفع نمرّره للـ worker processes بعد preload.
+    """
+
+    def __init__(self, company_id):
+        self.company_id = company_id
+        self._years: dict[int, dict] = {}
+
+    def year(self, year: int) -> dict:
+        data = self._years.get(year)
+        if data is None:
+            cache = shared_cache()
+            if cache is None:
+                data = compile_year(self.company_id, year)
+            else:
+                version = cache.get(_version_key(self.company_id), 0)
+                key = _year_key(self.company_id, year, version)
+                data = cache.get(key)
+                if data is None:
+                    data = compile_year(self.company_id, year)
+                    cache.set(key, data, WORKDAYS_CACHE_TIMEOUT)
+            self._years[year] = data
+        return data
+
+    def preload(self, start: date, end: date) -> "WorkingDays":
+        for y in range(start.year, end.year + 1):
+            self.year(y)
+        return self
+
+    def _slice(self, start: date, end: date, field: str) -> int:
+        """
+        bitmap للفترة: bit i = اليوم start + i.
+        """
+        if end < start:
+            return 0
+        out = 0
+        shift = 0
+        for y in range(start.year, end.year + 1):
+            lo = start if y == start.year else date(y, 1, 1)
+            hi = end if y == end.year else date(y, 12, 31)
+            first = (lo - date(y, 1, 1)).days
+            n = (hi - lo).days + 1
+            out |= ((self.year(y)[field] >> first) & ((1 << n) - 1)) << shift
+            shift += n
+        return out
+
+    def mask(self, start: date, end: date) -> int:
+        return self._slice(start, end, "bits")
+
+    def holidays_mask(self, start: date, end: date) -> int:
+        return self._slice(start, end, "holidays")
+
+    def special_working_mask(self, start: date, end: date) -> int:
+        return self._slice(start, end, "working")
+
+    def rest_days(self, year: int) -> list[int]:
+        return self.year(year)["rest_days"]
+
+    def count(self, start: date, end: date) -> int:
+        return self.mask(start, end).bit_count()
+
+    def is_working_day(self, day: date) -> bool:
+        return bool(self.year(day.year)["bits"] >> (day - date(day.year, 1, 1)).days & 1)
+
+    def offsets(self, start: date, end: date):
+        """
+        offsets (من start) لأيام الدوام بالفترة، بالترتيب.
+        """
+        return _iter_bits(self.mask(start, end))
+
+    def days(self, start: date, end: date):
+        for offset in self.offsets(start, end):
+            yield start + timedelta(days=offset)
+
+
+def company_working_days(company_id) -> WorkingDays:
+    return WorkingDays(company_id)
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 
 from hr.employees.models import Employee
+from hr.attendance.workdays import company_working_days
 from hr.org_structure.models import Company  
 
 
@@ -83,9 +84,14 @@ class LeaveRequest(models.Model):
 
     @property
     def total_days(self):
+        """
+        أيام الدوام بالفترة حسب تقويم الشركة (العطل الأسبوعية والرسمية ما بتنحسب).
+        """
         if self.start_date and self.end_date:
-            days = (self.end_date - self.start_date).days + 1
-            return 0.5 if self.is_half_day else days
+            days = company_working_days(self.employee.company_id).count(self.start_date, self.end_date)
+            if self.is_half_day:
+                return 0.5 if days else 0
+            return days
         return 0
 
     def approve(self, approver: Employee):
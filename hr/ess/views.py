@@ -22,6 +22,7 @@ from hr.ess.models import LeaveRequest
 from datetime import datetime, timedelta
 from .models import Announcement
 from hr.attendance.models import AttendanceRecord   
+from hr.attendance.archive import employee_month_attendance
 from hr.payroll.models import PayrollItem , Payslip        
 
 User = get_user_model()
@@ -46,15 +47,10 @@ class ESSDashboardSummaryView(APIView):
         current_year = today.year
         current_month = today.month
 
-        current_qs = AttendanceRecord.objects.filter(
-            employee=employee,
-            date__year=current_year,
-            date__month=current_month,
-        )
-
-
-        current_present = current_qs.filter(status__iexact="present").count()
-        current_total = current_qs.count()
+        # الشهر المسكّر من AttendanceMonthlyRollup (الـ rows ممكن يكونوا انأرشفوا)
+        current = employee_month_attendance(employee.id, current_year, current_month)
+        current_present = current["days_present"]
+        current_total = current["records"]
         current_percent = (
             round((current_present / current_total) * 100, 1) if current_total > 0 else 0
         )
@@ -67,13 +63,9 @@ class ESSDashboardSummaryView(APIView):
             prev_month = current_month - 1
             prev_year = current_year
 
-        prev_qs = AttendanceRecord.objects.filter(
-            employee=employee,
-            date__year=prev_year,
-            date__month=prev_month,
-        )
-        prev_present = prev_qs.filter(status__iexact="present").count()
-        prev_total = prev_qs.count()
+        prev = employee_month_attendance(employee.id, prev_year, prev_month)
+        prev_present = prev["days_present"]
+        prev_total = prev["records"]
         prev_percent = (
             round((prev_present / prev_total) * 100, 1) if prev_total > 0 else 0
         )
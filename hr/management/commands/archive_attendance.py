@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hr.attendance.archive import ArchiveMismatch, archive_after_months, archive_company
+from hr.org_structure.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Rollup شهري لكل شهر حضور مسكّر (PayrollRun PAID)، ونقل الأشهر الأقدم من "
+        "ATTENDANCE_ARCHIVE_AFTER_MONTHS لـ AttendanceRecordArchive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="كود الشركة (الافتراضي كل الشركات).")
+        parser.add_argument(
+            "--older-than-months",
+            type=int,
+            default=None,
+            help="الافتراضي من settings.ATTENDANCE_ARCHIVE_AFTER_MONTHS.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="بس اطبع شو رح ينعمل.")
+
+    def handle(self, *args, **options):
+        after_months = options["older_than_months"]
+        if after_months is None:
+            after_months = archive_after_months()
+        if after_months < 1:
+            raise CommandError("--older-than-months must be at least 1.")
+
+        companies = Company.objects.order_by("id")
+        if options["company"]:
+            companies = companies.filter(code=options["company"])
+            if not companies.exists():
+                raise CommandError(f"Company {options['company']} not found.")
+
+        today = timezone.localdate()
+        for company in companies:
+            try:
+                result = archive_company(company.id, today, after_months=after_months, dry_run=options["dry_run"])
+            except ArchiveMismatch as exc:
+                raise CommandError(f"{company.code}: {exc}") from exc
+            months = lambda items: ", ".join(f"{y}-{m:02d}" for y, m in items) or "-"
+            self.stdout.write(
+                f"{company.code}: rolled up {months(result['rolled_up'])}; "
+                f"archived {months(result['archived'])} ({result['records_moved']} record(s))."
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
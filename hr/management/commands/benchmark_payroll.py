@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.payroll.benchmarks import DEFAULT_SIZES, compare_reports, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark للرواتب على بيانات synthetic (كل حجم جوّا transaction بتنعمل rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default=",".join(str(s) for s in DEFAULT_SIZES),
+            help="أحجام الشركات (عدد موظفين) مفصولة بفواصل.",
+        )
+        parser.add_argument("--months", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--repeat", type=int, default=1, help="عدد التكرارات (منسجّل أقل وقت).")
+        parser.add_argument("--no-memory", action="store_true", help="بدون pass الـ tracemalloc.")
+        parser.add_argument("--output", default="payroll_benchmark.json")
+        parser.add_argument("--compare", default=None, help="تقرير JSON قديم للمقارنة.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of integers.")
+
+        report = run_benchmarks(
+            sizes=sizes,
+            months=options["months"],
+            seed=options["seed"],
+            workers=options["workers"],
+            repeat=options["repeat"],
+            memory=not options["no_memory"],
+            log=self.stdout.write,
+        )
+
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as f:
+                old = json.load(f)
+            self.stdout.write(f"Compared with {old.get('git_commit') or options['compare']}:")
+            for row in compare_reports(old, report):
+                parts = [
+                    f"{key} {before} → {after} (x{ratio})"
+                    for key, (before, after, ratio) in row["metrics"].items()
+                ]
+                self.stdout.write(f"  {row['employees']:>6} {row['case']}: " + ", ".join(parts))
@@ -0,0 +1,40 @@
+import time
+import uuid
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.attendance.outbox import OUTBOX_BATCH_SIZE, dispatch_outbox_batch, outbox_endpoint
+
+
+class Command(BaseCommand):
+    help = "Dispatcher لأحداث الحضور (AttendanceOutboxEvent) لخدمة الـ AI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="ابعت الأحداث الجاهزة هلق واطلع.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="ثواني الانتظار لما ما في أحداث.")
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not outbox_endpoint():
+            raise CommandError("AI_SERVICES['attendance_event'] is not configured.")
+
+        worker_id = uuid.uuid4().hex
+        session = requests.Session()
+        try:
+            while True:
+                result = dispatch_outbox_batch(options["batch_size"], session=session, worker_id=worker_id)
+                if result["claimed"]:
+                    self.stdout.write(
+                        f"Delivered {result['delivered']}/{result['claimed']} "
+                        f"(retry: {result['retried']}, dead: {result['dead']})."
+                    )
+                    if result["dead"]:
+                        self.stdout.write(self.style.WARNING(f"{result['dead']} event(s) moved to dead."))
+                    continue
+
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+        finally:
+            session.close()
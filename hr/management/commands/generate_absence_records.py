@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hr.attendance.absence import generate_absence_records
+from hr.attendance.models import AttendanceStatus
+from hr.org_structure.models import Company
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date: {value}. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "بيعمل سجلات ABSENT / ON_LEAVE / HOLIDAY للموظفين اللي ما إلهم سجل بيوم (الافتراضي مبارح). للـ cron كل ليلة."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="كود الشركة (الافتراضي كل الشركات).")
+        parser.add_argument("--date", help="YYYY-MM-DD (الافتراضي مبارح).")
+        parser.add_argument("--to", dest="end", help="YYYY-MM-DD: لتعبئة فترة من --date لهون.")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by("id")
+        if options["company"]:
+            companies = companies.filter(code=options["company"])
+            if not companies.exists():
+                raise CommandError(f"Company {options['company']} not found.")
+
+        start = _date(options["date"]) if options["date"] else timezone.localdate() - timedelta(days=1)
+        end = _date(options["end"]) if options["end"] else start
+        if end < start:
+            raise CommandError("--to must be on or after --date.")
+
+        for company in companies:
+            totals = {status: 0 for status in (AttendanceStatus.ABSENT, AttendanceStatus.ON_LEAVE, AttendanceStatus.HOLIDAY)}
+            day = start
+            while day <= end:
+                for status, n in generate_absence_records(company, day).items():
+                    totals[status] += n
+                day += timedelta(days=1)
+            self.stdout.write(
+                f"{company.code}: absent {totals[AttendanceStatus.ABSENT]}, "
+                f"on leave {totals[AttendanceStatus.ON_LEAVE]}, holiday {totals[AttendanceStatus.HOLIDAY]}."
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
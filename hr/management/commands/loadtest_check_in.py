@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.attendance.loadtest import (
+    DEFAULT_EMPLOYEES,
+    DEFAULT_RATE_PER_MINUTE,
+    DEFAULT_RETRY_RATIO,
+    run_check_in_load_test,
+)
+
+
+class Command(BaseCommand):
+    help = "Load test لـ check-in / check-out على شركة synthetic (بتنعمل rollback بالآخر): p50 / p99 تحت burst."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=DEFAULT_EMPLOYEES)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=DEFAULT_RATE_PER_MINUTE,
+            help="بصمات بالدقيقة (0 = بأسرع ما يمكن).",
+        )
+        parser.add_argument("--retry-ratio", type=float, default=DEFAULT_RETRY_RATIO)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--no-check-out", action="store_true")
+        parser.add_argument("--output", default=None, help="ملف JSON للتقرير.")
+
+    def handle(self, *args, **options):
+        if options["employees"] < 1:
+            raise CommandError("--employees must be positive.")
+        if options["rate"] < 0 or not 0 <= options["retry_ratio"] <= 1:
+            raise CommandError("--rate must be >= 0 and --retry-ratio between 0 and 1.")
+
+        report = run_check_in_load_test(
+            employees=options["employees"],
+            rate_per_minute=options["rate"],
+            retry_ratio=options["retry_ratio"],
+            seed=options["seed"],
+            check_out=not options["no_check_out"],
+            log=self.stdout.write,
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
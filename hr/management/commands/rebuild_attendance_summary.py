@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.attendance.summary import rebuild_attendance_summary
+from hr.org_structure.models import Company
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date: {value}. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "يعيد حساب AttendanceDailySummary من AttendanceRecord (كل الشركات أو شركة وفترة محددة)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="كود الشركة.")
+        parser.add_argument("--from", dest="start", help="YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", help="YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        company_id = None
+        if options["company"]:
+            company = Company.objects.filter(code=options["company"]).first()
+            if company is None:
+                raise CommandError(f"Company {options['company']} not found.")
+            company_id = company.id
+
+        start = _date(options["start"]) if options["start"] else None
+        end = _date(options["end"]) if options["end"] else None
+
+        rows = rebuild_attendance_summary(company_id=company_id, start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} summary row(s)."))
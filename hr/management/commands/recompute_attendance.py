@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.attendance.models import Shift
+from hr.attendance.recompute import enqueue_attendance_recompute, recompute_attendance_records
+from hr.org_structure.models import Company
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date: {value}. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "يعيد حساب late / overtime / status لسجلات الحضور (شفت، شركة، فترة) وبيطبع كم سجل تغيّر."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shift", help="كود الشفت.")
+        parser.add_argument("--company", help="كود الشركة.")
+        parser.add_argument("--from", dest="start", help="YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", help="YYYY-MM-DD")
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="بدل التنفيذ هون: job للـ worker (run_attendance_jobs). لازم --company وبدون --shift.",
+        )
+
+    def handle(self, *args, **options):
+        shift_id = None
+        if options["shift"]:
+            shift_id = Shift.objects.filter(code=options["shift"]).values_list("id", flat=True).first()
+            if shift_id is None:
+                raise CommandError(f"Shift {options['shift']} not found.")
+
+        company_id = None
+        if options["company"]:
+            company_id = Company.objects.filter(code=options["company"]).values_list("id", flat=True).first()
+            if company_id is None:
+                raise CommandError(f"Company {options['company']} not found.")
+
+        start = _date(options["start"]) if options["start"] else None
+        end = _date(options["end"]) if options["end"] else None
+
+        if options["queue"]:
+            if company_id is None or shift_id is not None:
+                raise CommandError("--queue needs --company and no --shift.")
+            job = enqueue_attendance_recompute(company_id, start, end)
+            self.stdout.write(self.style.SUCCESS(f"Queued {job}."))
+            return
+
+        def progress(processed, total, changed):
+            self.stdout.write(f"  {processed}/{total} ({changed} changed)")
+
+        result = recompute_attendance_records(
+            shift_id=shift_id,
+            company_id=company_id,
+            start=start,
+            end=end,
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {result['processed']} record(s), {result['changed']} changed."
+        ))
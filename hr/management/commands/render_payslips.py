@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.payroll.models import PayrollRun
+from hr.payroll.payslips import render_run_payslips
+
+
+class Command(BaseCommand):
+    help = "يرسم ملفات PDF لكشوف رواتب دورة (بس اللي تغيّر محتواها) ويحدّث Payslip.file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_id", type=int)
+        parser.add_argument("--workers", type=int, default=None, help="عدد الـ processes.")
+        parser.add_argument("--force", action="store_true", help="أعد رسم كل الكشوف.")
+
+    def handle(self, *args, **options):
+        try:
+            run = PayrollRun.objects.select_related("company").get(pk=options["run_id"])
+        except PayrollRun.DoesNotExist:
+            raise CommandError(f"Payroll run #{options['run_id']} not found.")
+
+        result = render_run_payslips(run, workers=options["workers"], force=options["force"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Run #{run.id}: {result['rendered']} rendered, {result['unchanged']} unchanged, "
+            f"{result['failed']} failed (of {result['payslips']})."
+        ))
+        for err in result["errors_preview"]:
+            self.stdout.write(self.style.ERROR(f"  {err['employee_code']}: {err['error']}"))
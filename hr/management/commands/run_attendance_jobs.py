@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hr.attendance.models import RecomputeJobStatus
+from hr.attendance.recompute import claim_next_recompute_job, fail_stale_recompute_jobs, run_recompute_job
+
+
+class Command(BaseCommand):
+    help = "Worker لـ AttendanceRecomputeJobs (إعادة حساب الحضور بعد تعديل الشفتات)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="نفّذ الـ jobs الموجودة واطلع.")
+        parser.add_argument("--sleep", type=float, default=5.0, help="ثواني الانتظار لما ما في jobs.")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="ثواني بدون heartbeat قبل ما نعتبر job شغالة ميتة.",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+
+        while True:
+            stale = fail_stale_recompute_jobs(stale_after)
+            if stale:
+                self.stdout.write(self.style.WARNING(f"Marked {stale} stale job(s) as failed."))
+
+            job = claim_next_recompute_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"Running attendance recompute job #{job.id}...")
+            job = run_recompute_job(job)
+
+            if job.status == RecomputeJobStatus.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Job #{job.id} done: {job.processed}/{job.total}, {job.changed} changed."
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job #{job.id} failed: {job.error_message}"))
@@ -0,0 +1,45 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hr.payroll.jobs import claim_next_job, fail_stale_jobs, run_payroll_job
+from hr.payroll.models import PayrollJobStatus
+
+
+class Command(BaseCommand):
+    help = "Worker محلي لتنفيذ PayrollJobs (توليد الرواتب بالخلفية)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="نفّذ الـ jobs الموجودة واطلع.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="ثواني الانتظار لما ما في jobs.")
+        parser.add_argument("--workers", type=int, default=None, help="عدد الـ processes لكل job.")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="ثواني بدون heartbeat قبل ما نعتبر job شغالة ميتة.",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+
+        while True:
+            stale = fail_stale_jobs(stale_after)
+            if stale:
+                self.stdout.write(self.style.WARNING(f"Marked {stale} stale job(s) as failed."))
+
+            job = claim_next_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"Running payroll job #{job.id} ({job.kind}) for run #{job.payroll_run_id}...")
+            job = run_payroll_job(job, workers=options["workers"])
+
+            if job.status == PayrollJobStatus.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f"Job #{job.id} done: {job.processed}/{job.total}."))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job #{job.id} failed: {job.error_message}"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hr.payroll.services import ensure_monthly_run
+from hr.payroll.synthetic import build_synthetic_company
+
+
+class Command(BaseCommand):
+    help = "ينشئ شركة وهمية (موظفين، شفتات، عقود، حضور، إجازات، أوفرتايم) لقياس أداء الرواتب."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=1000)
+        parser.add_argument("--months", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--code", default=None, help="كود الشركة (افتراضياً SYN<employees>S<seed>).")
+        parser.add_argument("--with-runs", action="store_true", help="أنشئ PayrollRun (draft) لكل شهر.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            synthetic = build_synthetic_company(
+                employees=options["employees"],
+                months=options["months"],
+                seed=options["seed"],
+                code=options["code"],
+            )
+            if options["with_runs"]:
+                for year, month in synthetic.periods:
+                    ensure_monthly_run(synthetic.company, year, month)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Company {synthetic.company.code}: {synthetic.employees} employees, "
+            f"{synthetic.attendance_records} attendance records, "
+            f"periods {', '.join(f'{m}/{y}' for y, m in synthetic.periods)}. "
+            f"HR user: {synthetic.hr_user.username}"
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0018_companynotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollDirtyEmployee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(blank=True, default='', max_length=50)),
+                ('marked_at', models.DateTimeField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_dirty_marks', to='hr.employee')),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dirty_employees', to='hr.payrollrun')),
+            ],
+            options={
+                'unique_together': {('payroll_run', 'employee')},
+            },
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+BREAKDOWN_COLUMNS = {
+    "expected_work_days": "expected_work_days",
+    "expected_hours": "expected_hours",
+    "worked_hours": "worked_hours",
+    "hourly_rate": "hourly_rate",
+    "late_minutes": "late_minutes",
+    "late_deduction": "late_deduction",
+    "early_leave_minutes": "early_leave_minutes",
+    "early_deduction": "early_deduction",
+    "absent_hours": "absent_hours",
+    "absent_deduction": "absent_deduction",
+    "unpaid_leave_hours": "unpaid_leave_hours",
+    "unpaid_leave_deduction": "unpaid_leave_deduction",
+    "overtime_hours": "overtime_hours_used",
+}
+INTEGER_COLUMNS = {"expected_work_days", "late_minutes", "early_leave_minutes"}
+
+
+def backfill_report_columns(apps, schema_editor):
+    PayrollItem = apps.get_model("hr", "PayrollItem")
+
+    batch = []
+    qs = PayrollItem.objects.select_related("employee").order_by("pk")
+    for item in qs.iterator(chunk_size=2000):
+        breakdown = item.breakdown or {}
+        for field_name, key in BREAKDOWN_COLUMNS.items():
+            value = breakdown.get(key) or 0
+            setattr(item, field_name, int(value) if field_name in INTEGER_COLUMNS else Decimal(str(value)))
+        item.department_id = item.employee.department_id
+        batch.append(item)
+        if len(batch) >= 2000:
+            PayrollItem.objects.bulk_update(batch, ["department", *BREAKDOWN_COLUMNS])
+            batch = []
+    if batch:
+        PayrollItem.objects.bulk_update(batch, ["department", *BREAKDOWN_COLUMNS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0020_payrolljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollitem',
+            name='absent_deduction',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='absent_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='department',
+            field=models.ForeignKey(blank=True, help_text='قسم الموظف وقت توليد الراتب.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_items', to='hr.department'),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='early_deduction',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='early_leave_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='expected_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='expected_work_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='hourly_rate',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='late_deduction',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='late_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='overtime_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='unpaid_leave_deduction',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='unpaid_leave_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='payrollitem',
+            name='worked_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+        migrations.AddIndex(
+            model_name='payrollitem',
+            index=models.Index(fields=['department', 'payroll_run'], name='hr_payrolli_departm_2c3fd4_idx'),
+        ),
+        migrations.RunPython(backfill_report_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:32
+
+import django.db.models.deletion
+import hr.attendance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0021_payrollitem_report_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekly_rest_days', models.JSONField(default=hr.attendance.models.default_weekly_rest_days, help_text='أيام العطلة الأسبوعية كأرقام (0 = الاثنين ... 6 = الأحد).')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='work_calendar', to='hr.company')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('day_type', models.CharField(choices=[('public_holiday', 'Public Holiday'), ('working_day', 'Special Working Day')], default='public_holiday', max_length=20)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_days', to='hr.company')),
+            ],
+            options={
+                'ordering': ['company', 'date'],
+                'unique_together': {('company', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0022_company_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceOutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('dead', 'Dead')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='أول وقت مسموح فيه نحاول نبعته.')),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=64)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='hr_attendan_status_b0428f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+STATUS_COUNTERS = {
+    "present": "present",
+    "absent": "absent",
+    "late": "late",
+    "remote": "remote",
+    "on_leave": "on_leave",
+    "holiday": "holiday",
+}
+
+
+def backfill_summaries(apps, schema_editor):
+    AttendanceRecord = apps.get_model("hr", "AttendanceRecord")
+    AttendanceDailySummary = apps.get_model("hr", "AttendanceDailySummary")
+
+    rows = (
+        AttendanceRecord.objects
+        .order_by()
+        .values("employee__company_id", "employee__department_id", "date")
+        .annotate(
+            total=Count("id"),
+            **{field: Count("id", filter=Q(status=status)) for status, field in STATUS_COUNTERS.items()},
+            anomalies=Count(
+                "id",
+                filter=Q(status="absent") | Q(late_minutes__gt=0) | Q(early_leave_minutes__gt=0) | Q(is_overtime=True),
+            ),
+        )
+    )
+    AttendanceDailySummary.objects.bulk_create(
+        [
+            AttendanceDailySummary(
+                company_id=row.pop("employee__company_id"),
+                department_id=row.pop("employee__department_id"),
+                **row,
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0023_attendance_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('remote', models.IntegerField(default=0)),
+                ('on_leave', models.IntegerField(default=0)),
+                ('holiday', models.IntegerField(default=0)),
+                ('anomalies', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='hr.company')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='hr.department')),
+            ],
+            options={
+                'ordering': ['-date', 'company', 'department'],
+                'indexes': [models.Index(fields=['company', 'date'], name='hr_attendan_company_74ebf7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('company', 'department', 'date'), name='attendance_summary_unique_department_day'), models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('company', 'date'), name='attendance_summary_unique_company_day_no_department')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0024_attendance_daily_summary'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='hr_attendan_date_07a719_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'employee'], name='hr_attendan_date_76a7fd_idx'),
+        ),
+    ]
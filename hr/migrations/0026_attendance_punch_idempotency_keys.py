@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0025_attendance_log_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='check_in_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='check_out_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0027_attendance_recompute_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('days_present', models.PositiveIntegerField(default=0)),
+                ('days_late', models.PositiveIntegerField(default=0)),
+                ('days_absent', models.PositiveIntegerField(default=0)),
+                ('days_on_leave', models.PositiveIntegerField(default=0)),
+                ('days_remote', models.PositiveIntegerField(default=0)),
+                ('days_holiday', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('late_minutes', models.PositiveIntegerField(default=0)),
+                ('early_leave_minutes', models.PositiveIntegerField(default=0)),
+                ('archived', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='hr.company')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='hr.employee')),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'indexes': [models.Index(fields=['company', 'year', 'month'], name='hr_attendan_company_2ae78e_idx')],
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceRecordArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('check_in', models.DateTimeField(blank=True, null=True)),
+                ('check_out', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('late', 'Late'), ('on_leave', 'On Leave'), ('holiday', 'Holiday'), ('remote', 'Remote')], max_length=20)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('late_minutes', models.PositiveIntegerField(default=0)),
+                ('early_leave_minutes', models.PositiveIntegerField(default=0)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('is_overtime', models.BooleanField(default=False)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance_records', to='hr.employee')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hr.shift')),
+            ],
+            options={
+                'ordering': ['-date', 'employee__employee_code'],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PayrollRun, PayrollItem
+from .models import PayrollRun, PayrollItem, PayrollJob
 
 
 @admin.register(PayrollRun)
@@ -36,4 +36,20 @@ class PayrollItemAdmin(admin.ModelAdmin):
         "currency",
     )
     list_filter = ("payroll_run__company", "currency")
-    search_fields = ("employee__employee_code", "employee__user__username", "payroll_run__name")
\ No newline at end of file
+    search_fields = ("employee__employee_code", "employee__user__username", "payroll_run__name")
+
+
+@admin.register(PayrollJob)
+class PayrollJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "payroll_run",
+        "kind",
+        "status",
+        "processed",
+        "total",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+    list_filter = ("status", "kind", "payroll_run__company")
+    search_fields = ("payroll_run__name", "payroll_run__company__name")
@@ -0,0 +1,253 @@
+"""
+Benchmark suite للرواتب: لكل حجم منعمل شركة synthetic جوّا transaction،
+منقيس الحالات (wall time / عدد queries / peak memory) ومنعمل rollback بالآخر.
+النتيجة JSON منقارنها بين commits.
+"""
+from __future__ import annotations
+
+import platform
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from hr.employees.models import Employee, EmployeeStatus
+from hr.payroll.models import PayrollItem, PayrollJob
+from hr.payroll.services import calc_employee_payroll_for_run, ensure_monthly_run, generate_payroll_items
+from hr.payroll.synthetic import build_synthetic_company
+
+
+DEFAULT_SIZES = (100, 1_000, 10_000)
+CALC_SAMPLE_SIZE = 50
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    fn: Callable[[], object]
+    # بينادى قبل كل تكرار لحتى كل pass يبلّش من نفس الحالة
+    reset: Callable[[], None] | None = None
+    calls: int = 1
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def measure(case: BenchmarkCase, repeat: int = 1, memory: bool = True) -> dict:
+    """
+    الوقت والـ queries من passes عادية، والـ peak memory من pass لحالها تحت tracemalloc
+    (لأن tracemalloc بيبطّئ وبيخرّب الوقت).
+    """
+    wall_ms = []
+    queries = 0
+    for _ in range(max(1, repeat)):
+        if case.reset:
+            case.reset()
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            case.fn()
+            wall_ms.append(round((time.perf_counter() - t0) * 1000, 2))
+        queries = len(ctx.captured_queries)
+
+    result = {
+        "wall_ms": min(wall_ms),
+        "wall_ms_runs": wall_ms,
+        "queries": queries,
+        "calls": case.calls,
+        "wall_ms_per_call": round(min(wall_ms) / case.calls, 3),
+    }
+
+    if memory:
+        if case.reset:
+            case.reset()
+        tracemalloc.start()
+        try:
+            case.fn()
+            result["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def _api_cases(run, hr_user) -> list[BenchmarkCase]:
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(hr_user)
+
+    def check(response, expected, url):
+        if response.status_code != expected:
+            raise RuntimeError(f"{url} returned {response.status_code}, expected {expected}.")
+
+    def get(name, *args):
+        url = reverse(name, args=args)
+
+        def call():
+            check(client.get(url), 200, url)
+        return call
+
+    def enqueue():
+        url = reverse("payroll-run-generate-items", args=[run.pk])
+        check(client.post(url, {}, format="json"), 202, url)
+
+    def clear_jobs():
+        PayrollJob.objects.filter(payroll_run=run).delete()
+
+    cases = [
+        BenchmarkCase("api.summary", get("payroll-summary")),
+        BenchmarkCase("api.runs", get("payroll-runs")),
+        BenchmarkCase("api.generate_items.status", get("payroll-run-generate-items", run.pk)),
+        BenchmarkCase("api.generate_items.enqueue", enqueue, reset=clear_jobs),
+    ]
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return cases
+
+    payload = {
+        "variants": [
+            {"name": "overtime_x2", "overtime_multiplier": "2.00"},
+            {"name": "fri_sat_off", "weekly_holidays": [4, 5]},
+        ],
+        "include_employees": False,
+    }
+
+    def simulate():
+        url = reverse("payroll-run-simulate", args=[run.pk])
+        check(client.post(url, payload, format="json"), 200, url)
+
+    cases.append(BenchmarkCase("api.simulate", simulate))
+    return cases
+
+
+def benchmark_size(
+    employees: int,
+    months: int = 1,
+    seed: int = 0,
+    workers: int | None = None,
+    repeat: int = 1,
+    memory: bool = True,
+    log: Callable[[str], None] | None = None,
+) -> dict:
+    log = log or (lambda msg: None)
+
+    with transaction.atomic():
+        t0 = time.perf_counter()
+        synthetic = build_synthetic_company(employees=employees, months=months, seed=seed)
+        seed_seconds = round(time.perf_counter() - t0, 2)
+        log(f"  seeded {synthetic.employees} employees / {synthetic.attendance_records} records in {seed_seconds}s")
+
+        year, month = synthetic.periods[-1]
+        run = ensure_monthly_run(synthetic.company, year, month)
+        employees_qs = Employee.objects.filter(company=synthetic.company, status=EmployeeStatus.ACTIVE)
+        sample = list(employees_qs.order_by("id")[:CALC_SAMPLE_SIZE])
+
+        def clear_items():
+            PayrollItem.objects.filter(payroll_run=run).delete()
+            run.recalculate_totals()
+
+        def calc_sample():
+            for emp in sample:
+                calc_employee_payroll_for_run(emp, run)
+
+        cases = [
+            BenchmarkCase(
+                "generate_payroll_items.initial",
+                lambda: generate_payroll_items(run, workers=workers),
+                reset=clear_items,
+            ),
+            BenchmarkCase(
+                "generate_payroll_items.regenerate",
+                lambda: generate_payroll_items(run, workers=workers),
+            ),
+            BenchmarkCase("calc_employee_payroll_for_run", calc_sample, calls=len(sample)),
+            *_api_cases(run, synthetic.hr_user),
+        ]
+
+        results = {}
+        for case in cases:
+            results[case.name] = measure(case, repeat=repeat, memory=memory)
+            log(f"  {case.name}: {results[case.name]['wall_ms']} ms, {results[case.name]['queries']} queries")
+
+        transaction.set_rollback(True)
+
+    return {
+        "employees": employees,
+        "months": months,
+        "attendance_records": synthetic.attendance_records,
+        "seed_seconds": seed_seconds,
+        "cases": results,
+    }
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES,
+    months: int = 1,
+    seed: int = 0,
+    workers: int | None = None,
+    repeat: int = 1,
+    memory: bool = True,
+    log: Callable[[str], None] | None = None,
+) -> dict:
+    log = log or (lambda msg: None)
+    report = {
+        "created_at": timezone.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "workers": workers or getattr(settings, "PAYROLL_WORKERS", 1),
+        "repeat": repeat,
+        "seed": seed,
+        "sizes": [],
+    }
+    for size in sizes:
+        log(f"{size} employees:")
+        report["sizes"].append(
+            benchmark_size(size, months=months, seed=seed, workers=workers, repeat=repeat, memory=memory, log=log)
+        )
+    return report
+
+
+def compare_reports(old: dict, new: dict) -> list[dict]:
+    """
+    مقارنة تقريرين: لكل (حجم، حالة) موجودة بالاتنين منرجع القيم والنسبة new/old.
+    """
+    old_sizes = {s["employees"]: s for s in old.get("sizes", [])}
+    rows = []
+    for size in new.get("sizes", []):
+        before = old_sizes.get(size["employees"])
+        if not before:
+            continue
+        for name, cur in size["cases"].items():
+            prev = before["cases"].get(name)
+            if not prev:
+                continue
+            metrics = {
+                key: (prev[key], cur[key], round(cur[key] / prev[key], 2) if prev[key] else None)
+                for key in ("wall_ms", "queries", "peak_kib")
+                if key in cur and key in prev
+            }
+            rows.append({"employees": size["employees"], "case": name, "metrics": metrics})
+    return rows
@@ -0,0 +1,207 @@
+"""
+تصدير PayrollItems تبع دورة (للبنك وللمحاسبة) كـ CSV أو XLSX بشكل streaming:
+الـ rows جايين من generator فوق .iterator()، وكل chunk بينبعت أول ما يجهز،
+فـ register فيه 20k موظف ما بيتحمّل كله بالذاكرة.
+"""
+from __future__ import annotations
+
+import csv
+import re
+import zipfile
+from decimal import Decimal, InvalidOperation
+from xml.sax.saxutils import escape
+
+from hr.payroll.models import PayrollItem, PayrollRun
+from hr.payroll.payslips import PAYSLIP_BREAKDOWN_ROWS
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_LAYOUTS = ("register", "bank")
+
+EXPORT_BREAKDOWN_COLUMNS = PAYSLIP_BREAKDOWN_ROWS + [
+    ("Overtime pay", "overtime_pay"),
+    ("Allowances", "allowances"),
+    ("Total deductions", "total_deductions"),
+]
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, Decimal)):
+        return value
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return str(value)
+
+
+def export_headers(layout: str = "register") -> list[str]:
+    headers = ["Employee code", "Employee name", "Net salary", "Currency"]
+    if layout == "register":
+        headers += ["Basic salary", "Gross salary", "Deductions"]
+        headers += [label for label, _ in EXPORT_BREAKDOWN_COLUMNS]
+    return headers
+
+
+def iter_export_rows(run: PayrollRun, layout: str = "register"):
+    """
+    أول row هو الـ headers، بعدين row لكل PayrollItem مرتبين حسب كود الموظف.
+    """
+    yield export_headers(layout)
+
+    items = (
+        PayrollItem.objects
+        .filter(payroll_run=run)
+        .select_related("employee__user")
+        .order_by("employee__employee_code")
+    )
+    if layout != "register":
+        items = items.defer("breakdown", "notes")
+
+    for item in items.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        user = item.employee.user
+        row = [
+            item.employee.employee_code,
+            user.get_full_name() or user.username,
+            item.net_salary,
+            item.currency,
+        ]
+        if layout == "register":
+            breakdown = item.breakdown or {}
+            row += [item.basic_salary, item.gross_salary, item.deductions]
+            row += [_number(breakdown.get(key)) for _, key in EXPORT_BREAKDOWN_COLUMNS]
+        yield row
+
+
+class _Echo:
+    """
+    file-like بيرجّع اللي انكتب فيه بدل ما يخزنه (متل مثال CSV streaming بـ docs تبع Django).
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    # BOM لحتى Excel يفتح الأسماء العربية صح
+    yield "\ufeff"
+    for row in rows:
+        yield writer.writerow(["" if v is None else v for v in row])
+
+
+class _ChunkBuffer:
+    """
+    fp مش seekable لـ zipfile: بيجمع اللي انكتب لحد ما ناخده بـ drain().
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _xlsx_row(r: int, row) -> str:
+    cells = []
+    for c, value in enumerate(row):
+        if value is None:
+            continue
+        ref = f"{_column_letter(c)}{r}"
+        if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(_XML_ILLEGAL.sub("", str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{r}">{"".join(cells)}</row>'
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def iter_xlsx(rows, sheet_name: str = "Payroll"):
+    """
+    XLSX (SpreadsheetML) بـ zipfile على fp مش seekable: الـ sheet بينضغط وبينبعت row ورا row
+    بدل ما ينبنى الملف كله (openpyxl حتى بـ write_only بيكتب الملف كامل قبل ما نقدر نبعته).
+    """
+    buf = _ChunkBuffer()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _xlsx_workbook(sheet_name))
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            for r, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(r, row).encode("utf-8"))
+                chunk = buf.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(b"</sheetData></worksheet>")
+
+    yield buf.drain()
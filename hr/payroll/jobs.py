@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from hr.payroll.models import (
+    PayrollJob,
+    PayrollJobKind,
+    PayrollJobStatus,
+    PayrollRun,
+    PAYROLL_JOB_ACTIVE_STATUSES,
+)
+from hr.payroll.services import generate_payroll_items, recompute_dirty_payroll_items
+
+
+JOB_ERRORS_LIMIT = 100
+
+
+class PayrollJobLost(Exception):
+    """
+    الـ job ما عادت running (fail_stale_jobs علّمها failed)، فالكتابة لازم تنلغى.
+    """
+
+
+def get_active_job(run: PayrollRun) -> PayrollJob | None:
+    return (
+        PayrollJob.objects
+        .filter(payroll_run=run, status__in=PAYROLL_JOB_ACTIVE_STATUSES)
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def enqueue_payroll_job(run: PayrollRun, kind: str = PayrollJobKind.GENERATE, user=None) -> tuple[PayrollJob, bool]:
+    """
+    بيرجع (job, created). إذا في job شغالة/بالانتظار لنفس الـ run منرجعها بدل ما نعمل وحدة تانية.
+    """
+    existing = get_active_job(run)
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            job = PayrollJob.objects.create(payroll_run=run, kind=kind, requested_by=user)
+    except IntegrityError:
+        # سباق بين طلبين بنفس اللحظة: الـ constraint منع التاني
+        existing = get_active_job(run)
+        if existing:
+            return existing, False
+        raise
+    return job, True
+
+
+def claim_next_job() -> PayrollJob | None:
+    """
+    claim بـ UPDATE مشروط (status=queued) لحتى ما ياخد نفس الـ job اتنين workers.
+    """
+    while True:
+        job = (
+            PayrollJob.objects
+            .filter(status=PayrollJobStatus.QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        claimed = PayrollJob.objects.filter(pk=job.pk, status=PayrollJobStatus.QUEUED).update(
+            status=PayrollJobStatus.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def fail_stale_jobs(stale_after: timedelta) -> int:
+    """
+    jobs بحالة running بدون heartbeat من زمان (worker مات) → failed، لحتى ما تسكّر الـ run.
+    """
+    cutoff = timezone.now() - stale_after
+    return PayrollJob.objects.filter(
+        status=PayrollJobStatus.RUNNING,
+        heartbeat_at__lt=cutoff,
+    ).update(
+        status=PayrollJobStatus.FAILED,
+        error_message="Worker stopped responding.",
+        finished_at=timezone.now(),
+    )
+
+
+def run_payroll_job(job: PayrollJob, workers: int | None = None) -> PayrollJob:
+    running = PayrollJob.objects.filter(pk=job.pk, status=PayrollJobStatus.RUNNING)
+
+    def progress(processed, total):
+        running.update(
+            processed=processed,
+            total=total,
+            heartbeat_at=timezone.now(),
+        )
+
+    def checkpoint():
+        # جوّا transaction الكتابة: الـ UPDATE بيقفل row الـ job لحد الـ commit، فـ fail_stale_jobs
+        # بيستنّى وبيشوف الـ heartbeat الجديد؛ وإذا سبقنا وعلّمها failed منلغي الكتابة
+        if not running.update(heartbeat_at=timezone.now()):
+            raise PayrollJobLost(f"Payroll job {job.pk} is no longer running.")
+
+    run = PayrollRun.objects.select_related("company").get(pk=job.payroll_run_id)
+
+    try:
+        if job.kind == PayrollJobKind.DIRTY:
+            result = recompute_dirty_payroll_items(run, workers=workers, progress=progress, checkpoint=checkpoint)
+        else:
+            result = generate_payroll_items(run, workers=workers, progress=progress, checkpoint=checkpoint)
+    except PayrollJobLost:
+        pass  # الحالة (failed) محطوطة من قبل، وما انكتب شي
+    except Exception as e:
+        running.update(
+            status=PayrollJobStatus.FAILED,
+            error_message="; ".join(getattr(e, "messages", None) or [str(e)]),
+            finished_at=timezone.now(),
+        )
+    else:
+        errors = result.get("errors_preview", [])
+        running.update(
+            status=PayrollJobStatus.SUCCEEDED,
+            result=result,
+            errors=errors[:JOB_ERRORS_LIMIT],
+            finished_at=timezone.now(),
+        )
+
+    job.refresh_from_db()
+    return job
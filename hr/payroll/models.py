@@ -1,9 +1,11 @@
 from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db.models import Sum
 
-from hr.org_structure.models import Company
+from hr.org_structure.models import Company, Department
 from hr.employees.models import Employee
 
 
@@ -89,6 +91,26 @@ class PayrollRun(models.Model):
 
         super().save(update_fields=["total_employees", "total_gross", "total_net"])
 
+    def apply_totals_delta(self, employees=0, gross=Decimal("0.00"), net=Decimal("0.00")):
+        """
+        تعديل الـ totals بالفرق بـ UPDATE وحدة (F expressions) بدل COUNT + SUM على كل الـ items.
+        """
+        if not employees and not gross and not net:
+            return
+        PayrollRun.shift_totals(self.pk, employees=employees, gross=gross, net=net)
+        self.refresh_from_db(fields=["total_employees", "total_gross", "total_net"])
+
+    @classmethod
+    def shift_totals(cls, run_id, employees=0, gross=Decimal("0.00"), net=Decimal("0.00")):
+        """
+        نفس apply_totals_delta بس بالـ id (من الـ signals، بدون ما نحمّل الـ run).
+        """
+        cls.objects.filter(pk=run_id).update(
+            total_employees=models.F("total_employees") + employees,
+            total_gross=models.F("total_gross") + gross,
+            total_net=models.F("total_net") + net,
+        )
+
 
 class PayslipStatus(models.TextChoices):
     PAID = "paid", "Paid"
@@ -96,6 +118,24 @@ class PayslipStatus(models.TextChoices):
     CANCELLED = "cancelled", "Cancelled"
 
 
+# حقل typed على PayrollItem → مفتاح بالـ breakdown (نفس الأرقام بس قابلة للـ aggregate بـ SQL)
+PAYROLL_BREAKDOWN_COLUMNS = {
+    "expected_work_days": "expected_work_days",
+    "expected_hours": "expected_hours",
+    "worked_hours": "worked_hours",
+    "hourly_rate": "hourly_rate",
+    "late_minutes": "late_minutes",
+    "late_deduction": "late_deduction",
+    "early_leave_minutes": "early_leave_minutes",
+    "early_deduction": "early_deduction",
+    "absent_hours": "absent_hours",
+    "absent_deduction": "absent_deduction",
+    "unpaid_leave_hours": "unpaid_leave_hours",
+    "unpaid_leave_deduction": "unpaid_leave_deduction",
+    "overtime_hours": "overtime_hours_used",
+}
+
+
 class PayrollItem(models.Model):
     payroll_run = models.ForeignKey(
         PayrollRun,
@@ -147,6 +187,29 @@ class PayrollItem(models.Model):
     # ✅ مهم للـ Advanced Payroll: نخزن التفاصيل (late/early/overtime/absent/hourly_rate...)
     breakdown = models.JSONField(default=dict, blank=True)
 
+    # نسخة typed من أرقام الـ breakdown للتقارير (بتتعبى من الـ breakdown وقت الحفظ)
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payroll_items",
+        help_text="قسم الموظف وقت توليد الراتب.",
+    )
+    expected_work_days = models.PositiveIntegerField(default=0)
+    expected_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    worked_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    hourly_rate = models.DecimalField(max_digits=12, decimal_places=4, default=Decimal("0.0000"))
+    late_minutes = models.PositiveIntegerField(default=0)
+    late_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    early_leave_minutes = models.PositiveIntegerField(default=0)
+    early_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    absent_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    absent_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    unpaid_leave_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    unpaid_leave_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -155,11 +218,26 @@ class PayrollItem(models.Model):
         unique_together = (("payroll_run", "employee"),)
         indexes = [
             models.Index(fields=["payroll_run", "employee"]),
+            models.Index(fields=["department", "payroll_run"]),
         ]
 
     def __str__(self):
         return f"{self.payroll_run} - {self.employee.employee_code}"
 
+    def fill_report_columns(self):
+        """
+        بيعبّي الأعمدة الـ typed من الـ breakdown + قسم الموظف الحالي.
+        """
+        breakdown = self.breakdown or {}
+        for field_name, key in PAYROLL_BREAKDOWN_COLUMNS.items():
+            value = breakdown.get(key) or 0
+            if isinstance(self._meta.get_field(field_name), models.DecimalField):
+                value = Decimal(str(value))
+            else:
+                value = int(value)
+            setattr(self, field_name, value)
+        self.department_id = self.employee.department_id
+
     def calculate_gross(self):
         return (
             (self.basic_salary or Decimal("0.00")) +
@@ -171,11 +249,98 @@ class PayrollItem(models.Model):
         gross = self.calculate_gross()
         return gross - (self.deductions or Decimal("0.00"))
 
+    @staticmethod
+    def _payslip_status_for(run):
+        # PAID فقط إذا الـ run صار Paid فعلياً
+        if run.status == PayrollRunStatus.PAID:
+            return PayslipStatus.PAID
+        return PayslipStatus.PENDING
+
+    @classmethod
+    def bulk_write(cls, run, items, update_totals=True, batch_size=500):
+        """
+        مسار الكتابة الجماعية: upsert لكل الـ items بدون full_clean / totals / payslip لكل row،
+        وبالأخير upsert وحدة للـ payslips و recalc وحدة للـ totals.
+        items: PayrollItem instances (unsaved) لنفس الـ run.
+        """
+        if run.status != PayrollRunStatus.DRAFT:
+            raise ValidationError("لا يمكن إضافة Payroll Item على Payroll Run ليست بحالة Draft.")
+
+        if not items:
+            if update_totals:
+                run.recalculate_totals()
+            return
+
+        for item in items:
+            item.payroll_run = run
+            item.gross_salary = item.calculate_gross()
+            item.net_salary = item.calculate_net()
+            item.fill_report_columns()
+
+        cls.objects.bulk_create(
+            items,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["payroll_run", "employee"],
+            update_fields=[
+                "basic_salary",
+                "allowances",
+                "overtime_pay",
+                "deductions",
+                "gross_salary",
+                "net_salary",
+                "currency",
+                "breakdown",
+                "department",
+                *PAYROLL_BREAKDOWN_COLUMNS,
+            ],
+        )
+
+        # bulk_create مع update_conflicts ما بيرجع pk على كل الـ backends، فمنجيبهم بـ query وحدة
+        # بدفعات لحتى الـ IN ما يتعدّى حد الـ parameters (SQLite)
+        employee_ids = [item.employee_id for item in items]
+        saved = []
+        for i in range(0, len(employee_ids), batch_size):
+            saved.extend(
+                cls.objects
+                .filter(payroll_run=run, employee_id__in=employee_ids[i:i + batch_size])
+                .values_list("id", "employee_id", "net_salary", "currency")
+                .order_by()
+            )
+
+        slip_status = cls._payslip_status_for(run)
+        Payslip.objects.bulk_create(
+            [
+                Payslip(
+                    employee_id=employee_id,
+                    year=run.year,
+                    month=run.month,
+                    payroll_run=run,
+                    payroll_item_id=item_id,
+                    net_amount=net_salary,
+                    currency=currency,
+                    status=slip_status,
+                )
+                for item_id, employee_id, net_salary, currency in saved
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["employee", "year", "month"],
+            update_fields=["payroll_run", "payroll_item", "net_amount", "currency", "status"],
+        )
+
+        if update_totals:
+            run.recalculate_totals()
+
     def save(self, *args, **kwargs):
         """
         kwargs:
           - skip_totals: إذا عم تولدي items كتير مرة وحدة (bulk) خليها True وبالأخير اعملي recalc مرة وحدة.
+            (للكتابة الجماعية الأفضل PayrollItem.bulk_write)
           - skip_payslip: إذا بدك تأجلي إنشاء/تحديث payslip.
+
+        الـ totals بتتعدل بالفرق (delta) عن القيم القديمة، مش بـ aggregate على كل الـ items.
+        الحذف (حتى QuerySet.delete() والـ admin) بيطرح من الـ totals بـ post_delete (hr/payroll/signals.py).
         """
         skip_totals = bool(kwargs.pop("skip_totals", False))
         skip_payslip = bool(kwargs.pop("skip_payslip", False))
@@ -188,21 +353,33 @@ class PayrollItem(models.Model):
 
         self.gross_salary = self.calculate_gross()
         self.net_salary = self.calculate_net()
+        self.fill_report_columns()
 
         self.full_clean()
+
+        old = None
+        if self.pk and not skip_totals:
+            old = PayrollItem.objects.filter(pk=self.pk).values_list("gross_salary", "net_salary").first()
+
         super().save(*args, **kwargs)
 
-        # ✅ تحديث totals
+        # ✅ تحديث totals بالفرق
         if not skip_totals:
-            self.payroll_run.recalculate_totals()
+            if old is None:
+                self.payroll_run.apply_totals_delta(
+                    employees=1,
+                    gross=self.gross_salary,
+                    net=self.net_salary,
+                )
+            else:
+                self.payroll_run.apply_totals_delta(
+                    gross=self.gross_salary - old[0],
+                    net=self.net_salary - old[1],
+                )
 
         # ✅ تحديث/إنشاء Payslip
         if not skip_payslip:
-            # PAID فقط إذا الـ run صار Paid فعلياً
-            if self.payroll_run.status == PayrollRunStatus.PAID:
-                slip_status = PayslipStatus.PAID
-            else:
-                slip_status = PayslipStatus.PENDING
+            slip_status = self._payslip_status_for(self.payroll_run)
 
             Payslip.objects.update_or_create(
                 employee=self.employee,
@@ -267,4 +444,112 @@ class Payslip(models.Model):
         unique_together = (("employee", "year", "month"),)
 
     def __str__(self):
-        return f"Payslip {self.employee} - {self.year}-{self.month} ({self.net_amount} {self.currency})"
\ No newline at end of file
+        return f"Payslip {self.employee} - {self.year}-{self.month} ({self.net_amount} {self.currency})"
+
+class PayrollDirtyEmployee(models.Model):
+    """
+    موظف تغيرت مدخلاته (حضور/إجازات/أوفرتايم/عقد/شفت) ضمن فترة Payroll Run لسا Draft،
+    فلازم ينعاد حساب الـ PayrollItem تبعه.
+    """
+    payroll_run = models.ForeignKey(
+        PayrollRun,
+        on_delete=models.CASCADE,
+        related_name="dirty_employees",
+    )
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name="payroll_dirty_marks",
+    )
+    reason = models.CharField(max_length=50, blank=True, default="")
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = (("payroll_run", "employee"),)
+
+    def __str__(self):
+        return f"{self.payroll_run} - {self.employee.employee_code} ({self.reason})"
+
+
+class PayrollJobKind(models.TextChoices):
+    GENERATE = "generate", "Generate All Items"
+    DIRTY = "dirty", "Recompute Dirty Items"
+
+
+class PayrollJobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+
+
+PAYROLL_JOB_ACTIVE_STATUSES = (PayrollJobStatus.QUEUED, PayrollJobStatus.RUNNING)
+
+
+class PayrollJob(models.Model):
+    """
+    توليد الرواتب كـ background job: الـ API بيعمل row هون وبيرجع فوراً،
+    والـ worker (manage.py run_payroll_jobs) بينفذ ويحدّث processed/total.
+    """
+    payroll_run = models.ForeignKey(
+        PayrollRun,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=PayrollJobKind.choices,
+        default=PayrollJobKind.GENERATE,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=PayrollJobStatus.choices,
+        default=PayrollJobStatus.QUEUED,
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payroll_jobs",
+    )
+
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            # ✅ job وحدة شغالة/بالانتظار لكل run
+            models.UniqueConstraint(
+                fields=["payroll_run"],
+                condition=models.Q(status__in=PAYROLL_JOB_ACTIVE_STATUSES),
+                name="payroll_job_one_active_per_run",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.payroll_run} - {self.kind} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in PAYROLL_JOB_ACTIVE_STATUSES
+
+    @property
+    def eta_seconds(self):
+        if self.status != PayrollJobStatus.RUNNING or not self.started_at or not self.processed or not self.total:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(self.total - self.processed, 0)
+        return round(elapsed / self.processed * remaining, 1)
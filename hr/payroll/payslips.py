@@ -0,0 +1,322 @@
+"""
+توليد ملفات PDF لكشوف الرواتب (Payslip.file) لدورة كاملة.
+
+- المحتوى منبنيه من PayrollItem (+ breakdown) كـ dict بسيط (context) قابل للـ pickle.
+- اسم الملف فيه hash للـ context، فإذا ما تغيّر شي والملف موجود ما منعيد الرسم.
+- الرسم والكتابة عالـ storage بيصيروا بالـ workers (ملف ملف)، والـ main process
+  بس بيستلم الأسماء وبيعمل bulk_update لـ Payslip.file.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from hr.payroll.models import PayrollRun, Payslip
+from hr.payroll.pdf_fonts import FontError, TrueTypeFont, font_objects, load_truetype, prepare_text
+from hr.payroll import workers as payroll_workers
+
+
+# غيّرها لما يتغير شكل الـ PDF لحتى ينعاد رسم كل الكشوف
+PAYSLIP_RENDER_VERSION = 2
+PAYSLIP_UPLOAD_DIR = "payslips"
+PAYSLIP_SHARDS_PER_WORKER = 4
+PAYSLIP_UPDATE_BATCH_SIZE = 500
+
+# fonts-dejavu-core: فيه عربي (Presentation Forms-B) ولاتيني
+DEFAULT_PAYSLIP_FONTS = {
+    "regular": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "bold": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+}
+
+PAYSLIP_BREAKDOWN_ROWS = [
+    ("Expected work days", "expected_work_days"),
+    ("Expected hours", "expected_hours"),
+    ("Worked hours", "worked_hours"),
+    ("Hourly rate", "hourly_rate"),
+    ("Late minutes", "late_minutes"),
+    ("Late deduction", "late_deduction"),
+    ("Early leave minutes", "early_leave_minutes"),
+    ("Early leave deduction", "early_deduction"),
+    ("Absent hours", "absent_hours"),
+    ("Absent deduction", "absent_deduction"),
+    ("Unpaid leave hours", "unpaid_leave_hours"),
+    ("Unpaid leave deduction", "unpaid_leave_deduction"),
+    ("Overtime hours", "overtime_hours_used"),
+    ("Overtime multiplier", "overtime_multiplier"),
+]
+
+
+def payslip_context(slip: Payslip) -> dict:
+    item = slip.payroll_item
+    employee = slip.employee
+    run = slip.payroll_run
+    breakdown = item.breakdown or {}
+
+    return {
+        "company": run.company.name if run else "",
+        "run": run.name if run else "",
+        "year": slip.year,
+        "month": slip.month,
+        "period_start": breakdown.get("period_start", str(run.period_start) if run else ""),
+        "period_end": breakdown.get("period_end", str(run.period_end) if run else ""),
+        "employee_code": employee.employee_code,
+        "employee_name": employee.user.get_full_name() or employee.user.username,
+        "currency": item.currency,
+        "basic_salary": str(item.basic_salary),
+        "allowances": str(item.allowances),
+        "overtime_pay": str(item.overtime_pay),
+        "deductions": str(item.deductions),
+        "gross_salary": str(item.gross_salary),
+        "net_salary": str(item.net_salary),
+        "breakdown": [
+            (label, str(breakdown[key])) for label, key in PAYSLIP_BREAKDOWN_ROWS if key in breakdown
+        ],
+    }
+
+
+def payslip_hash(context: dict) -> str:
+    raw = json.dumps([PAYSLIP_RENDER_VERSION, context], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def payslip_file_name(context: dict, digest: str) -> str:
+    return (
+        f"{PAYSLIP_UPLOAD_DIR}/{context['year']}/{context['month']:02d}/"
+        f"{context['employee_code']}-{digest[:16]}.pdf"
+    )
+
+
+def _pdf_text(value) -> str:
+    # Helvetica الأساسية (لما ما في خط مضمّن) بتدعم Latin-1 بس
+    return str(value).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _payslip_fonts() -> dict[str, TrueTypeFont] | None:
+    paths = getattr(settings, "PAYSLIP_FONTS", DEFAULT_PAYSLIP_FONTS)
+    try:
+        return {key: load_truetype(paths[key]) for key in ("regular", "bold")}
+    except (OSError, KeyError, FontError):
+        return None
+
+
+def _layout(context: dict) -> list[tuple[bool, int, int, int, str]]:
+    """
+    [(bold, size, x, y, text)] بالترتيب.
+    """
+    rows = []
+    y = 800
+
+    def text(x, size, value, bold=False):
+        rows.append((bold, size, x, y, str(value)))
+
+    text(50, 18, "Payslip", bold=True)
+    y -= 24
+    text(50, 11, context["company"])
+    y -= 16
+    text(50, 11, f"Period: {context['period_start']} - {context['period_end']}")
+    y -= 16
+    text(50, 11, f"Employee: {context['employee_code']} - {context['employee_name']}")
+    y -= 30
+
+    currency = context["currency"]
+    for label, key in (
+        ("Basic salary", "basic_salary"),
+        ("Allowances", "allowances"),
+        ("Overtime pay", "overtime_pay"),
+        ("Gross salary", "gross_salary"),
+        ("Deductions", "deductions"),
+    ):
+        text(50, 11, label)
+        text(350, 11, f"{context[key]} {currency}")
+        y -= 16
+    y -= 4
+    text(50, 12, "Net salary", bold=True)
+    text(350, 12, f"{context['net_salary']} {currency}", bold=True)
+    y -= 30
+
+    if context["breakdown"]:
+        text(50, 12, "Details", bold=True)
+        y -= 18
+        for label, value in context["breakdown"]:
+            text(50, 10, label)
+            text(350, 10, value)
+            y -= 14
+    return rows
+
+
+def render_payslip_pdf(context: dict) -> bytes:
+    """
+    PDF صفحة وحدة (A4) بدون مكتبات خارجية. ما فيه تاريخ إنشاء لحتى يكون الناتج ثابت لنفس الـ context.
+    الخطوط (PAYSLIP_FONTS) بتنضمّ subset لحتى الأسماء العربية تطلع صح (hr/payroll/pdf_fonts.py)؛
+    إذا ما لقينا الخط منرجع لـ Helvetica بس للنص اللي كله Latin-1.
+    """
+    rows = _layout(context)
+    fonts = _payslip_fonts()
+
+    lines = []
+    if fonts is None:
+        if not all(_is_latin1(value) for *_, value in rows):
+            raise FontError("Payslip font not found (PAYSLIP_FONTS); cannot render non Latin-1 text.")
+        for bold, size, x, y, value in rows:
+            lines.append(f"BT /{'F2' if bold else 'F1'} {size} Tf {x} {y} Td ({_pdf_text(value)}) Tj ET")
+        font_resources = [
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        ]
+        font_refs = (4, 5)
+    else:
+        used = {"regular": {}, "bold": {}}
+        for bold, size, x, y, value in rows:
+            key = "bold" if bold else "regular"
+            font = fonts[key]
+            glyphs = []
+            for ch in prepare_text(value):
+                gid = font.gid(ch)
+                used[key].setdefault(gid, ch)
+                glyphs.append(f"{gid:04X}")
+            lines.append(f"BT /{'F2' if bold else 'F1'} {size} Tf {x} {y} Td <{''.join(glyphs)}> Tj ET")
+        regular = font_objects(fonts["regular"], used["regular"], first_id=4)
+        font_resources = regular + font_objects(fonts["bold"], used["bold"], first_id=4 + len(regular))
+        font_refs = (4, 4 + len(regular))
+
+    stream = "\n".join(lines).encode("latin-1")
+    content_id = 4 + len(font_resources)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_refs[0]} 0 R /F2 {font_refs[1]} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>"
+        ).encode("latin-1"),
+        *font_resources,
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _is_latin1(value: str) -> bool:
+    try:
+        value.encode("latin-1")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def render_payslip_files(tasks: list[tuple[int, str, dict]]) -> list[tuple[int, str | None, str | None]]:
+    """
+    tasks: [(payslip_id, file_name, context)] → [(payslip_id, saved_name, error)]
+    كل ملف بينكتب عالـ storage فوراً، فما منجمع PDFs بالذاكرة.
+    """
+    out = []
+    for payslip_id, name, context in tasks:
+        try:
+            if default_storage.exists(name):
+                # نفس الـ hash → نفس المحتوى (ملف من محاولة سابقة ما انحفظ اسمه)
+                saved = name
+            else:
+                saved = default_storage.save(name, ContentFile(render_payslip_pdf(context)))
+        except Exception as e:
+            out.append((payslip_id, None, str(e)))
+        else:
+            out.append((payslip_id, saved, None))
+    return out
+
+
+def _render_parallel(tasks, workers: int, progress=None):
+    shard_size = max(1, math.ceil(len(tasks) / (workers * PAYSLIP_SHARDS_PER_WORKER)))
+    shards = [tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=payroll_workers.init_worker) as pool:
+        futures = [pool.submit(payroll_workers.render_payslip_shard, shard) for shard in shards]
+        for fut in as_completed(futures):
+            results.extend(fut.result())
+            if progress:
+                progress(len(results), len(tasks))
+    return results
+
+
+def render_run_payslips(run: PayrollRun, workers: int | None = None, force: bool = False, progress=None) -> dict:
+    """
+    بيرسم كشوف الدورة اللي تغيّر محتواها (أو كلها مع force) وبيحدّث Payslip.file بـ bulk_update.
+    """
+    slips = list(
+        Payslip.objects
+        .filter(payroll_run=run, payroll_item__isnull=False)
+        .select_related("payroll_item", "employee__user", "payroll_run__company")
+        .order_by("id")
+    )
+
+    tasks = []
+    unchanged = 0
+    for slip in slips:
+        context = payslip_context(slip)
+        name = payslip_file_name(context, payslip_hash(context))
+        if not force and slip.file and slip.file.name == name and default_storage.exists(name):
+            unchanged += 1
+            continue
+        if force and default_storage.exists(name):
+            default_storage.delete(name)
+        tasks.append((slip.id, name, context))
+
+    if workers is None:
+        workers = getattr(settings, "PAYROLL_WORKERS", 1)
+    workers = max(1, int(workers or 1))
+
+    if progress:
+        progress(0, len(tasks))
+    if workers > 1 and len(tasks) > 1:
+        results = _render_parallel(tasks, workers, progress=progress)
+    else:
+        results = render_payslip_files(tasks)
+        if progress:
+            progress(len(tasks), len(tasks))
+
+    by_id = {slip.id: slip for slip in slips}
+    updated = []
+    stale_files = []
+    errors = []
+    for payslip_id, saved, error in results:
+        slip = by_id[payslip_id]
+        if error:
+            errors.append({"employee_code": slip.employee.employee_code, "error": error})
+            continue
+        if slip.file and slip.file.name != saved:
+            stale_files.append(slip.file.name)
+        slip.file = saved
+        updated.append(slip)
+
+    Payslip.objects.bulk_update(updated, ["file"], batch_size=PAYSLIP_UPDATE_BATCH_SIZE)
+
+    # الملفات القديمة (hash قديم) ما عاد حدا بيأشر عليها
+    for name in stale_files:
+        if name.startswith(f"{PAYSLIP_UPLOAD_DIR}/"):
+            default_storage.delete(name)
+
+    return {
+        "run_id": run.id,
+        "payslips": len(slips),
+        "rendered": len(updated),
+        "unchanged": unchanged,
+        "failed": len(errors),
+        "errors_preview": errors[:20],
+    }
@@ -0,0 +1,546 @@
+"""
+نص Unicode (عربي) بالـ PDF تبع الكشوف بدون مكتبات خارجية:
+
+- TrueType (الافتراضي DejaVu Sans من fonts-dejavu-core) بينضمّ كـ CIDFontType2 / Identity-H،
+  subset: بس الـ glyphs المستعملة بتضل بجدول glyf، فالملف بيضل عشرات الـ KB.
+- shaping للعربي: كل حرف بياخد شكله (معزول / أول / وسط / آخر) من Arabic Presentation
+  Forms-B + لام ألف، لأنه ما في GSUB بالـ PDF.
+- ترتيب بصري لكل سطر (subset من UAX #9): اتجاه السطر من أول حرف strong، والأرقام واللاتيني جوّا العربي بيضلّوا LTR.
+"""
+from __future__ import annotations
+
+import hashlib
+import struct
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+# --- Arabic shaping ---
+
+# الحرف → (isolated, final, initial, medial)؛ اللي بيتصل من اليمين بس إله شكلين
+_ARABIC_FORMS = {
+    0x0621: (0xFE80,),
+    0x0622: (0xFE81, 0xFE82),
+    0x0623: (0xFE83, 0xFE84),
+    0x0624: (0xFE85, 0xFE86),
+    0x0625: (0xFE87, 0xFE88),
+    0x0626: (0xFE89, 0xFE8A, 0xFE8B, 0xFE8C),
+    0x0627: (0xFE8D, 0xFE8E),
+    0x0628: (0xFE8F, 0xFE90, 0xFE91, 0xFE92),
+    0x0629: (0xFE93, 0xFE94),
+    0x062A: (0xFE95, 0xFE96, 0xFE97, 0xFE98),
+    0x062B: (0xFE99, 0xFE9A, 0xFE9B, 0xFE9C),
+    0x062C: (0xFE9D, 0xFE9E, 0xFE9F, 0xFEA0),
+    0x062D: (0xFEA1, 0xFEA2, 0xFEA3, 0xFEA4),
+    0x062E: (0xFEA5, 0xFEA6, 0xFEA7, 0xFEA8),
+    0x062F: (0xFEA9, 0xFEAA),
+    0x0630: (0xFEAB, 0xFEAC),
+    0x0631: (0xFEAD, 0xFEAE),
+    0x0632: (0xFEAF, 0xFEB0),
+    0x0633: (0xFEB1, 0xFEB2, 0xFEB3, 0xFEB4),
+    0x0634: (0xFEB5, 0xFEB6, 0xFEB7, 0xFEB8),
+    0x0635: (0xFEB9, 0xFEBA, 0xFEBB, 0xFEBC),
+    0x0636: (0xFEBD, 0xFEBE, 0xFEBF, 0xFEC0),
+    0x0637: (0xFEC1, 0xFEC2, 0xFEC3, 0xFEC4),
+    0x0638: (0xFEC5, 0xFEC6, 0xFEC7, 0xFEC8),
+    0x0639: (0xFEC9, 0xFECA, 0xFECB, 0xFECC),
+    0x063A: (0xFECD, 0xFECE, 0xFECF, 0xFED0),
+    0x0641: (0xFED1, 0xFED2, 0xFED3, 0xFED4),
+    0x0642: (0xFED5, 0xFED6, 0xFED7, 0xFED8),
+    0x0643: (0xFED9, 0xFEDA, 0xFEDB, 0xFEDC),
+    0x0644: (0xFEDD, 0xFEDE, 0xFEDF, 0xFEE0),
+    0x0645: (0xFEE1, 0xFEE2, 0xFEE3, 0xFEE4),
+    0x0646: (0xFEE5, 0xFEE6, 0xFEE7, 0xFEE8),
+    0x0647: (0xFEE9, 0xFEEA, 0xFEEB, 0xFEEC),
+    0x0648: (0xFEED, 0xFEEE),
+    0x0649: (0xFEEF, 0xFEF0),
+    0x064A: (0xFEF1, 0xFEF2, 0xFEF3, 0xFEF4),
+}
+# لام + ألف → (isolated, final)
+_LAM_ALEF = {
+    0x0622: (0xFEF5, 0xFEF6),
+    0x0623: (0xFEF7, 0xFEF8),
+    0x0625: (0xFEF9, 0xFEFA),
+    0x0627: (0xFEFB, 0xFEFC),
+}
+_TATWEEL = 0x0640
+_MIRRORED = {"(": ")", ")": "(", "[": "]", "]": "[", "{": "}", "}": "{", "<": ">", ">": "<"}
+
+
+def _is_transparent(ch: str) -> bool:
+    # حركات وشدّة: ما بيقطعوا الوصل
+    return unicodedata.category(ch) == "Mn"
+
+
+def _joins_forward(ch: str | None) -> bool:
+    if ch is None:
+        return False
+    cp = ord(ch)
+    return cp == _TATWEEL or len(_ARABIC_FORMS.get(cp, ())) == 4
+
+
+def _joins_back(ch: str | None) -> bool:
+    if ch is None:
+        return False
+    cp = ord(ch)
+    return cp == _TATWEEL or len(_ARABIC_FORMS.get(cp, ())) >= 2
+
+
+def shape_arabic(text: str) -> str:
+    """
+    بالترتيب المنطقي: كل حرف عربي بيتبدّل بشكله حسب اللي قبله وبعده (Presentation Forms-B).
+    """
+    chars = list(text)
+    out = []
+
+    def neighbour(i, step):
+        i += step
+        while 0 <= i < len(chars) and _is_transparent(chars[i]):
+            i += step
+        return chars[i] if 0 <= i < len(chars) else None
+
+    i = 0
+    while i < len(chars):
+        ch = chars[i]
+        cp = ord(ch)
+        forms = _ARABIC_FORMS.get(cp)
+        if forms is None:
+            out.append(ch)
+            i += 1
+            continue
+
+        prev = neighbour(i, -1)
+        joins_prev = _joins_forward(prev) and len(forms) >= 2
+
+        nxt = neighbour(i, 1)
+        if cp == 0x0644 and nxt is not None and ord(nxt) in _LAM_ALEF:
+            isolated, final = _LAM_ALEF[ord(nxt)]
+            out.append(chr(final if joins_prev else isolated))
+            # منشيل الألف (والحركات اللي بيناتهم بتضل بعد الـ ligature)
+            j = i + 1
+            while _is_transparent(chars[j]):
+                out.append(chars[j])
+                j += 1
+            i = j + 1
+            continue
+
+        joins_next = len(forms) == 4 and _joins_back(nxt)
+        if joins_prev and joins_next:
+            form = forms[3]
+        elif joins_prev:
+            form = forms[1]
+        elif joins_next:
+            form = forms[2]
+        else:
+            form = forms[0]
+        out.append(chr(form))
+        i += 1
+    return "".join(out)
+
+
+def _bidi_type(ch: str) -> str:
+    bidi = unicodedata.bidirectional(ch)
+    if bidi in ("R", "AL"):
+        return "R"
+    if bidi in ("EN", "AN"):
+        return "EN"
+    if bidi == "L":
+        return "L"
+    if bidi == "NSM":
+        return "NSM"
+    if bidi in ("ES", "ET", "CS"):
+        return bidi
+    return "N"
+
+
+def _strong(t: str) -> str | None:
+    # للـ N0 / N1 الأرقام بتنحسب R
+    return "L" if t == "L" else ("R" if t in ("R", "EN") else None)
+
+
+def visual_order(text: str) -> str:
+    """
+    ترتيب بصري لسطر واحد، subset من UAX #9 بدون embeddings: اتجاه الفقرة من أول حرف strong،
+    W1 / W4 / W5 / W7، الأقواس (N0)، N1 / N2، وبعدين L2 (قلب حسب الـ level) مع عكس الأقواس.
+    """
+    types = [_bidi_type(ch) for ch in text]
+    if "R" not in types:
+        return text
+    base = next(t for t in types if t in ("L", "R"))
+    n = len(types)
+
+    # W1: الحركات بتاخد نوع اللي قبلها
+    for i, t in enumerate(types):
+        if t == "NSM":
+            types[i] = types[i - 1] if i else base
+    # W4 / W5: فاصل بين رقمين، و ET لاصق برقم → رقم
+    for i in range(1, n - 1):
+        if types[i] in ("ES", "CS") and types[i - 1] == types[i + 1] == "EN":
+            types[i] = "EN"
+    for i, t in enumerate(types):
+        if t == "ET" and ((i and types[i - 1] == "EN") or (i + 1 < n and types[i + 1] == "EN")):
+            types[i] = "EN"
+    types = ["N" if t in ("ES", "ET", "CS") else t for t in types]
+    # W7: رقم بعد L → L
+    last = base
+    for i, t in enumerate(types):
+        if t in ("L", "R"):
+            last = t
+        elif t == "EN" and last == "L":
+            types[i] = "L"
+
+    # N0: الأقواس بتاخد اتجاه اللي جوّاتها
+    stack = []
+    for i, ch in enumerate(text):
+        if types[i] != "N":
+            continue
+        if ch in "([{":
+            stack.append((i, ch))
+        elif ch in ")]}" and stack and _MIRRORED[stack[-1][1]] == ch:
+            opening, _ = stack.pop()
+            inside = {_strong(t) for t in types[opening + 1:i]} - {None}
+            if base in inside:
+                direction = base
+            elif inside:
+                before = next((_strong(t) for t in reversed(types[:opening]) if _strong(t)), base)
+                direction = inside.pop() if before != base else base
+            else:
+                continue
+            types[opening] = types[i] = direction
+
+    # N1 / N2
+    i = 0
+    while i < n:
+        if types[i] != "N":
+            i += 1
+            continue
+        j = i
+        while j < n and types[j] == "N":
+            j += 1
+        before = next((_strong(t) for t in reversed(types[:i]) if _strong(t)), base)
+        after = next((_strong(t) for t in types[j:] if _strong(t)), base)
+        direction = before if before == after else base
+        types[i:j] = [direction] * (j - i)
+        i = j
+
+    if base == "L":
+        levels = [{"L": 0, "R": 1, "EN": 2}[t] for t in types]
+    else:
+        levels = [{"L": 2, "R": 1, "EN": 2}[t] for t in types]
+
+    chars = [_MIRRORED.get(ch, ch) if level % 2 else ch for ch, level in zip(text, levels)]
+    for level in range(max(levels), 0, -1):
+        i = 0
+        while i < n:
+            if levels[i] < level:
+                i += 1
+                continue
+            j = i
+            while j < n and levels[j] >= level:
+                j += 1
+            chars[i:j] = chars[i:j][::-1]
+            levels[i:j] = levels[i:j][::-1]
+            i = j
+    return "".join(chars)
+
+
+def prepare_text(text: str) -> str:
+    return visual_order(shape_arabic(str(text)))
+
+
+# --- TrueType ---
+
+_KEEP_TABLES = ("cvt ", "fpgm", "glyf", "head", "hhea", "hmtx", "loca", "maxp", "prep")
+
+_ARG_1_AND_2_ARE_WORDS = 0x0001
+_WE_HAVE_A_SCALE = 0x0008
+_MORE_COMPONENTS = 0x0020
+_WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+_WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+class FontError(Exception):
+    pass
+
+
+@dataclass
+class TrueTypeFont:
+    name: str
+    data: bytes
+    tables: dict[str, tuple[int, int]]
+    units_per_em: int
+    bbox: tuple[int, int, int, int]
+    ascent: int
+    descent: int
+    cap_height: int
+    italic_angle: float
+    advances: list[int]
+    cmap: dict[int, int]
+    glyph_offsets: list[int]
+
+    def table(self, tag: str) -> bytes:
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def glyph(self, gid: int) -> bytes:
+        start, end = self.glyph_offsets[gid], self.glyph_offsets[gid + 1]
+        offset = self.tables["glyf"][0]
+        return self.data[offset + start:offset + end]
+
+    def gid(self, ch: str) -> int:
+        return self.cmap.get(ord(ch), 0)
+
+    def width(self, gid: int) -> int:
+        # بوحدات الـ PDF (1000 / em)
+        return round(self.advances[gid] * 1000 / self.units_per_em)
+
+
+def _parse_cmap(data: bytes, offset: int) -> dict[int, int]:
+    _, count = struct.unpack_from(">HH", data, offset)
+    subtables = {}
+    for i in range(count):
+        platform, encoding, sub = struct.unpack_from(">HHI", data, offset + 4 + 8 * i)
+        subtables[(platform, encoding)] = offset + sub
+
+    for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+        if key not in subtables:
+            continue
+        sub = subtables[key]
+        fmt = struct.unpack_from(">H", data, sub)[0]
+        mapping = {}
+        if fmt == 12:
+            groups = struct.unpack_from(">I", data, sub + 12)[0]
+            for g in range(groups):
+                start, end, glyph = struct.unpack_from(">III", data, sub + 16 + 12 * g)
+                for cp in range(start, end + 1):
+                    mapping[cp] = glyph + cp - start
+            return mapping
+        if fmt == 4:
+            segments = struct.unpack_from(">H", data, sub + 6)[0] // 2
+            ends = struct.unpack_from(f">{segments}H", data, sub + 14)
+            starts = struct.unpack_from(f">{segments}H", data, sub + 16 + 2 * segments)
+            deltas = struct.unpack_from(f">{segments}h", data, sub + 16 + 4 * segments)
+            range_base = sub + 16 + 6 * segments
+            range_offsets = struct.unpack_from(f">{segments}H", data, range_base)
+            for s in range(segments):
+                for cp in range(starts[s], ends[s] + 1):
+                    if cp == 0xFFFF:
+                        continue
+                    if range_offsets[s] == 0:
+                        glyph = (cp + deltas[s]) & 0xFFFF
+                    else:
+                        at = range_base + 2 * s + range_offsets[s] + 2 * (cp - starts[s])
+                        glyph = struct.unpack_from(">H", data, at)[0]
+                        if glyph:
+                            glyph = (glyph + deltas[s]) & 0xFFFF
+                    if glyph:
+                        mapping[cp] = glyph
+            return mapping
+    raise FontError("No Unicode cmap in font.")
+
+
+@lru_cache(maxsize=8)
+def load_truetype(path: str) -> TrueTypeFont:
+    """
+    مرة وحدة لكل process (الـ workers تبع الرسم كمان).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    count = struct.unpack_from(">H", data, 4)[0]
+    tables = {}
+    for i in range(count):
+        tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+        tables[tag.decode("latin-1")] = (offset, length)
+    missing = {"cmap", "glyf", "head", "hhea", "hmtx", "loca", "maxp"} - set(tables)
+    if missing:
+        raise FontError(f"Not a TrueType (glyf) font, missing {sorted(missing)}: {path}")
+
+    head = tables["head"][0]
+    units_per_em = struct.unpack_from(">H", data, head + 18)[0]
+    bbox = struct.unpack_from(">4h", data, head + 36)
+    long_loca = struct.unpack_from(">h", data, head + 50)[0] == 1
+
+    hhea = tables["hhea"][0]
+    ascent, descent = struct.unpack_from(">hh", data, hhea + 4)
+    metrics = struct.unpack_from(">H", data, hhea + 34)[0]
+    glyphs = struct.unpack_from(">H", data, tables["maxp"][0] + 4)[0]
+
+    hmtx = tables["hmtx"][0]
+    advances = [struct.unpack_from(">H", data, hmtx + 4 * i)[0] for i in range(metrics)]
+    advances += [advances[-1]] * (glyphs - metrics)
+
+    loca = tables["loca"][0]
+    if long_loca:
+        glyph_offsets = list(struct.unpack_from(f">{glyphs + 1}I", data, loca))
+    else:
+        glyph_offsets = [o * 2 for o in struct.unpack_from(f">{glyphs + 1}H", data, loca)]
+
+    cap_height = ascent
+    if "OS/2" in tables and tables["OS/2"][1] >= 90:
+        version = struct.unpack_from(">H", data, tables["OS/2"][0])[0]
+        if version >= 2:
+            cap_height = struct.unpack_from(">h", data, tables["OS/2"][0] + 88)[0]
+    italic_angle = 0.0
+    if "post" in tables:
+        italic_angle = struct.unpack_from(">i", data, tables["post"][0] + 4)[0] / 65536
+
+    name = path.rsplit("/", 1)[-1].rsplit(".", 1)[0].replace(" ", "")
+    return TrueTypeFont(
+        name=name,
+        data=data,
+        tables=tables,
+        units_per_em=units_per_em,
+        bbox=tuple(bbox),
+        ascent=ascent,
+        descent=descent,
+        cap_height=cap_height,
+        italic_angle=italic_angle,
+        advances=advances,
+        cmap=_parse_cmap(data, tables["cmap"][0]),
+        glyph_offsets=glyph_offsets,
+    )
+
+
+def _components(glyph: bytes) -> list[int]:
+    if len(glyph) < 10 or struct.unpack_from(">h", glyph, 0)[0] >= 0:
+        return []
+    out = []
+    pos = 10
+    while True:
+        flags, gid = struct.unpack_from(">HH", glyph, pos)
+        out.append(gid)
+        pos += 4 + (4 if flags & _ARG_1_AND_2_ARE_WORDS else 2)
+        if flags & _WE_HAVE_A_SCALE:
+            pos += 2
+        elif flags & _WE_HAVE_AN_X_AND_Y_SCALE:
+            pos += 4
+        elif flags & _WE_HAVE_A_TWO_BY_TWO:
+            pos += 8
+        if not flags & _MORE_COMPONENTS:
+            return out
+
+
+def _checksum(data: bytes) -> int:
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def subset_truetype(font: TrueTypeFont, gids: set[int]) -> bytes:
+    """
+    نفس الـ glyph ids (CIDToGIDMap /Identity)، بس glyf بيضل فيه الـ glyphs المطلوبة
+    ومكوّناتها؛ الباقي فاضي. الجداول اللي بيحتاجها الـ PDF بس.
+    """
+    keep = {0}
+    pending = list(gids)
+    while pending:
+        gid = pending.pop()
+        if gid in keep or gid >= len(font.advances):
+            continue
+        keep.add(gid)
+        pending.extend(_components(font.glyph(gid)))
+
+    glyf = bytearray()
+    loca = []
+    for gid in range(len(font.advances)):
+        loca.append(len(glyf))
+        if gid in keep:
+            glyf += font.glyph(gid)
+            glyf += b"\0" * (-len(glyf) % 4)
+    loca.append(len(glyf))
+
+    head = bytearray(font.table("head"))
+    struct.pack_into(">I", head, 8, 0)       # checkSumAdjustment
+    struct.pack_into(">h", head, 50, 1)      # indexToLocFormat: long
+
+    tables = {tag: font.table(tag) for tag in _KEEP_TABLES if tag in font.tables}
+    tables.update({
+        "glyf": bytes(glyf),
+        "loca": struct.pack(f">{len(loca)}I", *loca),
+        "head": bytes(head),
+    })
+
+    tags = sorted(tables)
+    count = len(tags)
+    power = 1 << (count.bit_length() - 1)
+    header = struct.pack(">IHHHH", 0x00010000, count, power * 16, power.bit_length() - 1, count * 16 - power * 16)
+
+    directory = bytearray()
+    body = bytearray()
+    offset = len(header) + 16 * count
+    for tag in tags:
+        data = tables[tag]
+        directory += struct.pack(">4sIII", tag.encode("latin-1"), _checksum(data), offset + len(body), len(data))
+        body += data + b"\0" * (-len(data) % 4)
+
+    out = bytearray(header + directory + body)
+    head_offset = offset + sum(len(tables[t]) + (-len(tables[t]) % 4) for t in tags[:tags.index("head")])
+    struct.pack_into(">I", out, head_offset + 8, (0xB1B0AFBA - _checksum(bytes(out))) & 0xFFFFFFFF)
+    return bytes(out)
+
+
+def _utf16_hex(text: str) -> str:
+    return text.encode("utf-16-be").hex().upper()
+
+
+def font_objects(font: TrueTypeFont, used: dict[int, str], first_id: int) -> list[bytes]:
+    """
+    objects الـ PDF لخط Type0 واحد (بتبلّش بـ first_id): Type0، CIDFont، FontDescriptor،
+    FontFile2 (مضغوط)، ToUnicode. used: {gid: النص الأصلي} للـ copy / search.
+    """
+    gids = sorted(used)
+    tag = "".join(chr(65 + b % 26) for b in hashlib.sha256(repr(gids).encode()).digest()[:6])
+    base_font = f"{tag}+{font.name}"
+    type0, cid_font, descriptor, font_file, to_unicode = range(first_id, first_id + 5)
+
+    widths = " ".join(f"{gid} [{font.width(gid)}]" for gid in gids)
+    scale = 1000 / font.units_per_em
+    bbox = " ".join(str(round(v * scale)) for v in font.bbox)
+    flags = 32 | (64 if font.italic_angle else 0)
+
+    program = subset_truetype(font, set(gids))
+    compressed = zlib.compress(program, 9)
+
+    cmap_lines = [
+        "/CIDInit /ProcSet findresource begin",
+        "12 dict begin",
+        "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def",
+        "/CMapType 2 def",
+        "1 begincodespacerange",
+        "<0000> <FFFF>",
+        "endcodespacerange",
+    ]
+    entries = [(gid, unicodedata.normalize("NFKC", used[gid])) for gid in gids if gid and used[gid]]
+    for i in range(0, len(entries), 100):
+        chunk = entries[i:i + 100]
+        cmap_lines.append(f"{len(chunk)} beginbfchar")
+        cmap_lines.extend(f"<{gid:04X}> <{_utf16_hex(text)}>" for gid, text in chunk)
+        cmap_lines.append("endbfchar")
+    cmap_lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    cmap = "\n".join(cmap_lines).encode("latin-1")
+
+    return [
+        (
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>"
+        ).encode("latin-1"),
+        (
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor} 0 R /CIDToGIDMap /Identity /DW 1000 /W [{widths}] >>"
+        ).encode("latin-1"),
+        (
+            f"<< /Type /FontDescriptor /FontName /{base_font} /Flags {flags} /FontBBox [{bbox}] "
+            f"/ItalicAngle {font.italic_angle:g} /Ascent {round(font.ascent * scale)} "
+            f"/Descent {round(font.descent * scale)} /CapHeight {round(font.cap_height * scale)} "
+            f"/StemV 80 /FontFile2 {font_file} 0 R >>"
+        ).encode("latin-1"),
+        (
+            f"<< /Length {len(compressed)} /Length1 {len(program)} /Filter /FlateDecode >>\nstream\n"
+        ).encode("latin-1") + compressed + b"\nendstream",
+        f"<< /Length {len(cmap)} >>\nstream\n".encode("latin-1") + cmap + b"\nendstream",
+    ]
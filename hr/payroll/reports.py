@@ -0,0 +1,216 @@
+"""
+تقارير الرواتب بالـ SQL (aggregate على أعمدة PayrollItem) بدون ما نفتح الـ breakdown JSON.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Func,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from hr.org_structure.models import Company
+from hr.payroll.models import PayrollItem, PayrollRun
+
+
+REPORT_SUM_FIELDS = [
+    "basic_salary",
+    "overtime_pay",
+    "deductions",
+    "net_salary",
+    "worked_hours",
+    "late_minutes",
+    "late_deduction",
+    "early_leave_minutes",
+    "early_deduction",
+    "absent_hours",
+    "absent_deduction",
+    "unpaid_leave_hours",
+    "unpaid_leave_deduction",
+    "overtime_hours",
+]
+
+REPORT_GROUPS = {
+    "department": ["department_id", "department_name"],
+    "month": ["month"],
+    "department_month": ["department_id", "department_name", "month"],
+}
+
+
+def payroll_breakdown_report(
+    company: Company,
+    year: int,
+    month: int | None = None,
+    group_by: str = "department",
+) -> list[dict]:
+    if group_by not in REPORT_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(REPORT_GROUPS)}")
+
+    qs = PayrollItem.objects.filter(payroll_run__company=company, payroll_run__year=year)
+    if month:
+        qs = qs.filter(payroll_run__month=month)
+
+    keys = REPORT_GROUPS[group_by]
+    rows = (
+        qs.annotate(month=F("payroll_run__month"), department_name=F("department__name"))
+        .values(*keys)
+        .annotate(employees=Count("employee", distinct=True), **{f: Sum(f) for f in REPORT_SUM_FIELDS})
+        .order_by(*keys)
+    )
+
+    # SQLite بيجمع الـ Decimal كـ float، فمنرجّع الدقة تبع الحقل كنص (DRF بيرندر Decimal كـ float)
+    places = {
+        f: Decimal(1).scaleb(-PayrollItem._meta.get_field(f).decimal_places)
+        for f in REPORT_SUM_FIELDS
+        if isinstance(PayrollItem._meta.get_field(f), DecimalField)
+    }
+    out = []
+    for row in rows:
+        for f, exp in places.items():
+            row[f] = str(Decimal(str(row[f] or 0)).quantize(exp))
+        out.append(row)
+    return out
+
+
+DIFF_COMPONENTS = {
+    "basic": "basic_salary",
+    "overtime": "overtime_pay",
+    "deductions": "deductions",
+    "net": "net_salary",
+}
+
+DIFF_ORDERINGS = {
+    "employee_code",
+    *(f"delta_{c}" for c in DIFF_COMPONENTS),
+    "abs_delta_net",
+}
+
+DIFF_STATUS_JOINED = "joined"
+DIFF_STATUS_LEFT = "left"
+DIFF_STATUS_CHANGED = "changed"
+
+
+def _money(expr):
+    return ExpressionWrapper(expr, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def payroll_run_diff_queryset(
+    base: PayrollRun,
+    target: PayrollRun,
+    threshold: Decimal = Decimal("0.01"),
+    status: str | None = None,
+    ordering: str = "-abs_delta_net",
+):
+    """
+    query وحدة (GROUP BY employee فوق items الدورتين) بترجع لكل موظف قيم base/target والفرق
+    لكل مكوّن، وحالته: joined (بس بالـ target)، left (بس بالـ base)، changed.
+    الفلترة (HAVING) والترتيب والـ LIMIT/OFFSET كلهم بالـ SQL.
+    threshold: بيرجع بس اللي |delta_net| >= threshold، بس joined/left دايماً بيطلعوا.
+    """
+    annotations = {}
+    for name, field_name in DIFF_COMPONENTS.items():
+        for side, run in (("base", base), ("target", target)):
+            annotations[f"{side}_{name}"] = Coalesce(
+                Sum(field_name, filter=Q(payroll_run=run)),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+
+    qs = (
+        PayrollItem.objects
+        .filter(payroll_run__in=[base, target])
+        .values("employee_id")
+        .annotate(
+            employee_code=F("employee__employee_code"),
+            first_name=F("employee__user__first_name"),
+            last_name=F("employee__user__last_name"),
+            in_base=Count("id", filter=Q(payroll_run=base)),
+            in_target=Count("id", filter=Q(payroll_run=target)),
+            **annotations,
+        )
+        .annotate(**{
+            f"delta_{name}": _money(F(f"target_{name}") - F(f"base_{name}"))
+            for name in DIFF_COMPONENTS
+        })
+        .annotate(
+            abs_delta_net=_money(Func(F("delta_net"), function="ABS")),
+            status=Case(
+                When(in_base=0, then=Value(DIFF_STATUS_JOINED)),
+                When(in_target=0, then=Value(DIFF_STATUS_LEFT)),
+                default=Value(DIFF_STATUS_CHANGED),
+                output_field=CharField(),
+            ),
+        )
+        .filter(Q(abs_delta_net__gte=threshold) | Q(in_base=0) | Q(in_target=0))
+    )
+
+    if status == DIFF_STATUS_JOINED:
+        qs = qs.filter(in_base=0)
+    elif status == DIFF_STATUS_LEFT:
+        qs = qs.filter(in_target=0)
+    elif status == DIFF_STATUS_CHANGED:
+        qs = qs.filter(in_base__gt=0, in_target__gt=0)
+
+    return qs.order_by(ordering, "employee_code")
+
+
+def money_str(value) -> str:
+    """
+    مبلغ بخانتين كنص: الـ JSONEncoder تبع DRF بيحوّل Decimal لـ float، والـ serializers بترجع نص.
+    """
+    return str(Decimal(str(value or 0)).quantize(Decimal("0.01")))
+
+
+def quantize_diff_rows(rows) -> list[dict]:
+    # SQLite بيحسب الـ Decimal كـ float → منرجّع خانتين
+    out = []
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, (Decimal, float)) and key not in ("in_base", "in_target"):
+                row[key] = money_str(value)
+        row.pop("in_base", None)
+        row.pop("in_target", None)
+        out.append(row)
+    return out
+
+
+def payroll_run_diff_summary(base: PayrollRun, target: PayrollRun) -> dict:
+    totals = PayrollItem.objects.filter(payroll_run__in=[base, target]).aggregate(**{
+        f"{side}_{name}": Sum(field_name, filter=Q(payroll_run=run))
+        for name, field_name in DIFF_COMPONENTS.items()
+        for side, run in (("base", base), ("target", target))
+    })
+
+    base_ids = PayrollItem.objects.filter(payroll_run=base).values("employee_id")
+    target_ids = PayrollItem.objects.filter(payroll_run=target).values("employee_id")
+
+    summary = {
+        "joined": PayrollItem.objects.filter(payroll_run=target).exclude(employee_id__in=base_ids).count(),
+        "left": PayrollItem.objects.filter(payroll_run=base).exclude(employee_id__in=target_ids).count(),
+    }
+    for name in DIFF_COMPONENTS:
+        b = Decimal(money_str(totals[f"base_{name}"]))
+        t = Decimal(money_str(totals[f"target_{name}"]))
+        summary[name] = {"base": str(b), "target": str(t), "delta": str(t - b)}
+    return summary
+
+
+def previous_payroll_run(run: PayrollRun) -> PayrollRun | None:
+    return (
+        PayrollRun.objects
+        .filter(company_id=run.company_id)
+        .filter(Q(year__lt=run.year) | Q(year=run.year, month__lt=run.month))
+        .order_by("-year", "-month")
+        .first()
+    )
@@ -1,25 +1,42 @@
 from __future__ import annotations
 
 import calendar
-from dataclasses import dataclass
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import date, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import QuerySet
 from django.utils import timezone
 
 from hr.employees.models import Employee, EmployeeStatus
 from hr.org_structure.models import Company
 
-from hr.attendance.models import AttendanceRecord, AttendanceStatus, EmployeeShiftAssignment
+from hr.attendance.models import AttendanceRecord, AttendanceStatus, DEFAULT_WEEKLY_REST_DAYS
+from hr.attendance.services import ShiftIndex, get_employee_shift_for_date
+from hr.attendance.workdays import WorkingDays, company_working_days
 from hr.contracts.models import EmployeeContract, ContractStatus 
-from hr.payroll.models import PayrollRun, PayrollRunStatus, PayrollItem
+from hr.payroll.models import (
+    PayrollRun,
+    PayrollRunStatus,
+    PayrollItem,
+    PayrollDirtyEmployee,
+    PayrollJob,
+    Payslip,
+    PayslipStatus,
+    PAYROLL_JOB_ACTIVE_STATUSES,
+)
+from hr.payroll import workers as payroll_workers
 
 from hr.ess.models import LeaveRequest, LeaveStatus, LeaveType, OvertimeRequest, ApprovalStatus  
 
 
-WEEKLY_HOLIDAYS = {4}  
+# الافتراضي لما ما يكون للشركة CompanyCalendar (الحساب الفعلي من hr.attendance.workdays)
+WEEKLY_HOLIDAYS = set(DEFAULT_WEEKLY_REST_DAYS)
 OVERTIME_MULTIPLIER = Decimal("1.50")  
 
 
@@ -45,20 +62,15 @@ def get_company_from_user(user) -> Company | None:
     return Company.objects.first()
 
 
-def get_employee_shift_for_date(employee: Employee, day: date):
-    return (
-        EmployeeShiftAssignment.objects
-        .filter(employee=employee, start_date__lte=day, end_date__gte=day)
-        .order_by("-is_primary", "-start_date")
-        .first()
-    )
+def shift_daily_hours(shift) -> Decimal:
+    if shift:
+        return Decimal(str(shift.required_daily_hours))
+    return Decimal("8.00")
 
 
 def expected_daily_hours(employee: Employee, day: date) -> Decimal:
     assign = get_employee_shift_for_date(employee, day)
-    if assign and assign.shift:
-        return Decimal(str(assign.shift.required_daily_hours))
-    return Decimal("8.00")
+    return shift_daily_hours(assign.shift if assign else None)
 
 
 def get_active_contract(employee: Employee, day: date) -> EmployeeContract | None:
@@ -106,6 +118,115 @@ def approved_overtime_hours(employee: Employee, start: date, end: date) -> Decim
     return q2(total)
 
 
+def _employee_filter(employees) -> dict:
+    if isinstance(employees, QuerySet):
+        return {"employee__in": employees.values("id")}
+    return {"employee_id__in": [e.id for e in employees]}
+
+
+@dataclass
+class PayrollInputs:
+    """
+    كل مدخلات الرواتب لدورة وحدة، محملة مرة وحدة لكل جدول ومفهرسة حسب employee_id.
+    """
+    contracts: dict[int, list[EmployeeContract]] = field(default_factory=dict)
+    attendance: dict[int, dict[date, AttendanceRecord]] = field(default_factory=dict)
+    leaves: dict[int, dict[date, dict]] = field(default_factory=dict)
+    overtime: dict[int, Decimal] = field(default_factory=dict)
+    shifts: ShiftIndex = field(default_factory=ShiftIndex)
+    workdays: WorkingDays | None = None
+
+    def subset(self, employee_ids) -> PayrollInputs:
+        """
+        نسخة صغيرة (picklable) فيها بس موظفين الـ shard، لنبعتها لـ worker process.
+        """
+        ids = set(employee_ids)
+        return PayrollInputs(
+            contracts={k: v for k, v in self.contracts.items() if k in ids},
+            attendance={k: v for k, v in self.attendance.items() if k in ids},
+            leaves={k: v for k, v in self.leaves.items() if k in ids},
+            overtime={k: v for k, v in self.overtime.items() if k in ids},
+            shifts=self.shifts.subset(ids),
+            workdays=self.workdays,
+        )
+
+    def active_contract(self, employee_id: int, day: date) -> EmployeeContract | None:
+        # نفس منطق get_active_contract: مرتبة -start_date
+        for c in self.contracts.get(employee_id, ()):
+            if c.start_date <= day <= c.end_date:
+                return c
+        return None
+
+
+def load_payroll_inputs(run: PayrollRun, employees) -> PayrollInputs:
+    """
+    employees: QuerySet (بينعمل subquery) أو list of Employee.
+    عدد الـ queries ثابت مهما كان عدد الموظفين.
+    """
+    start = run.period_start
+    end = run.period_end
+    emp_filter = _employee_filter(employees)
+    # preload لحتى الـ bitmap يوصل للـ workers جاهز
+    inputs = PayrollInputs(workdays=company_working_days(run.company_id).preload(start, end))
+
+    contracts_qs = (
+        EmployeeContract.objects
+        .filter(
+            status=ContractStatus.ACTIVE,
+            start_date__lte=end,
+            end_date__gte=start,
+            **emp_filter,
+        )
+        .order_by("-start_date")
+    )
+    for c in contracts_qs:
+        inputs.contracts.setdefault(c.employee_id, []).append(c)
+
+    att_qs = (
+        AttendanceRecord.objects
+        .filter(date__range=[start, end], **emp_filter)
+        .only(
+            "id", "employee_id", "date", "status",
+            "total_hours", "late_minutes", "early_leave_minutes", "overtime_hours",
+        )
+        .order_by()
+    )
+    for a in att_qs:
+        inputs.attendance.setdefault(a.employee_id, {})[a.date] = a
+
+    leaves_qs = (
+        LeaveRequest.objects
+        .filter(
+            status=LeaveStatus.APPROVED,
+            start_date__lte=end,
+            end_date__gte=start,
+            **emp_filter,
+        )
+        .only("id", "employee_id", "leave_type", "start_date", "end_date", "is_half_day")
+        .order_by("-created_at")
+    )
+    for lr in leaves_qs:
+        m = inputs.leaves.setdefault(lr.employee_id, {})
+        cur = max(lr.start_date, start)
+        last = min(lr.end_date, end)
+        while cur <= last:
+            m[cur] = {"type": lr.leave_type, "half": bool(lr.is_half_day)}
+            cur += timedelta(days=1)
+
+    ot_rows = (
+        OvertimeRequest.objects
+        .filter(status=ApprovalStatus.APPROVED, date__range=[start, end], **emp_filter)
+        .values_list("employee_id", "hours")
+        .order_by()
+    )
+    for employee_id, hours in ot_rows:
+        inputs.overtime[employee_id] = inputs.overtime.get(employee_id, Decimal("0.00")) + Decimal(str(hours or 0))
+
+    inputs.shifts = ShiftIndex.load(employees, start, end)
+
+    return inputs
+
+
 @dataclass
 class PayrollCalcResult:
     ok: bool
@@ -118,12 +239,21 @@ class PayrollCalcResult:
     error: str | None = None
 
 
-def calc_employee_payroll_for_run(employee: Employee, run: PayrollRun) -> PayrollCalcResult:
+def calc_employee_payroll_for_run(
+    employee: Employee,
+    run: PayrollRun,
+    inputs: PayrollInputs | None = None,
+) -> PayrollCalcResult:
+    """
+    inputs: اختياري. إذا مررتي PayrollInputs محملة مسبقاً (bulk) ما منعمل ولا query هون.
+    """
     start = run.period_start
     end = run.period_end
 
-  
-    contract = get_active_contract(employee, start) or get_active_contract(employee, end)
+    if inputs is None:
+        inputs = load_payroll_inputs(run, [employee])
+
+    contract = inputs.active_contract(employee.id, start) or inputs.active_contract(employee.id, end)
     if not contract:
         return PayrollCalcResult(
             ok=False,
@@ -136,19 +266,181 @@ def calc_employee_payroll_for_run(employee: Employee, run: PayrollRun) -> Payrol
             error="No active contract",
         )
 
+    try:
+        return _calc_payroll_fixed(employee, run, inputs, contract)
+    except _NotFixedPoint:
+        # قيم بأكتر من خانتين عشريتين: المسار المرجعي (Decimal) بيعطي نفس التقريب تبع الأول
+        return _calc_payroll_decimal(employee, run, inputs, contract)
+
+
+class _NotFixedPoint(Exception):
+    pass
+
+
+def _hundredths(value) -> int:
+    """
+    Decimal بخانتين (متل DecimalField(decimal_places=2)) → integer × 100 بدون تقريب.
+    """
+    scaled = Decimal(value).scaleb(2)
+    as_int = int(scaled)
+    if as_int != scaled:
+        raise _NotFixedPoint(value)
+    return as_int
+
+
+def _round_div(num: int, den: int) -> int:
+    # قسمة integers موجبة مع ROUND_HALF_UP
+    return (2 * num + den) // (2 * den)
+
+
+def _from_fixed(value: int, places: int) -> Decimal:
+    return Decimal(value).scaleb(-places)
+
+
+def _calc_payroll_fixed(employee: Employee, run: PayrollRun, inputs: PayrollInputs, contract) -> PayrollCalcResult:
+    """
+    نفس حساب _calc_payroll_decimal بـ integers: الساعات × 100، الدقائق كاملة، المصاري بالسنتات،
+    hourly_rate × 10^4. كل تقريب ROUND_HALF_UP بنفس النقطة تبع المسار الـ Decimal،
+    والتحويل لـ Decimal بس للأرقام النهائية، فالـ breakdown بيطلع مطابق حرف بحرف.
+    """
+    start = run.period_start
+    end = run.period_end
+
+    basic_cents = _hundredths(q2(Decimal(str(contract.base_salary))))
+    currency = getattr(contract, "currency", "USD") or "USD"
+
+    att_by_day = inputs.attendance.get(employee.id, {})
+    leave_by_day = inputs.leaves.get(employee.id, {})
+
+    expected = 0          # ساعات × 100
+    worked = 0            # ساعات × 100
+    late_minutes = 0
+    early_minutes = 0
+    absent = 0            # ساعات × 100
+    unpaid_halves = 0     # ساعات × 200 (نص يوم = نص الساعات، ممكن يطلع نص سنت)
+
+    day_shifts = inputs.shifts.expand(employee.id, start, end)
+    hours_by_shift: dict = {}
+
+    expected_work_days = inputs.workdays.count(start, end)
+
+    for offset in inputs.workdays.offsets(start, end):
+        shift = day_shifts[offset]
+        day_expected = hours_by_shift.get(shift)
+        if day_expected is None:
+            day_expected = hours_by_shift[shift] = _hundredths(shift_daily_hours(shift))
+        expected += day_expected
+
+        day = start + timedelta(days=offset)
+        rec = att_by_day.get(day)
+        if rec:
+            worked += _hundredths(rec.total_hours or 0)
+            late_minutes += int(rec.late_minutes or 0)
+            early_minutes += int(rec.early_leave_minutes or 0)
+
+        leave_info = leave_by_day.get(day)
+        if leave_info:
+            if leave_info["type"] == LeaveType.UNPAID:
+                unpaid_halves += day_expected if leave_info["half"] else 2 * day_expected
+            continue
+
+        if not rec or rec.status == AttendanceStatus.ABSENT:
+            absent += day_expected
+
+    unpaid = _round_div(unpaid_halves, 2)
+
+    # hourly_rate × 10^4 = basic / expected
+    rate = _round_div(basic_cents * 10_000, expected if expected > 0 else 100)
+
+    late_hours = _round_div(late_minutes * 100, 60)
+    early_hours = _round_div(early_minutes * 100, 60)
+
+    # (ساعات × 100) × (rate × 10^4) = سنتات × 10^4
+    late_deduction = _round_div(late_hours * rate, 10_000)
+    early_deduction = _round_div(early_hours * rate, 10_000)
+    absent_deduction = _round_div(absent * rate, 10_000)
+    unpaid_leave_deduction = _round_div(unpaid * rate, 10_000)
+
+    ot_hours = _hundredths(q2(inputs.overtime.get(employee.id, Decimal("0.00"))))
+    if ot_hours == 0:
+        ot_hours = sum(_hundredths(a.overtime_hours or 0) for a in att_by_day.values())
+
+    multiplier = Decimal(str(OVERTIME_MULTIPLIER))
+    mult_places = max(0, -multiplier.as_tuple().exponent)
+    mult = int(multiplier.scaleb(mult_places))
+    overtime_cents = _round_div(ot_hours * rate * mult, 10_000 * 10 ** mult_places)
+
+    allowances_cents = 0
+    deductions_cents = late_deduction + early_deduction + absent_deduction + unpaid_leave_deduction
+
+    basic_salary = _from_fixed(basic_cents, 2)
+    allowances = _from_fixed(allowances_cents, 2)
+    overtime_pay = _from_fixed(overtime_cents, 2)
+    deductions = _from_fixed(deductions_cents, 2)
+
+    breakdown = {
+        "employee_id": employee.id,
+        "employee_code": employee.employee_code,
+        "contract_id": contract.id,
+
+        "period_start": str(start),
+        "period_end": str(end),
+
+        "expected_work_days": expected_work_days,
+        "expected_hours": str(_from_fixed(expected, 2)),
+        "hourly_rate": str(_from_fixed(rate, 4)),
+
+        "worked_hours": str(_from_fixed(worked, 2)),
+
+        "late_minutes": late_minutes,
+        "early_leave_minutes": early_minutes,
+        "late_deduction": str(_from_fixed(late_deduction, 2)),
+        "early_deduction": str(_from_fixed(early_deduction, 2)),
+
+        "absent_hours": str(_from_fixed(absent, 2)),
+        "absent_deduction": str(_from_fixed(absent_deduction, 2)),
+
+        "unpaid_leave_hours": str(_from_fixed(unpaid, 2)),
+        "unpaid_leave_deduction": str(_from_fixed(unpaid_leave_deduction, 2)),
+
+        "overtime_hours_used": str(_from_fixed(ot_hours, 2)),
+        "overtime_multiplier": str(OVERTIME_MULTIPLIER),
+        "overtime_pay": str(overtime_pay),
+
+        "allowances": str(allowances),
+        "total_deductions": str(deductions),
+        "net_salary": str(_from_fixed(basic_cents + allowances_cents + overtime_cents - deductions_cents, 2)),
+    }
+
+    return PayrollCalcResult(
+        ok=True,
+        currency=currency,
+        basic_salary=basic_salary,
+        allowances=allowances,
+        overtime_pay=overtime_pay,
+        deductions=deductions,
+        breakdown=breakdown,
+    )
+
+
+def _calc_payroll_decimal(employee: Employee, run: PayrollRun, inputs: PayrollInputs, contract) -> PayrollCalcResult:
+    """
+    المسار المرجعي بـ Decimal (الحساب الأصلي). بينستعمل fallback وبالـ parity tests.
+    """
+    start = run.period_start
+    end = run.period_end
+
     basic_salary = q2(Decimal(str(contract.base_salary)))
     currency = getattr(contract, "currency", "USD") or "USD"
 
  
-    att_qs = AttendanceRecord.objects.filter(employee=employee, date__range=[start, end])
-    att_by_day = {a.date: a for a in att_qs}
+    att_by_day = inputs.attendance.get(employee.id, {})
 
   
-    leave_by_day = approved_leaves_map(employee, start, end)
+    leave_by_day = inputs.leaves.get(employee.id, {})
 
    
     expected_hours = Decimal("0.00")
-    expected_work_days = 0
 
     worked_hours = Decimal("0.00")
     late_minutes = 0
@@ -157,12 +449,18 @@ def calc_employee_payroll_for_run(employee: Employee, run: PayrollRun) -> Payrol
     absent_hours = Decimal("0.00")
     unpaid_leave_hours = Decimal("0.00")
 
-    for day in daterange(start, end):
-        if is_weekly_holiday(day):
-            continue
+    day_shifts = inputs.shifts.expand(employee.id, start, end)
+    hours_by_shift: dict = {}
 
-        expected_work_days += 1
-        day_expected = expected_daily_hours(employee, day)
+    # أيام الدوام من bitmap التقويم: العدد popcount، والـ loop بس على الـ bits المضاءة
+    expected_work_days = inputs.workdays.count(start, end)
+
+    for offset in inputs.workdays.offsets(start, end):
+        day = start + timedelta(days=offset)
+        shift = day_shifts[offset]
+        day_expected = hours_by_shift.get(shift)
+        if day_expected is None:
+            day_expected = hours_by_shift[shift] = shift_daily_hours(shift)
         expected_hours += day_expected
 
         rec = att_by_day.get(day)
@@ -209,12 +507,12 @@ def calc_employee_payroll_for_run(employee: Employee, run: PayrollRun) -> Payrol
     unpaid_leave_deduction = q2(unpaid_leave_hours * hourly_rate)
 
    
-    ot_hours = approved_overtime_hours(employee, start, end)
+    ot_hours = q2(inputs.overtime.get(employee.id, Decimal("0.00")))
 
     
     if ot_hours == 0:
       
-        ot_hours = q2(sum((Decimal(str(a.overtime_hours or 0)) for a in att_qs), Decimal("0.00")))
+        ot_hours = q2(sum((Decimal(str(a.overtime_hours or 0)) for a in att_by_day.values()), Decimal("0.00")))
 
     overtime_pay = q2(ot_hours * hourly_rate * OVERTIME_MULTIPLIER)
 
@@ -288,41 +586,293 @@ def ensure_monthly_run(company: Company, year: int, month: int) -> PayrollRun:
     return run
 
 
-@transaction.atomic
-def generate_payroll_items(run: PayrollRun, employees_qs=None) -> dict:
-    
+PAYROLL_BULK_BATCH_SIZE = 500
+PAYROLL_SHARDS_PER_WORKER = 4
+PAYROLL_PROGRESS_EVERY = 200
+
+def write_payroll_results(
+    run: PayrollRun,
+    results: list[tuple[Employee, PayrollCalcResult]],
+    update_totals: bool = True,
+) -> None:
+    """
+    كتابة كل الـ items والـ payslips بـ bulk upsert بدل save() لكل موظف،
+    وبعدين recalc للـ totals مرة وحدة (إلا إذا update_totals=False).
+    """
+    items = [
+        PayrollItem(
+            employee=emp,
+            basic_salary=res.basic_salary,
+            allowances=res.allowances,
+            overtime_pay=res.overtime_pay,
+            deductions=res.deductions,
+            currency=res.currency,
+            breakdown=res.breakdown,
+        )
+        for emp, res in results
+    ]
+    PayrollItem.bulk_write(run, items, update_totals=update_totals, batch_size=PAYROLL_BULK_BATCH_SIZE)
+
+
+def calc_payroll_parallel(
+    run: PayrollRun,
+    employees: list[Employee],
+    inputs: PayrollInputs,
+    workers: int,
+    progress=None,
+) -> list[PayrollCalcResult]:
+    """
+    بيقسم الموظفين لـ shards وبيحسبهم بـ ProcessPoolExecutor.
+    النتيجة بنفس ترتيب employees، فالمخرجات مطابقة للـ serial mode.
+    """
+    if not employees:
+        return []
+
+    shard_size = max(1, math.ceil(len(employees) / (workers * PAYROLL_SHARDS_PER_WORKER)))
+    shards = [employees[i:i + shard_size] for i in range(0, len(employees), shard_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=payroll_workers.init_worker) as pool:
+        futures = {
+            pool.submit(payroll_workers.calc_payroll_shard, run, shard, inputs.subset(e.id for e in shard)): len(shard)
+            for shard in shards
+        }
+        done = 0
+        for fut in as_completed(futures):
+            done += futures[fut]
+            if progress:
+                progress(done, len(employees))
+
+        results = []
+        for fut in futures:
+            results.extend(fut.result())
+    return results
+
+
+def _calc_employees(run: PayrollRun, employees_qs, workers: int | None, progress=None):
+    employees = list(employees_qs)
+    total = len(employees)
+    if progress:
+        progress(0, total)
+
+    # ✅ كل جدول بينقرأ مرة وحدة للدورة كلها
+    inputs = load_payroll_inputs(run, employees_qs)
+
+    if workers is None:
+        workers = getattr(settings, "PAYROLL_WORKERS", 1)
+    workers = max(1, int(workers or 1))
+
+    if workers > 1 and total > 1:
+        calc_results = calc_payroll_parallel(run, employees, inputs, workers, progress=progress)
+    else:
+        calc_results = []
+        for emp in employees:
+            calc_results.append(calc_employee_payroll_for_run(emp, run, inputs=inputs))
+            if progress and len(calc_results) % PAYROLL_PROGRESS_EVERY == 0:
+                progress(len(calc_results), total)
+        if progress:
+            progress(total, total)
+
+    results = []
+    errors = []
+    for emp, res in zip(employees, calc_results):
+        if not res.ok:
+            errors.append({"employee_id": emp.id, "employee_code": emp.employee_code, "error": res.error})
+            continue
+        results.append((emp, res))
+
+    return results, errors
+
+
+def _lock_draft_run(run: PayrollRun) -> PayrollRun:
+    locked = PayrollRun.objects.select_for_update().get(pk=run.pk)
+    if locked.status != PayrollRunStatus.DRAFT:
+        raise ValidationError("لا يمكن توليد الرواتب إلا عندما تكون PayrollRun بحالة Draft.")
+    return locked
+
+
+def generate_payroll_items(
+    run: PayrollRun,
+    employees_qs=None,
+    workers: int | None = None,
+    progress=None,
+    checkpoint=None,
+) -> dict:
+    """
+    workers: عدد الـ processes. None → settings.PAYROLL_WORKERS (الافتراضي 1 = serial).
+    progress: callable(processed, total) اختياري.
+    checkpoint: callable() اختياري بينادى بأول وآخر الكتابة (جوّا الـ transaction)،
+    الـ worker بيستعمله للـ heartbeat وليتأكد إنه الـ job لسا إله قبل الـ commit.
+
+    الحساب بيصير برا الـ transaction (قراءة بس)، والكتابة كلها بـ transaction وحدة
+    بعد lock على الـ run.
+    """
     if run.status != PayrollRunStatus.DRAFT:
         raise ValidationError("لا يمكن توليد الرواتب إلا عندما تكون PayrollRun بحالة Draft.")
 
     if employees_qs is None:
         employees_qs = Employee.objects.filter(company=run.company, status=EmployeeStatus.ACTIVE)
 
-    generated = 0
-    skipped = 0
-    errors = []
+    started_at = timezone.now()
+    results, errors = _calc_employees(run, employees_qs, workers, progress=progress)
 
-    for emp in employees_qs:
-        res = calc_employee_payroll_for_run(emp, run)
-        if not res.ok:
-            skipped += 1
-            errors.append({"employee_id": emp.id, "employee_code": emp.employee_code, "error": res.error})
-            continue
+    with transaction.atomic():
+        _lock_draft_run(run)
+        if checkpoint:
+            checkpoint()
+        write_payroll_results(run, results)
 
-        PayrollItem.objects.update_or_create(
-            payroll_run=run,
-            employee=emp,
-            defaults={
-                "basic_salary": res.basic_salary,
-                "allowances": res.allowances,
-                "overtime_pay": res.overtime_pay,
-                "deductions": res.deductions,
-                "currency": res.currency,
-                "breakdown": res.breakdown,
-            }
+        # كل اللي انحسبوا هلق صاروا نضاف
+        run.dirty_employees.filter(marked_at__lte=started_at, **_employee_filter(employees_qs)).delete()
+        if checkpoint:
+            checkpoint()
+
+    return {
+        "success": True,
+        "run_id": run.id,
+        "company": run.company.name,
+        "year": run.year,
+        "month": run.month,
+        "generated": len(results),
+        "skipped": len(errors),
+        "errors_preview": errors[:20],
+    }
+
+
+def mark_payroll_dirty(employee_id: int, start: date, end: date, reason: str = "") -> int:
+    """
+    بيعلّم الموظف dirty بكل PayrollRun بحالة Draft لشركته وفترتها بتتقاطع مع [start, end].
+    """
+    run_ids = list(
+        PayrollRun.objects
+        .filter(
+            company__employees=employee_id,
+            status=PayrollRunStatus.DRAFT,
+            period_start__lte=end,
+            period_end__gte=start,
+        )
+        .values_list("id", flat=True)
+    )
+    if not run_ids:
+        return 0
+
+    now = timezone.now()
+    PayrollDirtyEmployee.objects.bulk_create(
+        [
+            PayrollDirtyEmployee(payroll_run_id=run_id, employee_id=employee_id, reason=reason, marked_at=now)
+            for run_id in run_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["payroll_run", "employee"],
+        update_fields=["reason", "marked_at"],
+    )
+    return len(run_ids)
+
+
+def mark_payroll_dirty_many(ranges: dict[int, tuple[date, date]], reason: str = "") -> int:
+    """
+    نفس mark_payroll_dirty بس لموظفين كتار: ranges = {employee_id: (start, end)}.
+    query وحدة للـ runs وupsert وحدة للعلامات (للكتابة الجماعية اللي ما بتبعت post_save).
+    """
+    if not ranges:
+        return 0
+
+    start = min(r[0] for r in ranges.values())
+    end = max(r[1] for r in ranges.values())
+    company_of = dict(Employee.objects.filter(id__in=ranges).values_list("id", "company_id"))
+
+    runs_by_company: dict[int, list[tuple[int, date, date]]] = {}
+    for run_id, company_id, period_start, period_end in (
+        PayrollRun.objects
+        .filter(
+            company_id__in=set(company_of.values()),
+            status=PayrollRunStatus.DRAFT,
+            period_start__lte=end,
+            period_end__gte=start,
         )
-        generated += 1
+        .values_list("id", "company_id", "period_start", "period_end")
+    ):
+        runs_by_company.setdefault(company_id, []).append((run_id, period_start, period_end))
+
+    now = timezone.now()
+    marks = [
+        PayrollDirtyEmployee(payroll_run_id=run_id, employee_id=employee_id, reason=reason, marked_at=now)
+        for employee_id, (emp_start, emp_end) in ranges.items()
+        for run_id, period_start, period_end in runs_by_company.get(company_of.get(employee_id), ())
+        if period_start <= emp_end and period_end >= emp_start
+    ]
+    if marks:
+        PayrollDirtyEmployee.objects.bulk_create(
+            marks,
+            update_conflicts=True,
+            unique_fields=["payroll_run", "employee"],
+            update_fields=["reason", "marked_at"],
+        )
+    return len(marks)
+
+
+def recompute_dirty_payroll_items(run: PayrollRun, workers: int | None = None, progress=None, checkpoint=None) -> dict:
+    """
+    بيعيد حساب الـ PayrollItems للموظفين الـ dirty بس، وبيعدّل totals الدورة بالفرق (delta)
+    بدل ما يعيد الـ aggregate على كل الـ items. checkpoint متل generate_payroll_items.
+    """
+    if run.status != PayrollRunStatus.DRAFT:
+        raise ValidationError("لا يمكن توليد الرواتب إلا عندما تكون PayrollRun بحالة Draft.")
 
-    run.recalculate_totals()
+    started_at = timezone.now()
+    dirty_ids = list(run.dirty_employees.values_list("employee_id", flat=True))
+
+    employees_qs = Employee.objects.filter(
+        id__in=dirty_ids,
+        company=run.company,
+        status=EmployeeStatus.ACTIVE,
+    )
+
+    results, errors = _calc_employees(run, employees_qs, workers, progress=progress)
+
+    with transaction.atomic():
+        _lock_draft_run(run)
+        if checkpoint:
+            checkpoint()
+
+        old = {
+            employee_id: (gross, net)
+            for employee_id, gross, net in (
+                PayrollItem.objects
+                .filter(payroll_run=run, employee_id__in=dirty_ids)
+                .values_list("employee_id", "gross_salary", "net_salary")
+            )
+        }
+
+        write_payroll_results(run, results, update_totals=False)
+
+        added = 0
+        delta_gross = Decimal("0.00")
+        delta_net = Decimal("0.00")
+        for emp, res in results:
+            gross = res.basic_salary + res.allowances + res.overtime_pay
+            net = gross - res.deductions
+            old_gross, old_net = old.get(emp.id, (Decimal("0.00"), Decimal("0.00")))
+            if emp.id not in old:
+                added += 1
+            delta_gross += gross - old_gross
+            delta_net += net - old_net
+
+        # dirty وما انحسبلهم راتب (ما عاد في عقد فعّال، صاروا inactive، انتقلوا شركة):
+        # الـ item والـ payslip القدام بينشالوا لحتى الـ run ما تدفعلهم
+        # (الـ post_delete تبع PayrollItem بيطرحهم من الـ totals)
+        computed = {emp.id for emp, _ in results}
+        dropped = [employee_id for employee_id in old if employee_id not in computed]
+        if dropped:
+            Payslip.objects.filter(payroll_run=run, employee_id__in=dropped).delete()
+            PayrollItem.objects.filter(payroll_run=run, employee_id__in=dropped).delete()
+
+        run.apply_totals_delta(employees=added, gross=delta_gross, net=delta_net)
+        if dropped and not (added or delta_gross or delta_net):
+            run.refresh_from_db(fields=["total_employees", "total_gross", "total_net"])
+
+        run.dirty_employees.filter(marked_at__lte=started_at).delete()
+        if checkpoint:
+            checkpoint()
 
     return {
         "success": True,
@@ -330,7 +880,68 @@ def generate_payroll_items(run: PayrollRun, employees_qs=None) -> dict:
         "company": run.company.name,
         "year": run.year,
         "month": run.month,
-        "generated": generated,
-        "skipped": skipped,
+        "dirty": len(dirty_ids),
+        "generated": len(results),
+        "skipped": len(errors),
+        "removed": len(dropped),
+        "delta_gross": str(delta_gross),
+        "delta_net": str(delta_net),
+        "total_gross": str(run.total_gross),
+        "total_net": str(run.total_net),
         "errors_preview": errors[:20],
-    }
\ No newline at end of file
+    }
+
+
+# الحالة المطلوبة → الحالة اللي لازم تكون فيها الـ run قبلها
+PAYROLL_RUN_TRANSITIONS = {
+    PayrollRunStatus.APPROVED: PayrollRunStatus.DRAFT,
+    PayrollRunStatus.POSTED: PayrollRunStatus.APPROVED,
+    PayrollRunStatus.PAID: PayrollRunStatus.POSTED,
+}
+
+
+def transition_payroll_run(run: PayrollRun, target: str) -> dict:
+    """
+    بينقل الـ run خطوة لقدام (draft → approved → posted → paid) تحت select_for_update،
+    وبيحدّث status كل الـ payslips تبعها بـ UPDATE وحدة بدل save() لكل item.
+    """
+    if target not in PAYROLL_RUN_TRANSITIONS:
+        raise ValidationError(f"حالة غير معروفة: {target}")
+    required = PAYROLL_RUN_TRANSITIONS[target]
+
+    with transaction.atomic():
+        locked = PayrollRun.objects.select_for_update().get(pk=run.pk)
+        if locked.status != required:
+            raise ValidationError(
+                f"لا يمكن نقل PayrollRun من {locked.status} إلى {target} (لازم تكون {required})."
+            )
+
+        if target == PayrollRunStatus.APPROVED:
+            if PayrollJob.objects.filter(payroll_run=locked, status__in=PAYROLL_JOB_ACTIVE_STATUSES).exists():
+                raise ValidationError("في توليد رواتب شغّال على هالدورة، استني يخلص قبل الاعتماد.")
+            if locked.dirty_employees.exists():
+                raise ValidationError("في موظفين تغيّرت مدخلاتهم ولسا ما انعاد حسابهم، اعملي recompute قبل الاعتماد.")
+
+        now = timezone.now()
+        locked.status = target
+        if locked.finalized_at is None or target == PayrollRunStatus.APPROVED:
+            locked.finalized_at = now
+        locked.save(update_fields=["status", "finalized_at"])
+
+        slip_status = PayrollItem._payslip_status_for(locked)
+        payslips_updated = (
+            Payslip.objects
+            .filter(payroll_run=locked)
+            .exclude(status__in=[slip_status, PayslipStatus.CANCELLED])
+            .update(status=slip_status)
+        )
+
+    run.status = locked.status
+    run.finalized_at = locked.finalized_at
+    return {
+        "run_id": locked.id,
+        "from_status": required,
+        "status": locked.status,
+        "finalized_at": locked.finalized_at,
+        "payslips_updated": payslips_updated,
+    }
@@ -0,0 +1,112 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+
+from hr.employees.models import Employee
+from hr.attendance.archive import archiving
+from hr.attendance.models import AttendanceRecord, EmployeeShiftAssignment
+from hr.contracts.models import EmployeeContract
+from hr.ess.models import LeaveRequest, OvertimeRequest
+from hr.payroll.models import PayrollItem, PayrollRun
+from hr.payroll.services import mark_payroll_dirty
+
+
+# لكل موديل: شو الفترة اللي بتأثر على الرواتب
+PAYROLL_INPUT_PERIODS = {
+    AttendanceRecord: ("date", "date"),
+    LeaveRequest: ("start_date", "end_date"),
+    OvertimeRequest: ("date", "date"),
+    EmployeeContract: ("start_date", "end_date"),
+    EmployeeShiftAssignment: ("start_date", "end_date"),
+}
+
+
+def _period(employee_id, start, end):
+    if not employee_id or not start:
+        return None
+    # عقد / شفت مفتوح (end_date فاضي) بيأثر على كل الـ runs من start ولقدّام
+    return employee_id, start, end or date.max
+
+
+def _stored_period(sender, instance):
+    """
+    (employee_id, start, end) زي ما هي بالـ DB قبل الحفظ / الحذف، لحتى نعلّم الفترة القديمة كمان
+    (سجل انتقل برّا فترة الـ run أو لموظف تاني).
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    start_field, end_field = PAYROLL_INPUT_PERIODS[sender]
+    # AttendanceRecord بيحمل حالته من from_db، فما في داعي لـ query
+    state = getattr(instance, "_summary_state", None)
+    if state is not None:
+        employee_id, day = state[0], state[1]
+        return _period(employee_id, day, day)
+    row = (
+        sender.objects
+        .filter(pk=instance.pk)
+        .values_list("employee_id", start_field, end_field)
+        .first()
+    )
+    return _period(*row) if row else None
+
+
+def _mark_dirty(sender, instance, reason):
+    start_field, end_field = PAYROLL_INPUT_PERIODS[sender]
+    periods = {
+        _period(instance.employee_id, getattr(instance, start_field, None), getattr(instance, end_field, None)),
+        getattr(instance, "_payroll_stored_period", None),
+    }
+    periods.discard(None)
+    for employee_id, start, end in periods:
+        mark_payroll_dirty(employee_id, start, end, reason=f"{sender._meta.model_name}:{reason}")
+
+
+def payroll_input_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._payroll_stored_period = _stored_period(sender, instance)
+
+
+def payroll_input_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _mark_dirty(sender, instance, "saved")
+
+
+def payroll_input_pre_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Employee) or archiving():
+        return
+    instance._payroll_stored_period = _stored_period(sender, instance)
+
+
+def payroll_input_deleted(sender, instance, origin=None, **kwargs):
+    # حذف الموظف نفسه (cascade) ما بدو علامة: الموظف رايح. والأرشفة بس لأشهر مدفوعة
+    if isinstance(origin, Employee) or archiving():
+        return
+    _mark_dirty(sender, instance, "deleted")
+
+
+for _model in PAYROLL_INPUT_PERIODS:
+    pre_save.connect(payroll_input_pre_save, sender=_model, dispatch_uid=f"payroll_dirty_pre_save_{_model.__name__}")
+    post_save.connect(payroll_input_saved, sender=_model, dispatch_uid=f"payroll_dirty_save_{_model.__name__}")
+    pre_delete.connect(payroll_input_pre_delete, sender=_model, dispatch_uid=f"payroll_dirty_pre_delete_{_model.__name__}")
+    post_delete.connect(payroll_input_deleted, sender=_model, dispatch_uid=f"payroll_dirty_delete_{_model.__name__}")
+
+
+# ---- PayrollRun totals ----
+
+def payroll_item_deleted(sender, instance, origin=None, **kwargs):
+    # هون مش بـ PayrollItem.delete(): QuerySet.delete() والـ admin ما بيمرقوا عليها.
+    # حذف الـ run نفسها (cascade) ما إلو totals يتعدّلوا
+    if isinstance(origin, PayrollRun):
+        return
+    PayrollRun.shift_totals(
+        instance.payroll_run_id,
+        employees=-1,
+        gross=-(instance.gross_salary or Decimal("0.00")),
+        net=-(instance.net_salary or Decimal("0.00")),
+    )
+
+
+post_delete.connect(payroll_item_deleted, sender=PayrollItem, dispatch_uid="payroll_item_totals_deleted")
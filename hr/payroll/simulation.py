@@ -0,0 +1,279 @@
+"""
+What-if للرواتب: منحمّل مدخلات الدورة مرة وحدة لـ NumPy arrays (موظفين × أيام)،
+ومنحسب كذا variant (OVERTIME_MULTIPLIER / العطلة الأسبوعية / زيادة لقسم) دفعة وحدة
+بدون ما نكتب ولا PayrollItem. أيام الدوام الأساسية من تقويم الشركة (hr.attendance.workdays).
+
+كل الحسابات integers (ساعات × 100، دقائق، سنتات، hourly_rate × 10^4) مع ROUND_HALF_UP
+بنفس نقاط التقريب تبع calc_employee_payroll_for_run، فالـ baseline بيطلع مطابق للمحرك الأصلي.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+
+from hr.attendance.models import AttendanceStatus
+from hr.employees.models import Employee, EmployeeStatus
+from hr.ess.models import LeaveType
+from hr.payroll.models import PayrollRun
+from hr.payroll.services import (
+    OVERTIME_MULTIPLIER,
+    daterange,
+    load_payroll_inputs,
+    shift_daily_hours,
+)
+
+
+def _to_int(value, places: int) -> int:
+    return int((Decimal(str(value or 0)) * (10 ** places)).to_integral_value())
+
+
+def _div_half_up(num, den):
+    """
+    قسمة integers مع ROUND_HALF_UP (بعيد عن الصفر) متل Decimal.
+    """
+    num = np.asarray(num, dtype=np.int64)
+    sign = np.where(num < 0, -1, 1)
+    return sign * ((2 * np.abs(num) + den) // (2 * den))
+
+
+def _cents_str(x) -> str:
+    return str(Decimal(int(x)).scaleb(-2))
+
+
+@dataclass
+class PayrollVariant:
+    name: str
+    overtime_multiplier: Decimal = OVERTIME_MULTIPLIER
+    # None = العطلة الأسبوعية من تقويم الشركة
+    weekly_holidays: frozenset | None = None
+    # department_id → نسبة الزيادة % (ممكن سالبة)
+    department_raises: dict[int, Decimal] = field(default_factory=dict)
+
+
+@dataclass
+class PayrollArrays:
+    employee_ids: np.ndarray          # [E]
+    employee_codes: list[str]
+    department_ids: np.ndarray        # [E] (0 = بدون قسم)
+    ok: np.ndarray                    # [E] bool: عنده عقد فعّال
+    basic_cents: np.ndarray           # [E]
+    weekdays: np.ndarray              # [D]
+    rest_days: frozenset              # العطلة الأسبوعية بتقويم الشركة
+    public_holidays: np.ndarray       # [D] bool: عطلة رسمية
+    special_working: np.ndarray       # [D] bool: يوم دوام استثنائي
+
+    expected: np.ndarray              # [E, D] ساعات × 100
+    worked: np.ndarray                # [E, D] ساعات × 100
+    late: np.ndarray                  # [E, D] دقائق
+    early: np.ndarray                 # [E, D] دقائق
+    absent: np.ndarray                # [E, D] ساعات × 100 (غياب بدون إجازة)
+    unpaid: np.ndarray                # [E, D] ساعات × 1000 (إجازة unpaid، نص يوم = نص الساعات)
+
+    approved_ot: np.ndarray           # [E] ساعات × 100
+    attendance_ot: np.ndarray         # [E] ساعات × 100 (fallback إذا ما في approved)
+
+
+def load_payroll_arrays(run: PayrollRun, employees_qs=None) -> PayrollArrays:
+    if employees_qs is None:
+        employees_qs = Employee.objects.filter(company=run.company, status=EmployeeStatus.ACTIVE)
+
+    employees = list(employees_qs)
+    inputs = load_payroll_inputs(run, employees_qs)
+
+    start = run.period_start
+    end = run.period_end
+    days = list(daterange(start, end))
+    E, D = len(employees), len(days)
+
+    ok = np.zeros(E, dtype=bool)
+    basic_cents = np.zeros(E, dtype=np.int64)
+    expected = np.zeros((E, D), dtype=np.int64)
+    worked = np.zeros((E, D), dtype=np.int64)
+    late = np.zeros((E, D), dtype=np.int64)
+    early = np.zeros((E, D), dtype=np.int64)
+    absent = np.zeros((E, D), dtype=np.int64)
+    unpaid = np.zeros((E, D), dtype=np.int64)
+    approved_ot = np.zeros(E, dtype=np.int64)
+    attendance_ot = np.zeros(E, dtype=np.int64)
+
+    hours_by_shift: dict = {}
+
+    holidays_mask = inputs.workdays.holidays_mask(start, end)
+    special_mask = inputs.workdays.special_working_mask(start, end)
+
+    for i, emp in enumerate(employees):
+        contract = inputs.active_contract(emp.id, start) or inputs.active_contract(emp.id, end)
+        if contract:
+            ok[i] = True
+            basic_cents[i] = _to_int(contract.base_salary, 2)
+
+        for d, shift in enumerate(inputs.shifts.expand(emp.id, start, end)):
+            h = hours_by_shift.get(shift)
+            if h is None:
+                h = hours_by_shift[shift] = _to_int(shift_daily_hours(shift), 2)
+            expected[i, d] = h
+
+        att = inputs.attendance.get(emp.id, {})
+        leaves = inputs.leaves.get(emp.id, {})
+
+        for rec in att.values():
+            d = (rec.date - start).days
+            worked[i, d] = _to_int(rec.total_hours, 2)
+            late[i, d] = int(rec.late_minutes or 0)
+            early[i, d] = int(rec.early_leave_minutes or 0)
+            attendance_ot[i] += _to_int(rec.overtime_hours, 2)
+
+        for d, day in enumerate(days):
+            info = leaves.get(day)
+            if info:
+                if info["type"] == LeaveType.UNPAID:
+                    unpaid[i, d] = expected[i, d] * (5 if info["half"] else 10)
+                continue
+            rec = att.get(day)
+            if not rec or rec.status == AttendanceStatus.ABSENT:
+                absent[i, d] = expected[i, d]
+
+        approved_ot[i] = _to_int(inputs.overtime.get(emp.id, 0), 2)
+
+    return PayrollArrays(
+        employee_ids=np.array([e.id for e in employees], dtype=np.int64),
+        employee_codes=[e.employee_code for e in employees],
+        department_ids=np.array([e.department_id or 0 for e in employees], dtype=np.int64),
+        ok=ok,
+        basic_cents=basic_cents,
+        weekdays=np.array([day.weekday() for day in days], dtype=np.int64),
+        rest_days=frozenset(inputs.workdays.rest_days(start.year)),
+        public_holidays=np.array([bool(holidays_mask >> d & 1) for d in range(D)], dtype=bool),
+        special_working=np.array([bool(special_mask >> d & 1) for d in range(D)], dtype=bool),
+        expected=expected,
+        worked=worked,
+        late=late,
+        early=early,
+        absent=absent,
+        unpaid=unpaid,
+        approved_ot=approved_ot,
+        attendance_ot=attendance_ot,
+    )
+
+
+def evaluate_variants(arrays: PayrollArrays, variants: list[PayrollVariant]) -> dict[str, np.ndarray]:
+    """
+    بيرجع arrays بشكل [V, E] (سنتات) لكل variant: basic, overtime_pay, deductions, net.
+    """
+    V = len(variants)
+
+    # [V, D]: 1 = يوم عمل (العطل الرسمية وأيام الدوام الاستثنائية من التقويم بتضل متل ما هي)
+    work = np.stack([
+        (
+            ~np.isin(arrays.weekdays, sorted(arrays.rest_days if v.weekly_holidays is None else v.weekly_holidays))
+            | arrays.special_working
+        ) & ~arrays.public_holidays
+        for v in variants
+    ]).astype(np.int64)
+
+    # مجاميع أيام العمل لكل variant: [E, D] @ [D, V] → [V, E]
+    expected_h = (arrays.expected @ work.T).T
+    late_m = (arrays.late @ work.T).T
+    early_m = (arrays.early @ work.T).T
+    absent_h = (arrays.absent @ work.T).T
+    unpaid_h = _div_half_up((arrays.unpaid @ work.T).T, 10)
+
+    # زيادات الأقسام: basic × (100 + pct) / 100 مع q2
+    factor = np.full((V, arrays.basic_cents.size), 1_000_000, dtype=np.int64)
+    for v, variant in enumerate(variants):
+        for dept_id, pct in variant.department_raises.items():
+            f = _to_int(Decimal("100") + Decimal(str(pct)), 4)
+            factor[v, arrays.department_ids == int(dept_id)] = f
+    basic = _div_half_up(arrays.basic_cents[None, :] * factor, 1_000_000)
+
+    # hourly_rate × 10^4 = basic / expected (لو expected = 0 → نقسم على 1.00)
+    denom = np.where(expected_h > 0, expected_h, 100)
+    rate = _div_half_up(basic * 10_000, denom)
+
+    late_hours = _div_half_up(late_m * 100, 60)
+    early_hours = _div_half_up(early_m * 100, 60)
+
+    # (ساعات × 100) × (rate × 10^4) → 10^6 → سنتات
+    late_ded = _div_half_up(late_hours * rate, 10_000)
+    early_ded = _div_half_up(early_hours * rate, 10_000)
+    absent_ded = _div_half_up(absent_h * rate, 10_000)
+    unpaid_ded = _div_half_up(unpaid_h * rate, 10_000)
+    deductions = late_ded + early_ded + absent_ded + unpaid_ded
+
+    ot_hours = np.where(arrays.approved_ot > 0, arrays.approved_ot, arrays.attendance_ot)
+    overtime = np.zeros_like(basic)
+    for v, variant in enumerate(variants):
+        mult = Decimal(str(variant.overtime_multiplier))
+        places = max(0, -mult.as_tuple().exponent)
+        mult_int = _to_int(mult, places)
+        overtime[v] = _div_half_up(ot_hours * rate[v] * mult_int, 10_000 * 10 ** places)
+
+    net = basic + overtime - deductions
+
+    mask = arrays.ok[None, :]
+    return {
+        "basic": np.where(mask, basic, 0),
+        "overtime_pay": np.where(mask, overtime, 0),
+        "deductions": np.where(mask, deductions, 0),
+        "net": np.where(mask, net, 0),
+    }
+
+
+def simulate_payroll_run(
+    run: PayrollRun,
+    variants: list[PayrollVariant],
+    employees_qs=None,
+    include_employees: bool = True,
+) -> dict:
+    """
+    بيقارن كل variant مع القواعد الحالية (baseline) وبيرجع الفرق لكل موظف وللمجموع.
+    """
+    arrays = load_payroll_arrays(run, employees_qs)
+    baseline = PayrollVariant(name="baseline")
+    out = evaluate_variants(arrays, [baseline, *variants])
+
+    ok_idx = np.flatnonzero(arrays.ok)
+    base_net = out["net"][0]
+
+    def totals(v):
+        return {
+            "basic_salary": _cents_str(out["basic"][v].sum()),
+            "overtime_pay": _cents_str(out["overtime_pay"][v].sum()),
+            "deductions": _cents_str(out["deductions"][v].sum()),
+            "net_salary": _cents_str(out["net"][v].sum()),
+        }
+
+    result = {
+        "run_id": run.id,
+        "employees": int(ok_idx.size),
+        "skipped": int(arrays.ok.size - ok_idx.size),
+        "baseline": totals(0),
+        "variants": [],
+    }
+
+    for v, variant in enumerate(variants, start=1):
+        delta = out["net"][v] - base_net
+        entry = {
+            "name": variant.name,
+            "totals": totals(v),
+            "delta_net": _cents_str(delta.sum()),
+        }
+        if include_employees:
+            entry["employees"] = [
+                {
+                    "employee_id": int(arrays.employee_ids[i]),
+                    "employee_code": arrays.employee_codes[i],
+                    "basic_salary": _cents_str(out["basic"][v, i]),
+                    "overtime_pay": _cents_str(out["overtime_pay"][v, i]),
+                    "deductions": _cents_str(out["deductions"][v, i]),
+                    "net_salary": _cents_str(out["net"][v, i]),
+                    "delta_net": _cents_str(delta[i]),
+                }
+                for i in ok_idx
+                if delta[i] != 0
+            ]
+        result["variants"].append(entry)
+
+    return result
@@ -0,0 +1,227 @@
+"""
+توليد شركة وهمية (synthetic) لقياس أداء الرواتب والحضور.
+كل الإدخال بـ bulk_create، فما في signals ولا full_clean لكل row.
+"""
+from __future__ import annotations
+
+import calendar
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from hr.attendance.models import AttendanceRecord, AttendanceStatus, EmployeeShiftAssignment, Shift
+from hr.contracts.models import ContractStatus, EmployeeContract
+from hr.employees.models import Employee, EmployeeStatus
+from hr.ess.models import ApprovalStatus, LeaveRequest, LeaveStatus, LeaveType, OvertimeRequest
+from hr.org_structure.models import Company, Department
+from hr.attendance.summary import rebuild_attendance_summary
+from hr.attendance.workdays import company_working_days
+
+
+BULK_BATCH_SIZE = 2000
+
+
+@dataclass
+class SyntheticCompany:
+    company: Company
+    hr_user: object
+    employees: int
+    periods: list[tuple[int, int]] = field(default_factory=list)
+    attendance_records: int = 0
+
+
+def _month_periods(months: int, last: date) -> list[tuple[int, int]]:
+    y, m = last.year, last.month
+    out = []
+    for _ in range(months):
+        out.append((y, m))
+        m -= 1
+        if m == 0:
+            y, m = y - 1, 12
+    return list(reversed(out))
+
+
+def _aware(day: date, t: time, minutes: int = 0):
+    return timezone.make_aware(datetime.combine(day, t), timezone.get_current_timezone()) + timedelta(minutes=minutes)
+
+
+def build_synthetic_company(
+    employees: int,
+    months: int = 1,
+    seed: int = 0,
+    code: str | None = None,
+    last_month: date | None = None,
+) -> SyntheticCompany:
+    rng = random.Random(seed)
+    User = get_user_model()
+
+    code = code or f"SYN{employees}S{seed}"
+    if last_month is None:
+        last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+    periods = _month_periods(months, last_month)
+
+    first_day = date(periods[0][0], periods[0][1], 1)
+    last_day = date(periods[-1][0], periods[-1][1], calendar.monthrange(*periods[-1])[1])
+
+    company = Company.objects.create(code=code, name=f"Synthetic {code}")
+
+    Department.objects.bulk_create([
+        Department(company=company, name=f"Dept {i}", code=f"D{i}")
+        for i in range(max(1, min(20, employees // 50)))
+    ])
+    departments = list(Department.objects.filter(company=company).order_by("id"))
+
+    shifts = [
+        Shift(name=f"{code} Day", code=f"{code}-DAY", start_time=time(8), end_time=time(16)),
+        Shift(name=f"{code} Evening", code=f"{code}-EVE", start_time=time(14), end_time=time(22),
+              allowed_late_minutes=10),
+        Shift(name=f"{code} Night", code=f"{code}-NGT", start_time=time(22), end_time=time(6),
+              is_overnight=True, required_daily_hours=Decimal("7.50")),
+    ]
+    Shift.objects.bulk_create(shifts)
+    shifts = list(Shift.objects.filter(code__startswith=f"{code}-").order_by("id"))
+
+    password = make_password(None)
+    prefix = code.lower()
+
+    hr_user = User.objects.create(username=f"{prefix}-hr", role="hr", password=password)
+
+    User.objects.bulk_create(
+        [
+            User(username=f"{prefix}-{i:06d}", first_name=f"Emp{i}", last_name=code, role="employee", password=password)
+            for i in range(employees)
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    users = list(User.objects.filter(username__startswith=f"{prefix}-0").order_by("username"))
+
+    hire = first_day - timedelta(days=365)
+    Employee.objects.bulk_create(
+        [
+            Employee(
+                user=hr_user,
+                company=company,
+                employee_code=f"{code}-HR",
+                hire_date=hire,
+                status=EmployeeStatus.ACTIVE,
+            )
+        ] + [
+            Employee(
+                user=u,
+                company=company,
+                department=departments[i % len(departments)],
+                employee_code=f"{code}-{i:06d}",
+                hire_date=hire,
+                status=EmployeeStatus.ACTIVE,
+            )
+            for i, u in enumerate(users)
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    emps = list(
+        Employee.objects
+        .filter(company=company, employee_code__startswith=f"{code}-0")
+        .order_by("employee_code")
+    )
+
+    contracts = []
+    assignments = []
+    emp_shift = {}
+    for i, emp in enumerate(emps):
+        # ~5% بدون عقد (بيطلعوا skipped بالرواتب)
+        if rng.random() >= 0.05:
+            contracts.append(EmployeeContract(
+                employee=emp,
+                start_date=hire,
+                end_date=last_day + timedelta(days=730),
+                status=ContractStatus.ACTIVE,
+                base_salary=Decimal(rng.randrange(60000, 400000)) / 100,
+            ))
+        shift = shifts[i % len(shifts)]
+        emp_shift[emp.id] = shift
+        assignments.append(EmployeeShiftAssignment(
+            employee=emp, shift=shift, start_date=first_day, end_date=last_day, is_primary=True,
+        ))
+        if rng.random() < 0.10:
+            assignments.append(EmployeeShiftAssignment(
+                employee=emp,
+                shift=shifts[(i + 1) % len(shifts)],
+                start_date=first_day + timedelta(days=rng.randrange(0, 20)),
+                end_date=last_day,
+                is_primary=False,
+            ))
+    EmployeeContract.objects.bulk_create(contracts, batch_size=BULK_BATCH_SIZE)
+    EmployeeShiftAssignment.objects.bulk_create(assignments, batch_size=BULK_BATCH_SIZE)
+
+    leaves = []
+    overtime = []
+    for y, m in periods:
+        month_days = calendar.monthrange(y, m)[1]
+        for emp in emps:
+            if rng.random() < 0.10:
+                start = date(y, m, rng.randrange(1, month_days - 2))
+                leaves.append(LeaveRequest(
+                    employee=emp,
+                    leave_type=rng.choice([LeaveType.ANNUAL, LeaveType.SICK, LeaveType.UNPAID]),
+                    start_date=start,
+                    end_date=start + timedelta(days=rng.randrange(0, 3)),
+                    is_half_day=rng.random() < 0.2,
+                    status=LeaveStatus.APPROVED,
+                ))
+            if rng.random() < 0.10:
+                overtime.append(OvertimeRequest(
+                    employee=emp,
+                    date=date(y, m, rng.randrange(1, month_days + 1)),
+                    hours=Decimal(rng.randrange(100, 400)) / 100,
+                    status=ApprovalStatus.APPROVED,
+                ))
+    LeaveRequest.objects.bulk_create(leaves, batch_size=BULK_BATCH_SIZE)
+    OvertimeRequest.objects.bulk_create(overtime, batch_size=BULK_BATCH_SIZE)
+
+    workdays = company_working_days(company.id)
+    total_records = 0
+    batch = []
+    day = first_day
+    while day <= last_day:
+        if workdays.is_working_day(day):
+            for emp in emps:
+                r = rng.random()
+                if r < 0.90:
+                    shift = emp_shift[emp.id]
+                    check_in = _aware(day, shift.start_time, rng.randrange(-10, 30))
+                    check_out = check_in + timedelta(minutes=rng.randrange(360, 600))
+                    rec = AttendanceRecord(
+                        employee=emp, date=day, shift=shift,
+                        check_in=check_in, check_out=check_out,
+                        status=AttendanceStatus.PRESENT,
+                    )
+                    # نفس الحقول المشتقة تبع save() بدون full_clean
+                    rec.fill_derived_fields()
+                    batch.append(rec)
+                elif r < 0.94:
+                    batch.append(AttendanceRecord(employee=emp, date=day, status=AttendanceStatus.ABSENT))
+
+                if len(batch) >= BULK_BATCH_SIZE:
+                    AttendanceRecord.objects.bulk_create(batch, batch_size=BULK_BATCH_SIZE)
+                    total_records += len(batch)
+                    batch = []
+        day += timedelta(days=1)
+    if batch:
+        AttendanceRecord.objects.bulk_create(batch, batch_size=BULK_BATCH_SIZE)
+        total_records += len(batch)
+
+    # bulk_create ما بيبعت signals
+    rebuild_attendance_summary(company_id=company.id)
+
+    return SyntheticCompany(
+        company=company,
+        hr_user=hr_user,
+        employees=len(emps),
+        periods=periods,
+        attendance_records=total_records,
+    )
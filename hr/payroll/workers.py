@@ -0,0 +1,22 @@
+"""
+دوال الـ worker processes تبع الرواتب.
+هالملف ما لازم يستورد models على مستوى الـ module: مع spawn (macOS/Windows)
+بينعمل import إلو قبل ما يصير django.setup() بالـ process الجديد.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def calc_payroll_shard(run, employees, inputs):
+    from hr.payroll.services import calc_employee_payroll_for_run
+
+    return [calc_employee_payroll_for_run(emp, run, inputs=inputs) for emp in employees]
+
+
+def render_payslip_shard(tasks):
+    from hr.payroll.payslips import render_payslip_files
+
+    return render_payslip_files(tasks)
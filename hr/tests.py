@@ -1,3 +1,1763 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import F, Sum
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from hr.attendance.absence import generate_absence_records
+from hr.attendance.archive import (
+    LIVE_ATTENDANCE_DAYS,
+    ArchiveMismatch,
+    archive_company,
+    build_monthly_rollups,
+    employee_month_attendance,
+    month_bounds,
+)
+from hr.attendance.caching import shared_cache
+from hr.attendance.logs import InvalidCursor, decode_cursor, encode_cursor
+from hr.attendance.models import (
+    AttendanceDailySummary,
+    AttendanceMonthlyRollup,
+    AttendanceOutboxEvent,
+    AttendanceRecomputeJob,
+    AttendanceRecord,
+    AttendanceRecordArchive,
+    AttendanceStatus,
+    CalendarDay,
+    CalendarDayType,
+    OutboxStatus,
+    RecomputeJobStatus,
+    EmployeeShiftAssignment,
+    Shift,
+)
+from hr.attendance.outbox import (
+    OUTBOX_BACKOFF_BASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    claim_outbox_batch,
+    dispatch_outbox_batch,
+    enqueue_attendance_event,
+    requeue_dead_events,
+)
+from hr.attendance.presence import broker, iter_presence_events
+from hr.attendance.recompute import claim_next_recompute_job, enqueue_attendance_recompute, run_recompute_job
+from hr.attendance.punch import record_check_in, record_check_out
+from hr.attendance.services import (
+    ShiftIndex,
+    cached_shift_for,
+    get_employee_shift_for_date,
+    invalidate_employee_shift,
+)
+from hr.attendance.summary import (
+    SUMMARY_COUNTERS,
+    company_day_counts,
+    rebuild_attendance_summary,
+    sync_record_summaries,
+)
+from hr.attendance.workdays import company_working_days, invalidate_working_days
+from hr.contracts.models import EmployeeContract
+from hr.employees.models import Employee, EmployeeStatus
+from hr.ess.models import LeaveRequest, LeaveStatus, LeaveType
+from hr.org_structure.models import Department
+from hr.payroll import services as payroll_services
+from hr.payroll.jobs import claim_next_job, enqueue_payroll_job, run_payroll_job
+from hr.payroll.exports import EXPORT_BREAKDOWN_COLUMNS, export_headers
+from hr.payroll.models import (
+    PAYROLL_BREAKDOWN_COLUMNS,
+    PayrollDirtyEmployee,
+    PayrollItem,
+    PayrollJob,
+    PayrollJobStatus,
+    PayrollRun,
+    PayrollRunStatus,
+    Payslip,
+    PayslipStatus,
+)
+from hr.payroll.payslips import DEFAULT_PAYSLIP_FONTS, render_payslip_pdf
+from hr.payroll.pdf_fonts import FontError, prepare_text, shape_arabic, visual_order
+from hr.payroll.reports import (
+    REPORT_SUM_FIELDS,
+    payroll_breakdown_report,
+    payroll_run_diff_queryset,
+    payroll_run_diff_summary,
+)
+from hr.payroll.services import (
+    _calc_payroll_decimal,
+    _calc_payroll_fixed,
+    calc_employee_payroll_for_run,
+    calc_payroll_parallel,
+    ensure_monthly_run,
+    generate_payroll_items,
+    is_weekly_holiday,
+    load_payroll_inputs,
+    mark_payroll_dirty,
+    recompute_dirty_payroll_items,
+)
+from hr.payroll.synthetic import build_synthetic_company
+
+try:
+    from hr.attendance.batch import fill_derived_fields_batch
+except ImportError:  # numpy مش منزّل
+    fill_derived_fields_batch = None
+
+try:
+    from hr.payroll.simulation import PayrollVariant, evaluate_variants, load_payroll_arrays, simulate_payroll_run
+except ImportError:  # numpy مش منزّل
+    simulate_payroll_run = None
+
+
+def _result_bytes(result) -> bytes:
+    # Decimal("1.0") == Decimal("1.00")، فمنقارن النص نفسه مش القيمة
+    return json.dumps(
+        {
+            "ok": result.ok,
+            "currency": result.currency,
+            "basic_salary": str(result.basic_salary),
+            "allowances": str(result.allowances),
+            "overtime_pay": str(result.overtime_pay),
+            "deductions": str(result.deductions),
+            "breakdown": result.breakdown,
+        },
+        sort_keys=True,
+    ).encode()
+
+
+class PayrollFixedPointParityTests(TestCase):
+    """
+    المسار الـ integer (_calc_payroll_fixed) لازم يطلع نفس الـ breakdown حرف بحرف
+    متل المسار المرجعي بـ Decimal (_calc_payroll_decimal).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.synthetic = build_synthetic_company(employees=120, months=2, seed=3)
+        company = cls.synthetic.company
+
+        # ساعات شفت ما بتنقسم على 2 ولا على 60 → نص سنت بالإجازة النص يوم وتقريب بالـ rate
+        Shift.objects.filter(code=f"{company.code}-EVE").update(required_daily_hours=Decimal("7.33"))
+
+        employees = list(Employee.objects.filter(company=company, employee_code__startswith=f"{company.code}-0"))
+        year, month = cls.synthetic.periods[-1]
+        run = ensure_monthly_run(company, year, month)
+        for emp in employees[:30]:
+            LeaveRequest.objects.create(
+                employee=emp,
+                leave_type=LeaveType.UNPAID,
+                start_date=run.period_start,
+                end_date=run.period_start,
+                is_half_day=True,
+                status=LeaveStatus.APPROVED,
+            )
+
+        cls.runs = [ensure_monthly_run(company, y, m) for y, m in cls.synthetic.periods]
+
+    def _employees(self):
+        return Employee.objects.filter(company=self.synthetic.company, status=EmployeeStatus.ACTIVE).order_by("id")
+
+    def _assert_parity(self):
+        checked = 0
+        for run in self.runs:
+            employees = list(self._employees())
+            inputs = load_payroll_inputs(run, employees)
+            for emp in employees:
+                contract = inputs.active_contract(emp.id, run.period_start) or inputs.active_contract(emp.id, run.period_end)
+                if not contract:
+                    continue
+                fixed = _calc_payroll_fixed(emp, run, inputs, contract)
+                reference = _calc_payroll_decimal(emp, run, inputs, contract)
+                self.assertEqual(_result_bytes(fixed), _result_bytes(reference), emp.employee_code)
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_breakdowns_are_identical(self):
+        self._assert_parity()
+
+    def test_identical_for_other_overtime_multipliers(self):
+        for multiplier in (Decimal("1"), Decimal("1.75"), Decimal("2.125")):
+            with self.subTest(multiplier=multiplier), \
+                    mock.patch.object(payroll_services, "OVERTIME_MULTIPLIER", multiplier):
+                self._assert_parity()
+
+    def test_falls_back_to_decimal_for_non_fixed_point_values(self):
+        run = self.runs[-1]
+        emp = self._employees().filter(contracts__isnull=False).first()
+        inputs = load_payroll_inputs(run, [emp])
+        rec = next(iter(inputs.attendance[emp.id].values()))
+        rec.total_hours = Decimal("7.255")
+
+        contract = inputs.active_contract(emp.id, run.period_start)
+        self.assertEqual(
+            _result_bytes(calc_employee_payroll_for_run(emp, run, inputs=inputs)),
+            _result_bytes(_calc_payroll_decimal(emp, run, inputs, contract)),
+        )
+
+
+class PayrollBulkInputsTests(TestCase):
+    """
+    generate_payroll_items بيقرأ كل جدول مرة وحدة للدورة، فعدد الـ queries ثابت مهما كان عدد الموظفين.
+    """
+
+    # employees + calendar (2) + contracts / attendance / leaves / overtime / shifts
+    # + savepoint / lock / items upsert+reload / payslips / totals (3) / dirty / release
+    GENERATE_QUERIES = 18
+
+    def _run(self, employees, seed):
+        synthetic = build_synthetic_company(employees=employees, months=1, seed=seed, code=f"BQ{employees}")
+        return ensure_monthly_run(synthetic.company, *synthetic.periods[-1])
+
+    def test_query_count_does_not_depend_on_employee_count(self):
+        # 25 لسا بـ INSERT واحد حتى مع حد المتغيرات تبع SQLite
+        for employees, seed in ((3, 21), (25, 22)):
+            with self.subTest(employees=employees):
+                run = self._run(employees, seed)
+                with self.assertNumQueries(self.GENERATE_QUERIES):
+                    result = generate_payroll_items(run, workers=1)
+                self.assertEqual(PayrollItem.objects.filter(payroll_run=run).count(), result["generated"])
+                self.assertGreater(result["generated"], 0)
+
+    def test_items_match_per_employee_calculation(self):
+        run = self._run(12, 23)
+        generate_payroll_items(run, workers=1)
+
+        items = PayrollItem.objects.filter(payroll_run=run).select_related("employee")
+        self.assertEqual(items.count(), 12)
+        for item in items:
+            # بدون inputs: كل موظف بيحمّل مدخلاته لحاله
+            single = calc_employee_payroll_for_run(item.employee, run)
+            self.assertEqual(
+                (item.basic_salary, item.allowances, item.overtime_pay, item.deductions, item.currency, item.breakdown),
+                (single.basic_salary, single.allowances, single.overtime_pay, single.deductions, single.currency,
+                 single.breakdown),
+                item.employee.employee_code,
+            )
+
+    def test_subset_keeps_only_the_shard(self):
+        run = self._run(6, 24)
+        employees = list(Employee.objects.filter(company=run.company, contracts__isnull=False).distinct().order_by("id"))
+        inputs = load_payroll_inputs(run, employees)
+        shard = employees[:2]
+
+        subset = inputs.subset(e.id for e in shard)
+
+        self.assertEqual(set(subset.contracts), {e.id for e in shard})
+        self.assertLessEqual(set(subset.attendance), {e.id for e in shard})
+        for emp in shard:
+            self.assertEqual(
+                _result_bytes(calc_employee_payroll_for_run(emp, run, inputs=subset)),
+                _result_bytes(calc_employee_payroll_for_run(emp, run, inputs=inputs)),
+            )
+
+
+class PayrollParallelTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=30, months=1, seed=25)
+        self.run = ensure_monthly_run(self.synthetic.company, *self.synthetic.periods[-1])
+        self.employees = list(
+            Employee.objects.filter(company=self.synthetic.company, status=EmployeeStatus.ACTIVE).order_by("id")
+        )
+
+    def _items(self):
+        return {
+            item.employee_id: (item.basic_salary, item.allowances, item.overtime_pay, item.deductions, item.breakdown)
+            for item in PayrollItem.objects.filter(payroll_run=self.run)
+        }
+
+    def test_process_pool_matches_serial(self):
+        inputs = load_payroll_inputs(self.run, self.employees)
+
+        parallel = calc_payroll_parallel(self.run, self.employees, inputs, workers=2)
+
+        serial = [calc_employee_payroll_for_run(emp, self.run, inputs=inputs) for emp in self.employees]
+        self.assertEqual([_result_bytes(r) for r in parallel], [_result_bytes(r) for r in serial])
+
+    def test_generate_with_payroll_workers_matches_serial(self):
+        with override_settings(PAYROLL_WORKERS=2):
+            generate_payroll_items(self.run)
+        parallel = self._items()
+
+        generate_payroll_items(self.run, workers=1)
+
+        self.assertEqual(self._items(), parallel)
+        self.assertGreater(len(parallel), 0)
+
+    def test_single_worker_or_employee_stays_serial(self):
+        with mock.patch.object(payroll_services, "calc_payroll_parallel") as pool:
+            with override_settings(PAYROLL_WORKERS=1):
+                generate_payroll_items(self.run)
+            generate_payroll_items(self.run, employees_qs=Employee.objects.filter(pk=self.employees[0].pk), workers=4)
+
+        pool.assert_not_called()
+        self.assertTrue(PayrollItem.objects.filter(payroll_run=self.run).exists())
+
+
+@unittest.skipIf(simulate_payroll_run is None, "numpy is not installed")
+class PayrollSimulationTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=6, months=1, seed=37)
+        self.run = ensure_monthly_run(self.synthetic.company, *self.synthetic.periods[-1])
+        generate_payroll_items(self.run, workers=1)
+        self.items = {item.employee_id: item for item in PayrollItem.objects.filter(payroll_run=self.run)}
+
+    def test_baseline_matches_engine_items(self):
+        arrays = load_payroll_arrays(self.run)
+        out = evaluate_variants(arrays, [PayrollVariant(name="baseline")])
+
+        compared = 0
+        for i, employee_id in enumerate(arrays.employee_ids):
+            item = self.items.get(int(employee_id))
+            if item is None:
+                self.assertFalse(arrays.ok[i])
+                continue
+            for key, field_name in (
+                ("basic", "basic_salary"),
+                ("overtime_pay", "overtime_pay"),
+                ("deductions", "deductions"),
+                ("net", "net_salary"),
+            ):
+                self.assertEqual(Decimal(int(out[key][0, i])).scaleb(-2), getattr(item, field_name), (item.employee_id, key))
+            compared += 1
+        self.assertEqual(compared, len(self.items))
+
+        result = simulate_payroll_run(self.run, [PayrollVariant(name="same")])
+        totals = {
+            name: str(sum((getattr(item, name) for item in self.items.values()), Decimal("0.00")))
+            for name in ("basic_salary", "overtime_pay", "deductions", "net_salary")
+        }
+        self.assertEqual(result["baseline"], totals)
+        self.assertEqual(result["variants"][0]["delta_net"], "0.00")
+        self.assertEqual(result["variants"][0]["employees"], [])
+
+    def test_department_raise_matches_engine_with_new_salaries(self):
+        department_id = Employee.objects.get(pk=next(iter(self.items))).department_id
+        raised = [item for item in self.items.values() if item.employee.department_id == department_id]
+
+        result = simulate_payroll_run(
+            self.run, [PayrollVariant(name="raise", department_raises={department_id: Decimal("10")})],
+        )
+        [variant] = result["variants"]
+
+        # نفس الزيادة على العقود والمحرك الأصلي لازم يطلع نفس الأرقام
+        for item in raised:
+            contract = EmployeeContract.objects.filter(employee_id=item.employee_id).order_by("-start_date").first()
+            contract.base_salary = (contract.base_salary * Decimal("1.10")).quantize(Decimal("0.01"))
+            EmployeeContract.objects.filter(pk=contract.pk).update(base_salary=contract.base_salary)
+
+        expected = {}
+        for item in raised:
+            res = calc_employee_payroll_for_run(item.employee, self.run)
+            net = res.basic_salary + res.allowances + res.overtime_pay - res.deductions
+            expected[item.employee_id] = {
+                "basic_salary": str(res.basic_salary),
+                "net_salary": str(net),
+                "delta_net": str(net - item.net_salary),
+            }
+
+        self.assertEqual(
+            {
+                row["employee_id"]: {key: row[key] for key in ("basic_salary", "net_salary", "delta_net")}
+                for row in variant["employees"]
+            },
+            expected,
+        )
+        self.assertEqual(variant["delta_net"], str(sum((Decimal(row["delta_net"]) for row in expected.values()), Decimal("0.00"))))
+
+
+class PayrollTotalsTests(TestCase):
+    """
+    الـ totals بتتعدّل بالفرق، فلازم دايماً تطلع متل recalculate_totals() من الصفر.
+    """
+
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=4, months=1, seed=47)
+        self.run = ensure_monthly_run(self.synthetic.company, *self.synthetic.periods[-1])
+        generate_payroll_items(self.run, workers=1)
+        self.run.refresh_from_db()
+
+    def _totals(self):
+        self.run.refresh_from_db()
+        return self.run.total_employees, self.run.total_gross, self.run.total_net
+
+    def _assert_totals_match_items(self):
+        agg = PayrollItem.objects.filter(payroll_run=self.run).aggregate(gross=Sum("gross_salary"), net=Sum("net_salary"))
+        count = PayrollItem.objects.filter(payroll_run=self.run).count()
+        self.assertEqual(self._totals(), (count, agg["gross"] or Decimal("0.00"), agg["net"] or Decimal("0.00")))
+
+    def test_bulk_write_recalculates_totals(self):
+        self._assert_totals_match_items()
+        self.assertGreater(self.run.total_employees, 0)
+
+        item = PayrollItem.objects.filter(payroll_run=self.run).first()
+        PayrollItem.bulk_write(self.run, [PayrollItem(
+            employee_id=item.employee_id,
+            basic_salary=item.basic_salary + Decimal("100.00"),
+            allowances=item.allowances,
+            overtime_pay=item.overtime_pay,
+            deductions=item.deductions,
+            currency=item.currency,
+            breakdown=item.breakdown,
+        )])
+
+        self._assert_totals_match_items()
+        payslip = Payslip.objects.get(payroll_run=self.run, employee_id=item.employee_id)
+        self.assertEqual(payslip.net_amount, item.net_salary + Decimal("100.00"))
+
+        PayrollRun.objects.filter(pk=self.run.pk).update(status=PayrollRunStatus.APPROVED)
+        self.run.refresh_from_db()
+        with self.assertRaises(ValidationError):
+            PayrollItem.bulk_write(self.run, [item])
+
+    def test_save_applies_the_delta(self):
+        employees, gross, net = self._totals()
+        item = PayrollItem.objects.filter(payroll_run=self.run).first()
+
+        item.overtime_pay += Decimal("12.50")
+        item.deductions += Decimal("2.25")
+        item.save()
+
+        self.assertEqual(self._totals(), (employees, gross + Decimal("12.50"), net + Decimal("10.25")))
+        self._assert_totals_match_items()
+
+    def test_every_delete_path_updates_totals(self):
+        items = list(PayrollItem.objects.filter(payroll_run=self.run).order_by("id"))
+
+        items[0].delete()
+        self._assert_totals_match_items()
+
+        # QuerySet.delete() (والـ admin) ما بيستدعي PayrollItem.delete()
+        PayrollItem.objects.filter(pk__in=[items[1].pk, items[2].pk]).delete()
+        self._assert_totals_match_items()
+        self.assertEqual(self.run.total_employees, len(items) - 3)
+
+        self.run.delete()
+        self.assertFalse(PayrollItem.objects.filter(pk=items[3].pk).exists())
+
+    def test_recompute_dropping_an_employee_keeps_totals(self):
+        item = PayrollItem.objects.filter(payroll_run=self.run).first()
+        EmployeeContract.objects.filter(employee_id=item.employee_id).delete()
+
+        recompute_dirty_payroll_items(self.run)
+
+        self.assertFalse(PayrollItem.objects.filter(pk=item.pk).exists())
+        self._assert_totals_match_items()
+
+
+class PayrollDirtyRecomputeTests(TestCase):
+    """
+    recompute_dirty_payroll_items لازم يوصل لنفس نتيجة توليد الـ run من جديد.
+    """
+
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=6, months=1, seed=5)
+        year, month = self.synthetic.periods[-1]
+        self.run = ensure_monthly_run(self.synthetic.company, year, month)
+        generate_payroll_items(self.run)
+        self.employee = (
+            Employee.objects
+            .filter(company=self.synthetic.company, payroll_items__payroll_run=self.run)
+            .order_by("id")
+            .first()
+        )
+
+    def _working_day(self):
+        day = self.run.period_start
+        while is_weekly_holiday(day):
+            day += timedelta(days=1)
+        return day
+
+    def _item(self):
+        return PayrollItem.objects.filter(payroll_run=self.run, employee=self.employee).first()
+
+    def test_moving_leave_out_of_period_marks_old_period(self):
+        day = self._working_day()
+        leave = LeaveRequest.objects.create(
+            employee=self.employee,
+            leave_type=LeaveType.UNPAID,
+            start_date=day,
+            end_date=day,
+            status=LeaveStatus.APPROVED,
+        )
+        recompute_dirty_payroll_items(self.run)
+        self.assertGreater(self._item().unpaid_leave_hours, 0)
+
+        leave.start_date = leave.end_date = self.run.period_end + timedelta(days=10)
+        leave.save()
+        self.assertTrue(self.run.dirty_employees.filter(employee=self.employee).exists())
+
+        recompute_dirty_payroll_items(self.run)
+        self.assertEqual(self._item().unpaid_leave_hours, 0)
+
+    def test_deleting_leave_marks_its_period(self):
+        leave = LeaveRequest.objects.create(
+            employee=self.employee,
+            leave_type=LeaveType.UNPAID,
+            start_date=self._working_day(),
+            end_date=self._working_day(),
+            status=LeaveStatus.APPROVED,
+        )
+        recompute_dirty_payroll_items(self.run)
+        leave.delete()
+        self.assertTrue(self.run.dirty_employees.filter(employee=self.employee).exists())
+
+    def test_employee_without_contract_is_removed_from_run(self):
+        item = self._item()
+        self.run.refresh_from_db()
+        before = (self.run.total_employees, self.run.total_gross, self.run.total_net)
+
+        self.employee.contracts.all().delete()
+        result = recompute_dirty_payroll_items(self.run)
+
+        self.assertEqual(result["removed"], 1)
+        self.assertIsNone(self._item())
+        self.assertFalse(Payslip.objects.filter(payroll_run=self.run, employee=self.employee).exists())
+        self.run.refresh_from_db()
+        self.assertEqual(
+            (self.run.total_employees, self.run.total_gross, self.run.total_net),
+            (before[0] - 1, before[1] - item.gross_salary, before[2] - item.net_salary),
+        )
+
+
+class PayrollJobOwnershipTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=4, months=1, seed=6)
+        year, month = self.synthetic.periods[-1]
+        self.run = ensure_monthly_run(self.synthetic.company, year, month)
+
+    def test_job_failed_as_stale_does_not_write(self):
+        enqueue_payroll_job(self.run)
+        job = claim_next_job()
+        # fail_stale_jobs علّمها failed والـ worker لسا عم يحسب
+        PayrollJob.objects.filter(pk=job.pk).update(status=PayrollJobStatus.FAILED)
+
+        job = run_payroll_job(job)
+
+        self.assertEqual(job.status, PayrollJobStatus.FAILED)
+        self.assertFalse(PayrollItem.objects.filter(payroll_run=self.run).exists())
+
+    def test_running_job_heartbeats_while_writing(self):
+        enqueue_payroll_job(self.run)
+        job = claim_next_job()
+        started = job.heartbeat_at
+
+        job = run_payroll_job(job)
+
+        self.assertEqual(job.status, PayrollJobStatus.SUCCEEDED)
+        self.assertGreater(job.heartbeat_at, started)
+        self.assertTrue(PayrollItem.objects.filter(payroll_run=self.run).exists())
+
+
+class WorkingDaysCacheTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=1, months=1, seed=7)
+        self.company = self.synthetic.company
+        workdays = company_working_days(self.company.id)
+        year, month = self.synthetic.periods[-1]
+        self.day = next(workdays.days(date(year, month, 1), date(year, month, 28)))
+
+    def _add_holiday_without_signal(self):
+        # bulk_create ما بيبعت post_save، متل تعديل من process تاني ما وصلنا الـ invalidation تبعه
+        CalendarDay.objects.bulk_create([
+            CalendarDay(company=self.company, date=self.day, day_type=CalendarDayType.PUBLIC_HOLIDAY),
+        ])
+
+    def test_process_local_cache_is_not_shared_across_requests(self):
+        self.assertIsNone(shared_cache())
+        self.assertTrue(company_working_days(self.company.id).is_working_day(self.day))
+
+        self._add_holiday_without_signal()
+
+        self.assertFalse(company_working_days(self.company.id).is_working_day(self.day))
+
+    def test_shared_cache_serves_bitmaps_until_invalidated(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+        }):
+            self.assertIsNotNone(shared_cache())
+            self.assertTrue(company_working_days(self.company.id).is_working_day(self.day))
+
+            self._add_holiday_without_signal()
+            self.assertTrue(company_working_days(self.company.id).is_working_day(self.day))
+
+            invalidate_working_days(self.company.id)
+            self.assertFalse(company_working_days(self.company.id).is_working_day(self.day))
+
+
+class ShiftIndexTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=1, months=1, seed=16)
+        company = self.synthetic.company
+        self.employee = Employee.objects.get(employee_code=f"{company.code}-000000")
+        EmployeeShiftAssignment.objects.filter(employee=self.employee).delete()
+        day, eve = (Shift.objects.get(code=f"{company.code}-{code}") for code in ("DAY", "EVE"))
+
+        for shift, start, end, primary in (
+            (day, date(2031, 1, 1), date(2031, 1, 31), True),
+            # ثانوي متداخل: بيربح بس بعد ما يخلص الأساسي
+            (eve, date(2031, 1, 10), date(2031, 2, 20), False),
+            # أساسي أحدث جوّا الأول: بيربح بفترته
+            (eve, date(2031, 1, 20), date(2031, 1, 25), True),
+            # مفتوح (end_date مش nullable، فآخر تاريخ ممكن)
+            (day, date(2031, 3, 1), date.max, True),
+        ):
+            EmployeeShiftAssignment.objects.create(
+                employee=self.employee, shift=shift, start_date=start, end_date=end, is_primary=primary,
+            )
+
+    def _per_record(self, day):
+        # الـ lookup القديم: query لكل يوم
+        assign = (
+            EmployeeShiftAssignment.objects
+            .filter(employee=self.employee, start_date__lte=day, end_date__gte=day)
+            .order_by("-is_primary", "-start_date")
+            .first()
+        )
+        return assign.shift if assign else None
+
+    def test_matches_per_record_lookup(self):
+        start, end = date(2030, 12, 25), date(2031, 3, 10)
+        index = ShiftIndex.load([self.employee], start, date(2040, 1, 1))
+
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)] + [date(2039, 12, 31)]
+        for day in days:
+            with self.subTest(day=day):
+                self.assertEqual(index.shift_for(self.employee.id, day), self._per_record(day))
+
+        self.assertEqual(index.expand(self.employee.id, start, end), [self._per_record(d) for d in days[:-1]])
+
+    def test_day_outside_every_assignment(self):
+        index = ShiftIndex.load([self.employee], date(2030, 1, 1), date(2040, 1, 1))
+
+        for day in (date(2030, 12, 31), date(2031, 2, 21), date(2031, 2, 28)):
+            with self.subTest(day=day):
+                self.assertIsNone(index.shift_for(self.employee.id, day))
+                self.assertIsNone(self._per_record(day))
+        self.assertIsNone(index.shift_for(self.employee.id + 1000, date(2031, 1, 5)))
+
+    def test_subset_and_get_employee_shift_for_date(self):
+        index = ShiftIndex.load([self.employee], date(2031, 1, 1), date(2031, 3, 31))
+
+        self.assertEqual(index.subset([self.employee.id]).shift_for(self.employee.id, date(2031, 1, 22)),
+                         self._per_record(date(2031, 1, 22)))
+        self.assertIsNone(index.subset([]).shift_for(self.employee.id, date(2031, 1, 22)))
+        self.assertEqual(get_employee_shift_for_date(self.employee, date(2031, 2, 5)).shift,
+                         self._per_record(date(2031, 2, 5)))
+
+
+class CachedShiftTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=1, months=1, seed=8)
+        company = self.synthetic.company
+        self.employee = Employee.objects.get(employee_code=f"{company.code}-000000")
+        year, month = self.synthetic.periods[-1]
+        self.day = date(year, month, 10)
+        self.other = Shift.objects.filter(code__startswith=company.code).exclude(
+            pk=cached_shift_for(self.employee.id, self.day).pk,
+        ).first()
+
+    def _reassign_without_signal(self):
+        EmployeeShiftAssignment.objects.filter(employee=self.employee).update(shift=self.other)
+
+    def test_process_local_cache_reads_current_assignment(self):
+        self._reassign_without_signal()
+        self.assertEqual(cached_shift_for(self.employee.id, self.day), self.other)
+
+    def test_shared_cache_serves_shift_until_invalidated(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+        }):
+            before = cached_shift_for(self.employee.id, self.day)
+            self._reassign_without_signal()
+            self.assertEqual(cached_shift_for(self.employee.id, self.day), before)
+
+            invalidate_employee_shift(self.employee.id)
+            self.assertEqual(cached_shift_for(self.employee.id, self.day), self.other)
+
+
+class AttendanceSummaryCounterTests(TestCase):
+    """
+    العدّادات اللي بتتحدّث بالفرق لازم تطلع متل rebuild_attendance_summary من الصفر.
+    """
+
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=4, months=1, seed=14)
+        self.company = self.synthetic.company
+        self.employee = Employee.objects.get(employee_code=f"{self.company.code}-000000")
+        self.day = date(2031, 3, 4)
+
+    def _rows(self):
+        return sorted(
+            AttendanceDailySummary.objects.filter(company=self.company, total__gt=0)
+            .values_list("department_id", "date", *SUMMARY_COUNTERS)
+        )
+
+    def _assert_matches_rebuild(self):
+        incremental = self._rows()
+        rebuild_attendance_summary(company_id=self.company.id)
+        self.assertEqual(incremental, self._rows())
+
+    def _day(self):
+        return company_day_counts(self.company.id, self.day)
+
+    def test_save_and_delete_move_counts(self):
+        record = AttendanceRecord.objects.create(employee=self.employee, date=self.day, status=AttendanceStatus.PRESENT)
+        self.assertEqual((self._day()["total"], self._day()["present"], self._day()["anomalies"]), (1, 1, 0))
+
+        record.status = AttendanceStatus.ABSENT
+        record.save()
+        self.assertEqual((self._day()["present"], self._day()["absent"], self._day()["anomalies"]), (0, 1, 1))
+        self._assert_matches_rebuild()
+
+        record.delete()
+        self.assertEqual(self._day(), dict.fromkeys(SUMMARY_COUNTERS, 0))
+        self._assert_matches_rebuild()
+
+    def test_moving_employee_moves_counts_between_departments(self):
+        AttendanceRecord.objects.create(employee=self.employee, date=self.day, status=AttendanceStatus.ABSENT)
+        department = Department.objects.create(company=self.company, name="Moved", code="MV")
+
+        self.employee.department = department
+        self.employee.save()
+
+        self.assertEqual(
+            AttendanceDailySummary.objects.get(department=department, date=self.day).absent, 1,
+        )
+        self._assert_matches_rebuild()
+
+    def test_deleting_department_keeps_counts_of_its_employees(self):
+        before = company_day_counts(self.company.id, *month_bounds(*self.synthetic.periods[-1]))
+        self.assertGreater(before["total"], 0)
+
+        Department.objects.filter(pk=self.employee.department_id).delete()
+
+        self.assertEqual(company_day_counts(self.company.id, *month_bounds(*self.synthetic.periods[-1])), before)
+        self._assert_matches_rebuild()
+
+
+class AttendanceRecomputeTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=2, months=1, seed=33)
+        self.company = self.synthetic.company
+        self.employee = Employee.objects.get(employee_code=f"{self.company.code}-000000")
+        self.day = date(2031, 3, 5)
+        self.run = ensure_monthly_run(self.company, self.day.year, self.day.month)
+        self.shift = Shift.objects.create(
+            name="Recompute",
+            code=f"{self.company.code}-RCP",
+            start_time=time(9, 0),
+            end_time=time(17, 0),
+            allowed_late_minutes=10,
+        )
+
+        def at(hour, minute):
+            return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+        self.record = AttendanceRecord.objects.create(
+            employee=self.employee,
+            date=self.day,
+            shift=self.shift,
+            check_in=at(9, 25),
+            check_out=at(16, 30),
+        )
+        PayrollDirtyEmployee.objects.all().delete()
+
+    def _run_queued_job(self):
+        job = claim_next_recompute_job()
+        self.assertIsNotNone(job)
+        return run_recompute_job(job)
+
+    def test_shift_time_change_recomputes_records(self):
+        self.assertEqual(
+            (self.record.status, self.record.late_minutes, self.record.early_leave_minutes),
+            (AttendanceStatus.LATE, 15, 30),
+        )
+        self.assertEqual(company_day_counts(self.company.id, self.day)["late"], 1)
+
+        self.shift.start_time = time(9, 30)
+        self.shift.end_time = time(16, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift.save()
+        job = self._run_queued_job()
+
+        self.assertEqual((job.status, job.shift_id, job.changed), (RecomputeJobStatus.SUCCEEDED, self.shift.id, 1))
+        self.record.refresh_from_db()
+        self.assertEqual(
+            (self.record.status, self.record.late_minutes, self.record.early_leave_minutes),
+            (AttendanceStatus.PRESENT, 0, 0),
+        )
+
+        counts = company_day_counts(self.company.id, self.day)
+        self.assertEqual((counts["total"], counts["present"], counts["late"], counts["anomalies"]), (1, 1, 0, 0))
+        rebuild_attendance_summary(company_id=self.company.id, start=self.day, end=self.day)
+        self.assertEqual(company_day_counts(self.company.id, self.day), counts)
+        self.assertTrue(PayrollDirtyEmployee.objects.filter(payroll_run=self.run, employee=self.employee).exists())
+
+    def test_company_range_job(self):
+        job = enqueue_attendance_recompute(self.company.id, self.day, self.day)
+        self.assertEqual(enqueue_attendance_recompute(self.company.id, self.day, self.day), job)
+        self.assertNotEqual(enqueue_attendance_recompute(self.company.id, self.day, None), job)
+        AttendanceRecomputeJob.objects.exclude(pk=job.pk).delete()
+
+        # تعديل مباشر بالـ DB (بدون signals)، والـ job بترجّع القيم الصح
+        Shift.objects.filter(pk=self.shift.pk).update(start_time=time(9, 30))
+        job = self._run_queued_job()
+
+        self.assertEqual((job.company_id, job.total, job.changed), (self.company.id, 1, 1))
+        self.record.refresh_from_db()
+        self.assertEqual((self.record.status, self.record.late_minutes), (AttendanceStatus.PRESENT, 0))
+
+
+class AbsenceRecordTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=3, months=1, seed=15)
+        self.company = self.synthetic.company
+        self.staff = list(Employee.objects.filter(company=self.company, status=EmployeeStatus.ACTIVE).order_by("id"))
+        workdays = company_working_days(self.company.id)
+        week = (date(2031, 3, 3), date(2031, 3, 9))
+        self.working_day = next(workdays.days(*week))
+        self.rest_day = next(
+            week[0] + timedelta(days=n) for n in range(7)
+            if not workdays.is_working_day(week[0] + timedelta(days=n))
+        )
+
+    def _statuses(self, day):
+        return dict(AttendanceRecord.objects.filter(employee__company=self.company, date=day).values_list("employee_id", "status"))
+
+    def test_working_day_marks_absent_and_on_leave(self):
+        checked_in, on_leave = self.staff[0], self.staff[1]
+        AttendanceRecord.objects.create(employee=checked_in, date=self.working_day, status=AttendanceStatus.PRESENT)
+        LeaveRequest.objects.create(
+            employee=on_leave,
+            leave_type=LeaveType.ANNUAL,
+            start_date=self.working_day,
+            end_date=self.working_day,
+            status=LeaveStatus.APPROVED,
+        )
+
+        counts = generate_absence_records(self.company, self.working_day)
+
+        statuses = self._statuses(self.working_day)
+        self.assertEqual(statuses[checked_in.id], AttendanceStatus.PRESENT)
+        self.assertEqual(statuses[on_leave.id], AttendanceStatus.ON_LEAVE)
+        self.assertEqual(len(statuses), len(self.staff))
+        self.assertEqual(counts[AttendanceStatus.ON_LEAVE], 1)
+        self.assertEqual(counts[AttendanceStatus.ABSENT], len(self.staff) - 2)
+        day_counts = company_day_counts(self.company.id, self.working_day)
+        self.assertEqual((day_counts["total"], day_counts["absent"]), (len(self.staff), len(self.staff) - 2))
+
+    def test_running_twice_creates_nothing_new(self):
+        generate_absence_records(self.company, self.working_day)
+
+        counts = generate_absence_records(self.company, self.working_day)
+
+        self.assertEqual(sum(counts.values()), 0)
+        self.assertEqual(company_day_counts(self.company.id, self.working_day)["total"], len(self.staff))
+
+    def test_public_holiday_and_rest_day(self):
+        CalendarDay.objects.create(company=self.company, date=self.working_day, day_type=CalendarDayType.PUBLIC_HOLIDAY)
+
+        holiday = generate_absence_records(self.company, self.working_day)
+        rest = generate_absence_records(self.company, self.rest_day)
+
+        self.assertEqual(holiday[AttendanceStatus.HOLIDAY], len(self.staff))
+        self.assertEqual(set(self._statuses(self.working_day).values()), {AttendanceStatus.HOLIDAY})
+        self.assertEqual(sum(rest.values()), 0)
+        self.assertEqual(self._statuses(self.rest_day), {})
+
+
+class AttendanceArchiveTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=4, months=2, seed=9)
+        self.company = self.synthetic.company
+        self.year, self.month = self.synthetic.periods[0]
+        run = ensure_monthly_run(self.company, self.year, self.month)
+        PayrollRun.objects.filter(pk=run.pk).update(status=PayrollRunStatus.PAID)
+        self.start, self.end = month_bounds(self.year, self.month)
+        self.month_records = AttendanceRecord.objects.filter(
+            employee__company=self.company, date__gte=self.start, date__lte=self.end,
+        )
+        # بعد الشهر بشهرين ونص: برّا نافذة الـ dashboards
+        self.today = self.end + timedelta(days=45)
+
+    def _summaries(self):
+        return sorted(
+            AttendanceDailySummary.objects.filter(company=self.company)
+            .values_list("department_id", "date", *SUMMARY_COUNTERS)
+        )
+
+    def test_archive_moves_rows_and_keeps_summaries(self):
+        count = self.month_records.count()
+        summaries = self._summaries()
+        dirty = PayrollDirtyEmployee.objects.count()
+
+        result = archive_company(self.company.id, self.today, after_months=1)
+
+        self.assertEqual(result["archived"], [(self.year, self.month)])
+        self.assertEqual(result["records_moved"], count)
+        self.assertFalse(self.month_records.exists())
+        self.assertEqual(AttendanceRecordArchive.objects.filter(employee__company=self.company).count(), count)
+        rollups = AttendanceMonthlyRollup.objects.filter(company=self.company, year=self.year, month=self.month)
+        self.assertTrue(all(rollups.values_list("archived", flat=True)))
+        self.assertEqual(sum(rollups.values_list("records", flat=True)), count)
+        self.assertEqual(self._summaries(), summaries)
+        self.assertEqual(PayrollDirtyEmployee.objects.count(), dirty)
+
+        rebuild_attendance_summary(company_id=self.company.id)
+        self.assertEqual(self._summaries(), summaries)
+
+    def test_rollup_matches_live_aggregate(self):
+        employee_id = self.month_records.values_list("employee_id", flat=True).first()
+        live = employee_month_attendance(employee_id, self.year, self.month)
+
+        archive_company(self.company.id, self.today, after_months=1)
+
+        self.assertEqual(employee_month_attendance(employee_id, self.year, self.month), live)
+
+    def test_conflicting_archive_row_aborts_month(self):
+        record = self.month_records.order_by("pk").first()
+        AttendanceRecordArchive.objects.create(
+            id=record.id,
+            employee_id=record.employee_id,
+            date=record.date,
+            status=AttendanceStatus.HOLIDAY if record.status != AttendanceStatus.HOLIDAY else AttendanceStatus.ABSENT,
+            created_at=record.created_at,
+        )
+        count = self.month_records.count()
+
+        with self.assertRaises(ArchiveMismatch):
+            archive_company(self.company.id, self.today, after_months=1)
+
+        self.assertEqual(self.month_records.count(), count)
+        self.assertFalse(AttendanceMonthlyRollup.objects.filter(company=self.company, archived=True).exists())
+
+    def test_month_inside_dashboard_window_is_only_rolled_up(self):
+        result = archive_company(self.company.id, self.end + timedelta(days=LIVE_ATTENDANCE_DAYS - 1), after_months=1)
+
+        self.assertEqual(result["archived"], [])
+        self.assertIn((self.year, self.month), result["rolled_up"])
+        self.assertTrue(self.month_records.exists())
+
+    def _rolled_up(self, employee_id):
+        return AttendanceMonthlyRollup.objects.filter(employee_id=employee_id, year=self.year, month=self.month).exists()
+
+    def _fresh(self, employee_id):
+        build_monthly_rollups(self.company.id, self.year, self.month)
+        return employee_month_attendance(employee_id, self.year, self.month)
+
+    def test_editing_a_rolled_up_month_drops_the_stale_rollup(self):
+        build_monthly_rollups(self.company.id, self.year, self.month)
+        record, other = self.month_records.order_by("pk")[:2]
+        employee_id = record.employee_id
+
+        record.status = AttendanceStatus.HOLIDAY if record.status != AttendanceStatus.HOLIDAY else AttendanceStatus.ABSENT
+        record.save()
+
+        self.assertFalse(self._rolled_up(employee_id))
+        edited = employee_month_attendance(employee_id, self.year, self.month)
+        self.assertEqual(edited, self._fresh(employee_id))
+
+        record.delete()
+        self.assertEqual(employee_month_attendance(employee_id, self.year, self.month)["records"], edited["records"] - 1)
+        self.assertEqual(employee_month_attendance(employee_id, self.year, self.month), self._fresh(employee_id))
+
+        # الكتابة الجماعية (bulk_update + sync_record_summaries) نفس الشي
+        other.total_hours += Decimal("1.50")
+        AttendanceRecord.objects.bulk_update([other], ["total_hours"])
+        sync_record_summaries([other])
+        self.assertFalse(self._rolled_up(other.employee_id))
+        self.assertEqual(employee_month_attendance(other.employee_id, self.year, self.month), self._fresh(other.employee_id))
+
+    def test_archived_rollup_is_kept(self):
+        archive_company(self.company.id, self.today, after_months=1)
+        employee_id = AttendanceMonthlyRollup.objects.filter(company=self.company, archived=True).values_list(
+            "employee_id", flat=True,
+        ).first()
+
+        AttendanceRecord.objects.create(employee_id=employee_id, date=self.start, status=AttendanceStatus.HOLIDAY)
+
+        self.assertTrue(self._rolled_up(employee_id))
+
+
+class PunchIdempotencyTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=2, months=1, seed=11)
+        self.company = self.synthetic.company
+        self.employee = Employee.objects.get(employee_code=f"{self.company.code}-000000")
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+
+    def _punch(self, action, key=""):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(
+            reverse(f"attendance-{action}"), {"employee_id": self.employee.id}, format="json", **headers,
+        )
+
+    def _today(self):
+        return AttendanceRecord.objects.filter(employee=self.employee, date=timezone.localdate())
+
+    def test_check_in_retry_with_same_key_is_replayed(self):
+        first = self._punch("check-in", key="device-1")
+        retry = self._punch("check-in", key="device-1")
+
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual((first.data["replayed"], retry.data["replayed"]), (False, True))
+        self.assertEqual(retry.data["attendance_id"], first.data["attendance_id"])
+        self.assertEqual(self._today().count(), 1)
+        self.assertEqual(AttendanceOutboxEvent.objects.filter(event_type="check_in").count(), 1)
+        self.assertEqual(company_day_counts(self.company.id, timezone.localdate())["total"], 1)
+
+    def test_second_check_in_without_the_key_is_rejected(self):
+        self._punch("check-in", key="device-1")
+
+        for key in ("", "device-2"):
+            with self.subTest(key=key):
+                response = self._punch("check-in", key=key)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["error"], "Already checked in today.")
+
+    def test_check_in_fills_nightly_absent_record(self):
+        AttendanceRecord.objects.create(
+            employee=self.employee, date=timezone.localdate(), status=AttendanceStatus.ABSENT,
+        )
+
+        response = self._punch("check-in", key="device-1")
+
+        self.assertEqual(response.status_code, 200)
+        record = self._today().get()
+        self.assertIsNotNone(record.check_in)
+        self.assertNotEqual(record.status, AttendanceStatus.ABSENT)
+        counts = company_day_counts(self.company.id, timezone.localdate())
+        self.assertEqual((counts["total"], counts["absent"]), (1, 0))
+
+    def test_check_out_retry_with_same_key_is_replayed(self):
+        self._punch("check-in")
+        first = self._punch("check-out", key="device-1")
+        retry = self._punch("check-out", key="device-1")
+        other = self._punch("check-out", key="device-2")
+
+        self.assertEqual((first.status_code, retry.status_code, other.status_code), (200, 200, 400))
+        self.assertTrue(retry.data["replayed"])
+        self.assertEqual(AttendanceOutboxEvent.objects.filter(event_type="check_out").count(), 1)
+
+    def test_check_out_without_check_in_is_rejected(self):
+        response = self._punch("check-out", key="device-1")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self._today().exists())
+
+
+class PunchIngestTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=2, months=1, seed=12)
+        self.company = self.synthetic.company
+        self.code = f"{self.company.code}-000000"
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+        self.url = reverse("attendance-punch-ingest")
+
+    def _post(self, body, content_type):
+        return self.client.post(self.url, data=body, content_type=content_type)
+
+    def _errors(self, response):
+        return [(e["line"], e["error"]) for e in response.data["errors"]]
+
+    def test_ndjson_reports_each_bad_line(self):
+        lines = [
+            {"employee_code": self.code, "timestamp": "2031-03-04T08:05:00", "direction": "in"},
+            "{not json",
+            {"timestamp": "2031-03-04T08:00:00", "direction": "in"},
+            {"employee_code": self.code, "timestamp": "2031-03-04T12:00:00", "direction": "sideways"},
+            {"employee_code": self.code, "timestamp": "yesterday", "direction": "out"},
+            {"employee_code": "NOPE-1", "timestamp": "2031-03-04T08:00:00", "direction": "in"},
+            {"employee_code": self.code, "timestamp": "2031-03-05T07:00:00", "direction": "out"},
+            {"employee_code": self.code, "timestamp": "2031-03-04T16:30:00", "direction": "check_out"},
+        ]
+        body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+        response = self._post(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["success"])
+        self.assertEqual((response.data["lines"], response.data["accepted"]), (8, 2))
+        self.assertEqual(response.data["records_created"], 1)
+        self.assertEqual([line for line, _ in self._errors(response)], [2, 3, 4, 5, 6, 7])
+        self.assertIn("Invalid JSON", self._errors(response)[0][1])
+        self.assertEqual(self._errors(response)[4][1], "Employee not found in your company.")
+        record = AttendanceRecord.objects.get(employee__employee_code=self.code, date=date(2031, 3, 4))
+        self.assertIsNotNone(record.check_in)
+        self.assertIsNotNone(record.check_out)
+
+    def test_csv_line_numbers_include_the_header(self):
+        body = (
+            "employee_code,timestamp,direction\n"
+            f"{self.code},2031-03-04T08:00:00,in\n"
+            "\n"
+            f"{self.code},not-a-date,out\n"
+            f"{self.code},2031-03-04T17:00:00,out\n"
+        )
+
+        response = self._post(body, "text/csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._errors(response), [(4, "timestamp must be an ISO 8601 datetime.")])
+        self.assertEqual(response.data["accepted"], 2)
+
+    def test_replaying_the_same_file_updates_instead_of_duplicating(self):
+        body = "\n".join(json.dumps(line) for line in (
+            {"employee_code": self.code, "timestamp": "2031-03-04T08:00:00", "direction": "in"},
+            {"employee_code": self.code, "timestamp": "2031-03-04T17:00:00", "direction": "out"},
+        ))
+
+        first = self._post(body, "application/x-ndjson")
+        again = self._post(body, "application/x-ndjson")
+
+        self.assertEqual((first.data["records_created"], again.data["records_updated"]), (1, 1))
+        self.assertEqual(
+            AttendanceRecord.objects.filter(employee__employee_code=self.code, date=date(2031, 3, 4)).count(), 1,
+        )
+        self.assertEqual(company_day_counts(self.company.id, date(2031, 3, 4))["total"], 1)
+
+    def test_body_must_be_utf8(self):
+        response = self._post("employee_code\n\xe9".encode("latin-1"), "text/csv")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_check_in_racing_the_batch_is_not_counted_twice(self):
+        day = date(2031, 3, 4)
+        employee = Employee.objects.get(employee_code=self.code)
+        load = ShiftIndex.load
+
+        def check_in_meanwhile(*args, **kwargs):
+            # بعد الـ select_for_update تبع الدفعة وقبل الـ INSERT
+            AttendanceRecord.objects.create(
+                employee=employee,
+                date=day,
+                check_in=timezone.make_aware(datetime(2031, 3, 4, 7, 55)),
+            )
+            return load(*args, **kwargs)
+
+        body = "\n".join(json.dumps(line) for line in (
+            {"employee_code": self.code, "timestamp": "2031-03-04T08:00:00", "direction": "in"},
+            {"employee_code": self.code, "timestamp": "2031-03-04T17:00:00", "direction": "out"},
+        ))
+        with mock.patch("hr.attendance.ingest.ShiftIndex.load", side_effect=check_in_meanwhile):
+            response = self._post(body, "application/x-ndjson")
+
+        self.assertEqual((response.data["records_created"], response.data["records_updated"]), (0, 1))
+        record = AttendanceRecord.objects.get(employee=employee, date=day)
+        self.assertEqual(timezone.localtime(record.check_in).time(), time(7, 55))
+        self.assertEqual(timezone.localtime(record.check_out).time(), time(17, 0))
+        counts = company_day_counts(self.company.id, day)
+        self.assertEqual(counts["total"], 1)
+        rebuild_attendance_summary(company_id=self.company.id, start=day, end=day)
+        self.assertEqual(company_day_counts(self.company.id, day), counts)
+
+
+class AttendanceLogPagingTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=7, months=1, seed=31)
+        records = AttendanceRecord.objects.filter(employee__company=self.synthetic.company)
+        self.day = records.order_by("date").values_list("date", flat=True).first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+
+    def _walk(self, limit, **params):
+        seen, cursor, pages = [], None, 0
+        while True:
+            query = {**params, "limit": limit}
+            if cursor:
+                query["cursor"] = cursor
+            response = self.client.get(reverse("attendance-logs"), query)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertLessEqual(len(data["records"]), limit)
+            seen += data["records"]
+            pages += 1
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return seen, pages
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(date(2031, 12, 31), 12345)), (date(2031, 12, 31), 12345))
+        for bad in ("", "!!!", encode_cursor(date(2031, 1, 1), 1)[:-2], "MjAzMS0wMS0wMTp4"):
+            with self.subTest(cursor=bad), self.assertRaises(InvalidCursor):
+                decode_cursor(bad)
+
+    def test_pages_split_inside_one_date(self):
+        expected = list(
+            AttendanceRecord.objects.filter(employee__company=self.synthetic.company, date=self.day)
+            .order_by("employee_id").values_list("id", flat=True)
+        )
+        self.assertEqual(len(expected), 7)
+
+        rows, pages = self._walk(3, date=self.day.isoformat())
+
+        self.assertEqual(pages, 3)
+        self.assertEqual([row["id"] for row in rows], expected)
+        self.assertIsInstance(rows[0]["total_hours"], str)
+
+    def test_pages_cross_date_boundaries(self):
+        end = self.day + timedelta(days=4)
+        expected = list(
+            AttendanceRecord.objects.filter(
+                employee__company=self.synthetic.company, date__gte=self.day, date__lte=end,
+            ).order_by("date", "employee_id").values_list("id", flat=True)
+        )
+
+        rows, _ = self._walk(4, **{"from": self.day.isoformat(), "to": end.isoformat()})
+
+        self.assertEqual([row["id"] for row in rows], expected)
+
+    def test_invalid_cursor_is_400(self):
+        response = self.client.get(reverse("attendance-logs"), {"date": self.day.isoformat(), "cursor": "!!!"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(AI_SERVICES={"attendance_event": "http://ai.test/attendance-events"})
+class AttendanceOutboxTests(TestCase):
+    def setUp(self):
+        self.events = [enqueue_attendance_event("check_in", {"employee_id": n}) for n in range(3)]
+
+    def _session(self, error=None):
+        session = mock.Mock()
+        if error is None:
+            session.post.return_value = mock.Mock()
+        else:
+            session.post.side_effect = error
+        return session
+
+    def test_leased_events_are_not_claimed_twice(self):
+        first = claim_outbox_batch(worker_id="a")
+        self.assertEqual([e.id for e in first], [e.id for e in self.events])
+        self.assertEqual(claim_outbox_batch(worker_id="b"), [])
+
+        # dispatcher "a" مات: بعد الـ lease بيرجعوا لغيره
+        AttendanceOutboxEvent.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_outbox_batch(worker_id="b")), 3)
+
+    def test_delivered_events_are_marked(self):
+        session = self._session()
+
+        result = dispatch_outbox_batch(session=session)
+
+        self.assertEqual(result, {"claimed": 3, "delivered": 3, "retried": 0, "dead": 0})
+        self.assertEqual(session.post.call_args.args[0], "http://ai.test/attendance-events")
+        self.assertFalse(AttendanceOutboxEvent.objects.exclude(status=OutboxStatus.DELIVERED).exists())
+        self.assertFalse(AttendanceOutboxEvent.objects.filter(delivered_at__isnull=True).exists())
+
+    def test_failed_events_back_off(self):
+        before = timezone.now()
+
+        result = dispatch_outbox_batch(session=self._session(requests.ConnectionError("ai down")))
+
+        self.assertEqual(result["retried"], 3)
+        for event in AttendanceOutboxEvent.objects.all():
+            self.assertEqual((event.status, event.attempts, event.last_error), (OutboxStatus.PENDING, 1, "ai down"))
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=OUTBOX_BACKOFF_BASE_SECONDS))
+        self.assertEqual(dispatch_outbox_batch(session=self._session())["claimed"], 0)
+
+    def test_last_attempt_goes_to_dead_letter_and_can_be_requeued(self):
+        AttendanceOutboxEvent.objects.update(attempts=OUTBOX_MAX_ATTEMPTS - 1)
+
+        result = dispatch_outbox_batch(session=self._session(requests.Timeout("slow")))
+
+        self.assertEqual(result["dead"], 3)
+        dead = AttendanceOutboxEvent.objects.filter(status=OutboxStatus.DEAD)
+        self.assertEqual(dead.count(), 3)
+
+        self.assertEqual(requeue_dead_events(AttendanceOutboxEvent.objects.all()), 3)
+        self.assertEqual(dispatch_outbox_batch(session=self._session())["delivered"], 3)
+
+    @override_settings(AI_SERVICES={})
+    def test_requires_a_configured_endpoint(self):
+        with self.assertRaises(RuntimeError):
+            dispatch_outbox_batch(session=self._session())
+        self.assertFalse(AttendanceOutboxEvent.objects.filter(claimed_until__isnull=False).exists())
+
+
+def _sse(chunk) -> tuple[str, dict]:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+class AttendancePresenceStreamTests(TransactionTestCase):
+    """
+    الـ stream بيعتمد على on_commit (النشر بعد الـ commit)، فـ TransactionTestCase مش TestCase.
+    """
+
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=6, months=1, seed=10, code="PRS")
+        staff = list(
+            Employee.objects.select_related("user")
+            .filter(company=self.synthetic.company, employee_code__startswith="PRS-0")
+            .order_by("employee_code")
+        )
+        self.manager = staff[0]
+        self.manager.user.role = "manager"
+        self.manager.user.save(update_fields=["role"])
+        self.team = staff[1:3]
+        Employee.objects.filter(pk__in=[e.pk for e in self.team]).update(manager=self.manager)
+        self.outsider = staff[4]
+        self.url = reverse("attendance-presence-stream")
+
+    def _headers(self, user):
+        return {"Authorization": f"Bearer {AccessToken.for_user(user)}", "Accept": "text/event-stream"}
+
+    async def _open(self, user):
+        headers = await sync_to_async(self._headers)(user)
+        response = await AsyncClient().get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        return stream
+
+    async def _next(self, stream, timeout=2):
+        return _sse(await asyncio.wait_for(anext(stream), timeout))
+
+    def test_requires_asgi(self):
+        client = APIClient()
+        client.force_authenticate(self.synthetic.hr_user)
+
+        response = client.get(self.url)
+
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(broker.subscribers(self.synthetic.company.id))
+
+    async def test_manager_only_sees_direct_reports(self):
+        company_id = self.synthetic.company.id
+        stream = await self._open(self.manager.user)
+        try:
+            event, snapshot = await self._next(stream)
+            self.assertEqual((event, snapshot["scope"], snapshot["arrived"]), ("snapshot", "team", []))
+
+            await sync_to_async(record_check_in)(self.outsider.id, company_id)
+            await sync_to_async(record_check_in)(self.team[0].id, company_id)
+
+            event, data = await self._next(stream)
+            self.assertEqual((event, data["employee_id"]), ("check_in", self.team[0].id))
+            self.assertEqual(data["counters"]["total"], 1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await self._next(stream, timeout=0.3)
+        finally:
+            await stream.aclose()
+        self.assertFalse(broker.subscribers(company_id))
+
+    async def test_company_stream_delivers_events_with_counters(self):
+        company_id = self.synthetic.company.id
+        stream = await self._open(self.synthetic.hr_user)
+        try:
+            event, snapshot = await self._next(stream)
+            self.assertEqual((event, snapshot["scope"]), ("snapshot", "company"))
+
+            await sync_to_async(record_check_in)(self.outsider.id, company_id, key="k-1")
+            replay = await sync_to_async(record_check_in)(self.outsider.id, company_id, key="k-1")
+            await sync_to_async(record_check_out)(self.outsider.id, company_id)
+
+            check_in = await self._next(stream)
+            check_out = await self._next(stream)
+            self.assertTrue(replay.replayed)
+            self.assertEqual([check_in[0], check_out[0]], ["check_in", "check_out"])
+            counts = await sync_to_async(company_day_counts)(company_id, timezone.localdate())
+            self.assertEqual(check_out[1]["counters"], counts)
+        finally:
+            await stream.aclose()
+
+    async def test_new_snapshot_after_midnight(self):
+        today = timezone.localdate()
+        dates = iter([today, today + timedelta(days=1)])
+        with mock.patch("hr.attendance.presence.PRESENCE_HEARTBEAT_SECONDS", 0.05), \
+                mock.patch("hr.attendance.presence.timezone.localdate", side_effect=lambda: next(dates, today + timedelta(days=1))):
+            stream = iter_presence_events(self.synthetic.company.id, {e.id for e in self.team})
+            try:
+                await anext(stream)  # retry
+                first = _sse((await anext(stream)).encode())
+                second = _sse((await anext(stream)).encode())
+                self.assertEqual(await anext(stream), ": ping\n\n")
+            finally:
+                await stream.aclose()
+
+        self.assertEqual(first[1]["date"], today.isoformat())
+        self.assertEqual(second[0], "snapshot")
+        self.assertEqual(second[1]["date"], (today + timedelta(days=1)).isoformat())
+
+
+class PayrollRunTransitionTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=3, months=1, seed=13)
+        year, month = self.synthetic.periods[-1]
+        self.run = ensure_monthly_run(self.synthetic.company, year, month)
+        generate_payroll_items(self.run)
+        self.employee = PayrollItem.objects.filter(payroll_run=self.run).values_list("employee_id", flat=True).first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+
+    def _transition(self, action):
+        response = self.client.post(reverse(f"payroll-run-{action}", args=[self.run.pk]))
+        self.run.refresh_from_db()
+        return response
+
+    def test_approve_is_blocked_while_employees_are_dirty(self):
+        mark_payroll_dirty(self.employee, self.run.period_start, self.run.period_start, reason="test")
+
+        response = self._transition("approve")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.run.status, PayrollRunStatus.DRAFT)
+
+        recompute_dirty_payroll_items(self.run)
+        self.assertEqual(self._transition("approve").status_code, 200)
+        self.assertEqual(self.run.status, PayrollRunStatus.APPROVED)
+
+    def test_approve_is_blocked_while_a_job_is_active(self):
+        enqueue_payroll_job(self.run)
+
+        self.assertEqual(self._transition("approve").status_code, 409)
+        self.assertEqual(self.run.status, PayrollRunStatus.DRAFT)
+
+    def test_states_cannot_be_skipped(self):
+        self.assertEqual(self._transition("pay").status_code, 409)
+        self.assertEqual(self.run.status, PayrollRunStatus.DRAFT)
+
+    def test_paying_flips_every_payslip(self):
+        for action in ("approve", "post", "pay"):
+            self.assertEqual(self._transition(action).status_code, 200, action)
+
+        self.assertEqual(self.run.status, PayrollRunStatus.PAID)
+        statuses = set(Payslip.objects.filter(payroll_run=self.run).values_list("status", flat=True))
+        self.assertEqual(statuses, {PayslipStatus.PAID})
+
+
+class PayrollBreakdownReportTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=6, months=2, seed=43)
+        self.company = self.synthetic.company
+        self.year = self.synthetic.periods[0][0]
+        for y, m in self.synthetic.periods:
+            generate_payroll_items(ensure_monthly_run(self.company, y, m), workers=1)
+        self.items = list(PayrollItem.objects.filter(payroll_run__company=self.company).select_related("payroll_run"))
+
+    def test_typed_columns_follow_the_breakdown(self):
+        for item in self.items:
+            for field_name, key in PAYROLL_BREAKDOWN_COLUMNS.items():
+                self.assertEqual(getattr(item, field_name), Decimal(str(item.breakdown.get(key) or 0)), field_name)
+            self.assertEqual(item.department_id, item.employee.department_id)
+
+        item = self.items[0]
+        item.breakdown = {**item.breakdown, "late_minutes": 47, "late_deduction": "12.34"}
+        item.fill_report_columns()
+        self.assertEqual((item.late_minutes, item.late_deduction), (47, Decimal("12.34")))
+        item.breakdown = {}
+        item.fill_report_columns()
+        self.assertEqual((item.late_minutes, item.overtime_hours), (0, Decimal("0")))
+
+    def _expected(self, key):
+        groups = {}
+        for item in self.items:
+            if item.payroll_run.year != self.year:
+                continue
+            group = groups.setdefault(key(item), {"employees": set(), **{f: 0 for f in REPORT_SUM_FIELDS}})
+            group["employees"].add(item.employee_id)
+            for f in REPORT_SUM_FIELDS:
+                group[f] += getattr(item, f)
+        return {
+            k: {"employees": len(g.pop("employees")), **{f: str(v) if isinstance(v, Decimal) else v for f, v in g.items()}}
+            for k, g in groups.items()
+        }
+
+    def test_report_sums_match_items_as_strings(self):
+        rows = payroll_breakdown_report(self.company, self.year, group_by="department")
+        self.assertEqual(
+            {row["department_id"]: {k: row[k] for k in ("employees", *REPORT_SUM_FIELDS)} for row in rows},
+            self._expected(lambda item: item.department_id),
+        )
+
+        rows = payroll_breakdown_report(self.company, self.year, group_by="month")
+        self.assertEqual(
+            {row["month"]: {k: row[k] for k in ("employees", *REPORT_SUM_FIELDS)} for row in rows},
+            self._expected(lambda item: item.payroll_run.month),
+        )
+        self.assertRegex(rows[0]["net_salary"], r"^-?\d+\.\d{2}$")
+        self.assertIsInstance(rows[0]["late_minutes"], int)
+
+    def test_view_renders_strings(self):
+        client = APIClient()
+        client.force_authenticate(self.synthetic.hr_user)
+        response = client.get(reverse("payroll-breakdown-report"), {"year": self.year, "group_by": "month"})
+
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)["results"]
+        self.assertEqual(results, payroll_breakdown_report(self.company, self.year, group_by="month"))
+
+
+class PayrollRunExportTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=3, months=1, seed=41)
+        self.run = ensure_monthly_run(self.synthetic.company, *self.synthetic.periods[-1])
+        generate_payroll_items(self.run, workers=1)
+        self.items = list(
+            PayrollItem.objects.filter(payroll_run=self.run)
+            .select_related("employee__user")
+            .order_by("employee__employee_code")
+        )
+        user = self.items[0].employee.user
+        user.first_name, user.last_name = "محمد", "الأحمد"
+        user.save(update_fields=["first_name", "last_name"])
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+
+    def _csv(self, layout):
+        response = self.client.get(reverse("payroll-run-export", args=[self.run.pk, "csv"]), {"layout": layout})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        text = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(text.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(text[1:])))
+
+    def test_register_rows_match_items(self):
+        header, *rows = self._csv("register")
+
+        self.assertEqual(header, export_headers("register"))
+        self.assertEqual(len(rows), len(self.items))
+        self.assertEqual(rows[0][1], "محمد الأحمد")
+        for row, item in zip(rows, self.items):
+            breakdown = item.breakdown or {}
+            self.assertEqual(row[0], item.employee.employee_code)
+            # Decimal بخانتين متل ما هو، مش float
+            self.assertEqual(
+                row[2:7],
+                [str(item.net_salary), item.currency, str(item.basic_salary), str(item.gross_salary), str(item.deductions)],
+            )
+            self.assertRegex(row[2], r"^-?\d+\.\d{2}$")
+            self.assertEqual(
+                row[7:],
+                [
+                    "" if breakdown.get(key) in (None, "") else str(Decimal(str(breakdown[key])))
+                    for _, key in EXPORT_BREAKDOWN_COLUMNS
+                ],
+            )
+
+    def test_bank_layout_has_four_columns(self):
+        header, *rows = self._csv("bank")
+
+        self.assertEqual(header, ["Employee code", "Employee name", "Net salary", "Currency"])
+        self.assertEqual(rows[0][:2], [self.items[0].employee.employee_code, "محمد الأحمد"])
+        self.assertEqual(
+            [row[2:] for row in rows],
+            [[str(item.net_salary), item.currency] for item in self.items],
+        )
+
+    def test_unknown_layout_is_400(self):
+        response = self.client.get(reverse("payroll-run-export", args=[self.run.pk, "csv"]), {"layout": "ledger"})
+        self.assertEqual(response.status_code, 400)
+
+
+class PayrollRunDiffTests(TestCase):
+    def setUp(self):
+        self.synthetic = build_synthetic_company(employees=5, months=2, seed=29)
+        company = self.synthetic.company
+        self.base, self.target = [ensure_monthly_run(company, y, m) for y, m in self.synthetic.periods]
+        generate_payroll_items(self.base, workers=1)
+        generate_payroll_items(self.target, workers=1)
+
+        # الـ target نسخة عن الـ base، وبعدين منغيّر موظف ومنشيل واحد من كل دورة
+        for item in PayrollItem.objects.filter(payroll_run=self.base):
+            PayrollItem.objects.filter(payroll_run=self.target, employee_id=item.employee_id).update(
+                basic_salary=item.basic_salary,
+                overtime_pay=item.overtime_pay,
+                deductions=item.deductions,
+                net_salary=item.net_salary,
+            )
+        employees = list(
+            PayrollItem.objects.filter(payroll_run=self.base)
+            .order_by("employee__employee_code")
+            .values_list("employee_id", flat=True)
+        )
+        self.changed, self.left, self.joined = employees[0], employees[1], employees[2]
+        PayrollItem.objects.filter(payroll_run=self.target, employee_id=self.changed).update(
+            net_salary=F("net_salary") + Decimal("25.50"),
+        )
+        PayrollItem.objects.filter(payroll_run=self.target, employee_id=self.left).delete()
+        PayrollItem.objects.filter(payroll_run=self.base, employee_id=self.joined).delete()
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.synthetic.hr_user)
+
+    def _statuses(self, **kwargs):
+        rows = payroll_run_diff_queryset(self.base, self.target, **kwargs)
+        return {row["employee_id"]: row["status"] for row in rows}
+
+    def test_classifies_joined_left_and_changed(self):
+        self.assertEqual(
+            self._statuses(),
+            {self.changed: "changed", self.left: "left", self.joined: "joined"},
+        )
+        self.assertEqual(self._statuses(status="changed"), {self.changed: "changed"})
+        self.assertEqual(self._statuses(status="left"), {self.left: "left"})
+        self.assertEqual(self._statuses(status="joined"), {self.joined: "joined"})
+
+        row = payroll_run_diff_queryset(self.base, self.target, status="changed").get()
+        self.assertEqual(Decimal(str(row["delta_net"])), Decimal("25.50"))
+        self.assertEqual(Decimal(str(row["delta_basic"])), Decimal("0"))
+
+    def test_threshold_filters_changed_but_keeps_joined_and_left(self):
+        self.assertIn(self.changed, self._statuses(threshold=Decimal("25.50")))
+        self.assertEqual(
+            self._statuses(threshold=Decimal("25.51")),
+            {self.left: "left", self.joined: "joined"},
+        )
+        # threshold=0 بيرجّع كمان الموظفين اللي ما تغيّروا
+        unchanged = self._statuses(threshold=Decimal("0"))
+        self.assertEqual(len(unchanged), 5)
+
+    def test_view_rejects_non_finite_and_negative_thresholds(self):
+        url = reverse("payroll-run-diff", args=[self.target.pk])
+        for threshold in ("NaN", "sNaN", "Infinity", "-Infinity", "-1", "abc"):
+            with self.subTest(threshold=threshold):
+                response = self.client.get(url, {"threshold": threshold})
+                self.assertEqual(response.status_code, 400)
+
+    def test_view_returns_money_as_strings(self):
+        url = reverse("payroll-run-diff", args=[self.target.pk])
+        response = self.client.get(url, {"status": "changed"})
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["base_run"]["id"], self.base.pk)
+        [row] = data["results"]
+        self.assertEqual(row["delta_net"], "25.50")
+        summary = payroll_run_diff_summary(self.base, self.target)
+        self.assertEqual(data["summary"]["net"], summary["net"])
+        self.assertIsInstance(data["summary"]["net"]["delta"], str)
+        self.assertEqual((data["summary"]["joined"], data["summary"]["left"]), (1, 1))
+
+
+class PayslipPdfTextTests(SimpleTestCase):
+    CONTEXT = {
+        "company": "شركة الأمل للتجارة (ش.م.ل)",
+        "run": "September",
+        "year": 2026,
+        "month": 9,
+        "period_start": "2026-09-01",
+        "period_end": "2026-09-30",
+        "employee_code": "E-001",
+        "employee_name": "محمد العلي",
+        "currency": "USD",
+        "basic_salary": "1000.00",
+        "allowances": "0.00",
+        "overtime_pay": "12.50",
+        "deductions": "3.00",
+        "gross_salary": "1012.50",
+        "net_salary": "1009.50",
+        "breakdown": [("Worked hours", "160.00")],
+    }
+
+    def test_shapes_joining_forms_and_lam_alef(self):
+        # م (أول) ح (وسط) م (وسط) د (آخر)
+        self.assertEqual(shape_arabic("محمد"), "\ufee3\ufea4\ufee4\ufeaa")
+        # ا ل ع ل ي: ألف معزولة، لام أول، عين وسط، لام وسط، ياء آخر
+        self.assertEqual(shape_arabic("العلي"), "\ufe8d\ufedf\ufecc\ufee0\ufef2")
+        self.assertEqual(shape_arabic("لا"), "\ufefb")
+        self.assertEqual(shape_arabic("Acme 12"), "Acme 12")
+
+    def test_visual_order(self):
+        self.assertEqual(visual_order("Employee: E-1 - بيت 12"), "Employee: E-1 - 12 تيب")
+        self.assertEqual(visual_order("بيت (ش.م)"), "(م.ش) تيب")
+        self.assertEqual(visual_order("a (بيت) b"), "a (تيب) b")
+        self.assertEqual(visual_order("رقم 1,000.50"), "1,000.50 مقر")
+
+    @unittest.skipUnless(os.path.exists(DEFAULT_PAYSLIP_FONTS["regular"]), "fonts-dejavu-core is not installed")
+    def test_arabic_names_use_embedded_font(self):
+        with override_settings(PAYSLIP_FONTS=DEFAULT_PAYSLIP_FONTS):
+            pdf = render_payslip_pdf(self.CONTEXT)
+            self.assertEqual(render_payslip_pdf(self.CONTEXT), pdf)
+        self.assertIn(b"/CIDFontType2", pdf)
+        self.assertIn(b"/FontFile2", pdf)
+        # ToUnicode بيرجّع الحروف الأصلية (م = 0645)
+        self.assertIn(b"<0645>", pdf)
+        self.assertEqual(prepare_text("E-001"), "E-001")
+
+    @override_settings(PAYSLIP_FONTS={"regular": "/nonexistent.ttf", "bold": "/nonexistent.ttf"})
+    def test_without_font_rejects_arabic_instead_of_question_marks(self):
+        latin = dict(self.CONTEXT, company="Acme", employee_name="John Smith")
+        self.assertIn(b"/Helvetica", render_payslip_pdf(latin))
+        with self.assertRaises(FontError):
+            render_payslip_pdf(self.CONTEXT)
+
+
+DERIVED_FIELDS = ("total_hours", "late_minutes", "early_leave_minutes", "overtime_hours", "is_overtime", "status")
+
+
+@unittest.skipIf(fill_derived_fields_batch is None, "numpy is not installed")
+class AttendanceBatchParityTests(SimpleTestCase):
+    """
+    fill_derived_fields_batch (NumPy) لازم يطلع نفس الحقول تبع AttendanceRecord.fill_derived_fields.
+    """
+
+    SHIFTS = [
+        Shift(code="DAY", start_time=time(8, 0), end_time=time(16, 0), allowed_late_minutes=10,
+              required_daily_hours=Decimal("8.00")),
+        Shift(code="EVE", start_time=time(14, 30), end_time=time(22, 0), allowed_late_minutes=0,
+              required_daily_hours=Decimal("7.33")),
+        Shift(code="NGT", start_time=time(22, 0), end_time=time(6, 0), is_overnight=True,
+              allowed_late_minutes=5, required_daily_hours=Decimal("7.50")),
+        Shift(code="OFF", start_time=time(9, 0), end_time=time(13, 0), allowed_late_minutes=0,
+              required_daily_hours=Decimal("0.00")),
+    ]
+
+    def _records(self, n=3000, seed=11):
+        rng = random.Random(seed)
+        tz = timezone.get_current_timezone()
+        records = []
+        for _ in range(n):
+            day = date(2026, 1, 1) + timedelta(days=rng.randrange(365))
+            shift = rng.choice(self.SHIFTS + [None])
+            status = rng.choice([AttendanceStatus.PRESENT] * 4 + [AttendanceStatus.REMOTE, AttendanceStatus.LATE])
+            rec = AttendanceRecord(date=day, shift=shift, status=status)
+
+            start = shift.start_time if shift else time(9, 0)
+            base = datetime.combine(day, start, tzinfo=tz)
+            if rng.random() < 0.9:
+                # ثواني و microseconds عشوائية + حالات على حدود التقريب بالظبط (18 ثانية = 0.005 ساعة)
+                offset = timedelta(minutes=rng.randrange(-40, 90), seconds=rng.choice([0, 18, 42, rng.randrange(60)]),
+                                   microseconds=rng.choice([0, 0, rng.randrange(1_000_000)]))
+                rec.check_in = (base + offset).astimezone(dt_timezone.utc)
+                if rng.random() < 0.85:
+                    worked = timedelta(minutes=rng.randrange(30, 14 * 60), seconds=rng.choice([0, 18, 54]),
+                                       microseconds=rng.choice([0, 500_000, rng.randrange(1_000_000)]))
+                    rec.check_out = rec.check_in + worked
+            records.append(rec)
+        return records
+
+    def _assert_parity(self):
+        records = self._records()
+        expected = []
+        for rec in self._records():
+            rec.fill_derived_fields()
+            expected.append(tuple(str(getattr(rec, f)) for f in DERIVED_FIELDS))
+
+        fill_derived_fields_batch(records)
+        for i, rec in enumerate(records):
+            self.assertEqual(tuple(str(getattr(rec, f)) for f in DERIVED_FIELDS), expected[i], i)
+
+    def test_matches_model_methods(self):
+        self._assert_parity()
+
+    @override_settings(TIME_ZONE="Asia/Beirut")
+    def test_matches_model_methods_with_dst_timezone(self):
+        self._assert_parity()
+
+    def test_empty_batch(self):
+        self.assertEqual(fill_derived_fields_batch([]), [])
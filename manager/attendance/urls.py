@@ -1,17 +1,23 @@
 from django.urls import path
 from .views import (
     AttendanceListView,
+    AttendanceLogExportView,
     AttendanceSummaryView,
     AttendanceEmployeesFilterView,
+    AttendancePresenceStreamView,
     CheckInView,
     CheckOutView,
+    AttendancePunchIngestView,
 )
 
 urlpatterns = [
     path("logs/", AttendanceListView.as_view(), name="attendance-logs"),
+    path("logs/export/<str:file_format>/", AttendanceLogExportView.as_view(), name="attendance-logs-export"),
     path("summary/", AttendanceSummaryView.as_view(), name="attendance-summary"),
     path("employees/", AttendanceEmployeesFilterView.as_view(), name="attendance-employees"),
+    path("presence/stream/", AttendancePresenceStreamView.as_view(), name="attendance-presence-stream"),
 
     path("check-in/", CheckInView.as_view(), name="attendance-check-in"),
     path("check-out/", CheckOutView.as_view(), name="attendance-check-out"),
+    path("punches/ingest/", AttendancePunchIngestView.as_view(), name="attendance-punch-ingest"),
 ]
\ No newline at end of file
@@ -4,18 +4,30 @@ from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.conf import settings
-import requests
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 
 from manager.attendance.serializers import (
-    AttendanceRecordSerializer,
     AttendanceSummarySerializer,
     AttendanceEmployeeSerializer,
 )
-from accounts.permissions import IsAdminOrHR
-from hr.attendance.models import AttendanceRecord, AttendanceStatus , EmployeeShiftAssignment
+from accounts.permissions import IsAdminHROrManager, IsAdminOrHR
+from hr.attendance.ingest import ingest_punches
+from hr.attendance.logs import (
+    LOG_MAX_PAGE_SIZE,
+    LOG_MAX_RANGE_DAYS,
+    LOG_PAGE_SIZE,
+    InvalidCursor,
+    iter_log_csv,
+    iter_log_ndjson,
+    log_page,
+    log_queryset,
+)
+from hr.attendance.presence import iter_presence_events
+from hr.attendance.punch import IDEMPOTENCY_KEY_MAX_LENGTH, PunchRejected, record_check_in, record_check_out
+from hr.attendance.summary import company_day_counts
 from hr.employees.models import Employee, EmployeeStatus
 from hr.org_structure.models import Company
 
@@ -38,50 +50,113 @@ class BaseCompanyMixin:
         return timezone.now().date()
 
 
-class AttendanceListView(BaseCompanyMixin, APIView):
+class AttendanceLogMixin(BaseCompanyMixin):
+    """
+    فلاتر سجل الحضور: date (يوم واحد، متل قبل) أو from / to، و employee و status.
+    """
+
+    def get_log_queryset(self, request, company):
+        """
+        بيرجع (queryset، start، end) أو Response 400.
+        """
+        if "from" in request.query_params or "to" in request.query_params:
+            start = self.get_date_from_query(request, "from")
+            end = self.get_date_from_query(request, "to")
+        else:
+            start = end = self.get_date_from_query(request, "date")
+        if start is None or end is None:
+            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+        if end < start:
+            return Response({"detail": "'to' must be on or after 'from'."}, status=400)
+        if (end - start).days >= LOG_MAX_RANGE_DAYS:
+            return Response({"detail": f"Date range is limited to {LOG_MAX_RANGE_DAYS} days."}, status=400)
+
+        employee_id = None
+        employee_param = request.query_params.get("employee")
+        if employee_param and employee_param != "all":
+            try:
+                employee_id = int(employee_param)
+            except ValueError:
+                return Response({"detail": "Invalid employee."}, status=400)
+
+        status_param = request.query_params.get("status")
+        if status_param == "all":
+            status_param = None
+
+        return log_queryset(company, start, end, employee_id=employee_id, status=status_param), start, end
+
+
+class AttendanceListView(AttendanceLogMixin, APIView):
+    """
+    GET logs/?date=YYYY-MM-DD أو ?from=...&to=...  (+ employee, status, limit, cursor)
+    مرتبين حسب (date, employee_id). next_cursor للصفحة الجاية (null = آخر صفحة).
+    انتبه: قبل الـ keyset كان الترتيب بنفس اليوم حسب اسم الموظف، هلق حسب employee_id
+    (الـ cursor لازمه ترتيب ثابت وفريد).
+    """
     permission_classes = [IsAuthenticated  ,IsAdminOrHR]
 
     def get(self, request):
         company = self.get_company(request)
         if not company:
             return Response(
-                {"date": timezone.now().date().isoformat(), "records": []}, status=200
+                {"date": timezone.now().date().isoformat(), "records": [], "next_cursor": None}, status=200
             )
 
-        date = self.get_date_from_query(request, "date")
-        if date is None:
-            return Response(
-                {"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400
-            )
+        result = self.get_log_queryset(request, company)
+        if isinstance(result, Response):
+            return result
+        qs, start, end = result
 
-        qs = AttendanceRecord.objects.filter(
-            employee__company=company,
-            date=date,
-        ).select_related(
-            "employee__user",
-            "employee__department",
-            "employee__job_title",
-            "shift",
-        )
+        try:
+            limit = int(request.query_params.get("limit", LOG_PAGE_SIZE))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+        limit = max(1, min(limit, LOG_MAX_PAGE_SIZE))
 
-        employee_param = request.query_params.get("employee")
+        try:
+            records, next_cursor = log_page(qs, request.query_params.get("cursor"), limit)
+        except InvalidCursor as e:
+            return Response({"detail": str(e)}, status=400)
 
-        if employee_param and employee_param != "all":
-            qs = qs.filter(employee_id=employee_param)
+        data = {
+            "date": start.isoformat(),
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "records": records,
+            "next_cursor": next_cursor,
+        }
+        return Response(data)
 
-        status_param = request.query_params.get("status")
-        if status_param and status_param != "all":
-            qs = qs.filter(status=status_param)
 
-        qs = qs.order_by("employee__user__first_name", "employee__user__last_name")
+class AttendanceLogExportView(AttendanceLogMixin, APIView):
+    """
+    GET logs/export/<csv|ndjson>/ بنفس فلاتر logs/، كل الفترة بـ streaming (بدون صفحات).
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
 
-        serializer = AttendanceRecordSerializer(qs, many=True)
+    CONTENT_TYPES = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson; charset=utf-8",
+    }
 
-        data = {
-            "date": date.isoformat(),
-            "records": serializer.data,
-        }
-        return Response(data)
+    def get(self, request, file_format):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=400)
+
+        if file_format not in self.CONTENT_TYPES:
+            return Response({"detail": "Format must be csv or ndjson."}, status=400)
+
+        result = self.get_log_queryset(request, company)
+        if isinstance(result, Response):
+            return result
+        qs, start, end = result
+
+        content = iter_log_csv(qs) if file_format == "csv" else iter_log_ndjson(qs)
+        filename = f"attendance-{company.code}-{start.isoformat()}-{end.isoformat()}.{file_format}"
+        response = StreamingHttpResponse(content, content_type=self.CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
 
 class AttendanceSummaryView(BaseCompanyMixin, APIView):
@@ -109,30 +184,71 @@ class AttendanceSummaryView(BaseCompanyMixin, APIView):
                 {"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400
             )
 
-        qs = AttendanceRecord.objects.filter(
-            employee__company=company,
-            date=date,
-        )
-
-        present = qs.filter(status=AttendanceStatus.PRESENT).count()
-        absent = qs.filter(status=AttendanceStatus.ABSENT).count()
-        on_leave = qs.filter(status=AttendanceStatus.ON_LEAVE).count()
-        remote = qs.filter(status=AttendanceStatus.REMOTE).count()
-        late = qs.filter(status=AttendanceStatus.LATE).count()
+        # ✅ من AttendanceDailySummary (row لكل قسم) بدل 5 COUNTs على الحضور
+        counts = company_day_counts(company, date)
 
         data = {
             "date": date,
-            "present": present,
-            "absent": absent,
-            "on_leave": on_leave,
-            "remote": remote,
-            "late": late,
+            "present": counts["present"],
+            "absent": counts["absent"],
+            "on_leave": counts["on_leave"],
+            "remote": counts["remote"],
+            "late": counts["late"],
         }
 
         serializer = AttendanceSummarySerializer(data)
         return Response(serializer.data)
 
 
+class EventStreamRenderer(BaseRenderer):
+    """
+    بس لحتى EventSource (Accept: text/event-stream) ما ياخد 406؛ الأخطاء بتطلع JSON.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+class AttendancePresenceStreamView(BaseCompanyMixin, APIView):
+    """
+    GET presence/stream/ — SSE للوحة الحضور: snapshot أول شي، بعدين check_in / check_out
+    مع العدّادات المحدّثة (hr/attendance/presence.py). admin / hr بيشوفوا الشركة،
+    والمدير فريقه بس. بده ERP.asgi (تحت WSGI الـ stream بيحجز thread للأبد).
+    الـ JWT بالـ Authorization header، فالـ client بيستعمل fetch-based SSE مش EventSource العادي.
+    """
+    permission_classes = [IsAuthenticated, IsAdminHROrManager]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            return Response({"detail": "Presence stream requires the ASGI server."}, status=501)
+
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=400)
+
+        employee_ids = None
+        if request.user.role == "manager":
+            manager_emp = getattr(request.user, "employee_profile", None)
+            if manager_emp is None:
+                return Response({"detail": "Manager has no employee profile."}, status=400)
+            employee_ids = set(
+                Employee.objects
+                .filter(company=company, manager=manager_emp, status=EmployeeStatus.ACTIVE)
+                .values_list("id", flat=True)
+            )
+
+        response = StreamingHttpResponse(
+            iter_presence_events(company.id, employee_ids),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class AttendanceEmployeesFilterView(BaseCompanyMixin, APIView):
     permission_classes = [IsAuthenticated , IsAdminOrHR]
 
@@ -153,123 +269,86 @@ class AttendanceEmployeesFilterView(BaseCompanyMixin, APIView):
         serializer = AttendanceEmployeeSerializer(qs, many=True)
         return Response(serializer.data)
 
-def get_employee_shift_for_date(employee, day):
-    return (
-        EmployeeShiftAssignment.objects
-        .filter(employee=employee, start_date__lte=day, end_date__gte=day)
-        .order_by("-is_primary", "-start_date")
-        .first()
-    )
-
-
-def notify_ai(payload: dict):
-    # مهم: ما لازم AI يوقف التسجيل
-    try:
-        requests.post(settings.AI_PUNCH_WEBHOOK_URL, json=payload, timeout=5)
-    except Exception:
-        pass
-
-
-class CheckInView(BaseCompanyMixin, APIView):
+class PunchViewMixin(BaseCompanyMixin):
+    """
+    check-in / check-out: بدون lock على Employee، والـ Idempotency-Key اختياري
+    (header أو idempotency_key بالـ body).
+    """
     permission_classes = [IsAuthenticated]  # الموظف نفسه لازم يقدر يبصّم
 
-    @transaction.atomic
-    def post(self, request):
-        company = self.get_company(request)
+    def get_company_id(self, request):
+        employee_profile = getattr(request.user, "employee_profile", None)
+        if employee_profile is not None:
+            return employee_profile.company_id
+        return Company.objects.values_list("id", flat=True).first()
+
+    def punch_params(self, request):
+        """
+        بيرجع (employee_id، company_id، key) أو Response للخطأ.
+        """
+        company_id = self.get_company_id(request)
 
         employee_id = request.data.get("employee_id")
         if not employee_id:
             return Response({"success": False, "error": "employee_id is required"}, status=400)
 
-        # ✅ تأكد الموظف موجود وبنفس الشركة
-        try:
-            employee = Employee.objects.select_for_update().get(id=employee_id, company=company)
-        except Employee.DoesNotExist:
-            return Response({"success": False, "error": "Employee not found in your company."}, status=404)
-
-        now = timezone.now()
-        day = timezone.localdate()
+        key = str(request.headers.get("Idempotency-Key") or request.data.get("idempotency_key") or "").strip()
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {"success": False, "error": f"Idempotency key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters."},
+                status=400,
+            )
 
-        record, created = AttendanceRecord.objects.select_for_update().get_or_create(
-            employee=employee,
-            date=day,
-            defaults={"check_in": now, "status": AttendanceStatus.PRESENT},
+        # ✅ تأكد الموظف موجود وبنفس الشركة
+        employee_id = (
+            Employee.objects
+            .filter(id=employee_id, company_id=company_id)
+            .order_by()
+            .values_list("id", flat=True)
+            .first()
         )
+        if employee_id is None:
+            return Response({"success": False, "error": "Employee not found in your company."}, status=404)
 
-        if not created and record.check_in:
-            return Response({"success": False, "error": "Already checked in today."}, status=400)
+        return employee_id, company_id, key
 
-        record.check_in = now
 
-        if not record.shift:
-            assign = get_employee_shift_for_date(employee, day)
-            if assign:
-                record.shift = assign.shift
+class CheckInView(PunchViewMixin, APIView):
 
-        record.status = AttendanceStatus.PRESENT
-        record.save()
+    def post(self, request):
+        params = self.punch_params(request)
+        if isinstance(params, Response):
+            return params
 
-        # ✅ AI بعد الحفظ
-        notify_ai({
-            "event": "check_in",
-            "employee_id": employee.id,
-            "attendance_id": record.id,
-            "timestamp": record.check_in.isoformat() if record.check_in else None,
-            "date": str(record.date),
-            "company_id": company.id if company else None,
-        })
+        try:
+            result = record_check_in(*params)
+        except PunchRejected as e:
+            return Response({"success": False, "error": e.message}, status=e.status)
 
+        record = result.record
         return Response({
             "success": True,
             "action": "check_in",
             "attendance_id": record.id,
             "check_in": record.check_in,
             "date": record.date,
+            "replayed": result.replayed,
         })
 
-class CheckOutView(BaseCompanyMixin, APIView):
-    permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
-    def post(self, request):
-        company = self.get_company(request)
+class CheckOutView(PunchViewMixin, APIView):
 
-        employee_id = request.data.get("employee_id")
-        if not employee_id:
-            return Response({"success": False, "error": "employee_id is required"}, status=400)
-
-        try:
-            employee = Employee.objects.select_for_update().get(id=employee_id, company=company)
-        except Employee.DoesNotExist:
-            return Response({"success": False, "error": "Employee not found in your company."}, status=404)
-
-        now = timezone.now()
-        day = timezone.localdate()
+    def post(self, request):
+        params = self.punch_params(request)
+        if isinstance(params, Response):
+            return params
 
         try:
-            record = AttendanceRecord.objects.select_for_update().get(employee=employee, date=day)
-        except AttendanceRecord.DoesNotExist:
-            return Response({"success": False, "error": "No check-in found for today."}, status=400)
-
-        if not record.check_in:
-            return Response({"success": False, "error": "No check-in found for today."}, status=400)
-
-        if record.check_out:
-            return Response({"success": False, "error": "Already checked out today."}, status=400)
-
-        record.check_out = now
-        record.save()
-
-        notify_ai({
-            "event": "check_out",
-            "employee_id": employee.id,
-            "attendance_id": record.id,
-            "timestamp": record.check_out.isoformat() if record.check_out else None,
-            "date": str(record.date),
-            "total_hours": float(record.total_hours),
-            "company_id": company.id if company else None,
-        })
+            result = record_check_out(*params)
+        except PunchRejected as e:
+            return Response({"success": False, "error": e.message}, status=e.status)
 
+        record = result.record
         return Response({
             "success": True,
             "action": "check_out",
@@ -277,4 +356,32 @@ class CheckOutView(BaseCompanyMixin, APIView):
             "check_out": record.check_out,
             "total_hours": record.total_hours,
             "date": record.date,
-        })
\ No newline at end of file
+            "replayed": result.replayed,
+        })
+
+
+class AttendancePunchIngestView(BaseCompanyMixin, APIView):
+    """
+    بصمات بالجملة من أجهزة البصمة: body = NDJSON (سطر JSON لكل بصمة) أو CSV بـ header
+    (employee_code,timestamp,direction). النوع من Content-Type (text/csv → CSV، غير هيك NDJSON).
+    بيرجع عدد السجلات اللي انعملت/تعدلت والأخطاء لكل سطر.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    def post(self, request):
+        company = self.get_company(request)
+        if not company:
+            return Response({"success": False, "error": "Company not found."}, status=400)
+
+        file_format = "csv" if "csv" in (request.content_type or "").lower() else "ndjson"
+
+        # منقرأ الـ body سطر سطر بدل request.data (ما في parser لـ NDJSON)
+        stream = request.stream
+        lines = iter(stream.readline, b"") if stream is not None else ()
+
+        try:
+            result = ingest_punches(company, lines, file_format=file_format)
+        except UnicodeDecodeError:
+            return Response({"success": False, "error": "Body must be UTF-8."}, status=400)
+
+        return Response(result.as_dict(), status=200)
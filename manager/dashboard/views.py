@@ -2,7 +2,7 @@ from datetime import timedelta, date
 from calendar import monthrange
 
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.db.models import Count, Sum, Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -10,6 +10,8 @@ from django.contrib.auth import get_user_model
 
 from hr.employees.models import Employee, EmployeeStatus
 from hr.attendance.models import AttendanceRecord, AttendanceStatus
+from hr.attendance.workdays import company_working_days
+from hr.attendance.summary import company_day_counts
 from hr.contracts.models import EmployeeContract, ContractStatus
 from hr.ess.models import (
     LeaveRequest,
@@ -52,12 +54,15 @@ def calculate_used_annual_leave(employee, year: int):
         end_date__gte=year_start,
     )
 
+    workdays = company_working_days(employee.company_id)
+
     used = 0.0
     for lr in qs:
-        s = max(lr.start_date, year_start)
-        e = min(lr.end_date, year_end)
-        days = (e - s).days + 1
-        used += 0.5 if lr.is_half_day else float(days)
+        days = workdays.count(max(lr.start_date, year_start), min(lr.end_date, year_end))
+        if lr.is_half_day:
+            used += 0.5 if days else 0.0
+        else:
+            used += float(days)
 
     return used
 
@@ -186,16 +191,7 @@ def build_dynamic_alerts(role, company, *, employee=None, team_qs=None):
             })
 
         since = today - timedelta(days=7)
-        anomalies = AttendanceRecord.objects.filter(
-            employee__company=company,
-            date__gte=since,
-            date__lte=today,
-        ).filter(
-            Q(status=AttendanceStatus.ABSENT) |
-            Q(late_minutes__gt=0) |
-            Q(early_leave_minutes__gt=0) |
-            Q(is_overtime=True)
-        ).count()
+        anomalies = company_day_counts(company, since, today)["anomalies"]
 
         if anomalies:
             alerts.append({
@@ -456,15 +452,32 @@ class MyTeamDashboardView(APIView):
         )
         tasks_awaiting_approval = pending_approvals_total
 
-        today_records = AttendanceRecord.objects.filter(
-            employee__in=team_qs, date=today
+        # ✅ الفريق مش قسم، فما منقدر ناخد من AttendanceDailySummary؛ بس كل الأرقام
+        # (اليوم / آخر 7 أيام / آخر 30 يوم لكل موظف) بـ GROUP BY وحدة بدل COUNT لكل موظف ولكل يوم
+        last_30 = today - timedelta(days=30)
+        team_records = AttendanceRecord.objects.filter(
+            employee__in=team_qs, date__gte=last_30, date__lte=today
+        ).order_by()
+        present_filter = Q(status__in=present_statuses)
+
+        per_employee = {
+            row["employee_id"]: row
+            for row in team_records.values("employee_id").annotate(
+                total=Count("id"), present=Count("id", filter=present_filter)
+            )
+        }
+        present_by_day = dict(
+            team_records.filter(date__gte=today - timedelta(days=6))
+            .values("date")
+            .annotate(present=Count("id", filter=present_filter))
+            .values_list("date", "present")
         )
-        present_count = today_records.filter(status__in=present_statuses).count()
+
+        present_count = present_by_day.get(today, 0)
         todays_attendance = (
             round((present_count / team_count) * 100, 1) if team_count > 0 else 0
         )
 
-        last_30 = today - timedelta(days=30)
         team_overview = []
         attendance_sum_for_avg = 0
 
@@ -472,13 +485,9 @@ class MyTeamDashboardView(APIView):
             name = emp.user.get_full_name() or emp.user.username
             role = emp.job_title.title_name if emp.job_title else emp.user.role
 
-            emp_records = AttendanceRecord.objects.filter(
-                employee=emp, date__gte=last_30, date__lte=today
-            )
-            total_days = emp_records.count()
-            emp_present_days = emp_records.filter(
-                status__in=present_statuses
-            ).count()
+            stats = per_employee.get(emp.id, {})
+            total_days = stats.get("total", 0)
+            emp_present_days = stats.get("present", 0)
 
             if total_days > 0:
                 attendance_pct = round((emp_present_days / total_days) * 100, 1)
@@ -505,10 +514,7 @@ class MyTeamDashboardView(APIView):
         performance_trend = []
         for i in range(6, -1, -1):
             day = today - timedelta(days=i)
-            day_records = AttendanceRecord.objects.filter(
-                employee__in=team_qs, date=day
-            )
-            day_present = day_records.filter(status__in=present_statuses).count()
+            day_present = present_by_day.get(day, 0)
             day_attendance = (
                 round((day_present / team_count) * 100, 1) if team_count > 0 else 0
             )
@@ -842,15 +848,15 @@ class UnifiedDashboardView(APIView):
 
             team_size = team_qs.count()
 
-            today_records = AttendanceRecord.objects.filter(employee__in=team_qs, date=today)
-
-            present_today = today_records.filter(
-                status__in=[AttendanceStatus.PRESENT, AttendanceStatus.REMOTE, AttendanceStatus.LATE]
-            ).count()
-
-            late_today = today_records.filter(
-                Q(status=AttendanceStatus.LATE) | Q(late_minutes__gt=0)
-            ).count()
+            today_counts = AttendanceRecord.objects.filter(employee__in=team_qs, date=today).aggregate(
+                present=Count(
+                    "id",
+                    filter=Q(status__in=[AttendanceStatus.PRESENT, AttendanceStatus.REMOTE, AttendanceStatus.LATE]),
+                ),
+                late=Count("id", filter=Q(status=AttendanceStatus.LATE) | Q(late_minutes__gt=0)),
+            )
+            present_today = today_counts["present"]
+            late_today = today_counts["late"]
 
             on_leave = LeaveRequest.objects.filter(
                 employee__in=team_qs,
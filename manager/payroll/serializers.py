@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from hr.payroll.models import PayrollRun
+from hr.payroll.models import PayrollRun, PayrollJob, PayrollJobStatus
 import calendar
 from datetime import date
 
@@ -46,4 +46,67 @@ class PayrollRunCreateSerializer(serializers.Serializer):
         last_day = calendar.monthrange(y, m)[1]
         attrs["period_start"] = date(y, m, 1)
         attrs["period_end"] = date(y, m, last_day)
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+class PayrollJobSerializer(serializers.ModelSerializer):
+    progress_percent = serializers.SerializerMethodField()
+    eta_seconds = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = PayrollJob
+        fields = [
+            "id",
+            "payroll_run",
+            "kind",
+            "status",
+            "total",
+            "processed",
+            "progress_percent",
+            "eta_seconds",
+            "errors",
+            "error_message",
+            "result",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress_percent(self, obj):
+        if not obj.total:
+            return 100.0 if obj.status == PayrollJobStatus.SUCCEEDED else 0.0
+        return round(obj.processed / obj.total * 100, 1)
+
+
+
+class PayrollVariantSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    overtime_multiplier = serializers.DecimalField(max_digits=6, decimal_places=2, required=False)
+    weekly_holidays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        required=False,
+    )
+    # {"<department_id>": "<percent>"}
+    department_raises = serializers.DictField(
+        child=serializers.DecimalField(max_digits=7, decimal_places=4),
+        required=False,
+    )
+
+    def validate_department_raises(self, value):
+        try:
+            return {int(k): v for k, v in value.items()}
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Department ids must be integers.")
+
+
+class PayrollSimulationSerializer(serializers.Serializer):
+    variants = PayrollVariantSerializer(many=True)
+    include_employees = serializers.BooleanField(required=False, default=True)
+
+    def validate_variants(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one variant is required.")
+        if len(value) > 20:
+            raise serializers.ValidationError("At most 20 variants per simulation.")
+        return value
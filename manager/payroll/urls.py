@@ -3,12 +3,27 @@ from .views import ( PayrollSummaryView,
 PayrollRunListView , 
 PayrollRunCreateView ,
 PayrollRunGenerateItemsView , 
+PayrollJobStatusView ,
+PayrollRunSimulateView ,
+PayrollRunExportView ,
+PayrollBreakdownReportView ,
+PayrollRunDiffView ,
+PayrollRunTransitionView ,
 )
+from hr.payroll.models import PayrollRunStatus
 
 urlpatterns = [
     path("summary/", PayrollSummaryView.as_view(), name="payroll-summary"),
     path("runs/", PayrollRunListView.as_view(), name="payroll-runs"),
     path("runs/run/", PayrollRunCreateView.as_view(), name="payroll-run-create"), 
     path("runs/<int:pk>/generate-items/", PayrollRunGenerateItemsView.as_view(), name="payroll-run-generate-items"), 
+    path("runs/<int:pk>/approve/", PayrollRunTransitionView.as_view(target_status=PayrollRunStatus.APPROVED), name="payroll-run-approve"),
+    path("runs/<int:pk>/post/", PayrollRunTransitionView.as_view(target_status=PayrollRunStatus.POSTED), name="payroll-run-post"),
+    path("runs/<int:pk>/pay/", PayrollRunTransitionView.as_view(target_status=PayrollRunStatus.PAID), name="payroll-run-pay"),
+    path("runs/<int:pk>/simulate/", PayrollRunSimulateView.as_view(), name="payroll-run-simulate"),
+    path("runs/<int:pk>/export/<str:file_format>/", PayrollRunExportView.as_view(), name="payroll-run-export"),
+    path("runs/<int:pk>/diff/", PayrollRunDiffView.as_view(), name="payroll-run-diff"),
+    path("reports/breakdown/", PayrollBreakdownReportView.as_view(), name="payroll-breakdown-report"),
+    path("jobs/<int:job_id>/", PayrollJobStatusView.as_view(), name="payroll-job-status"),
 
 ]
\ No newline at end of file
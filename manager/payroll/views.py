@@ -1,24 +1,44 @@
+from decimal import Decimal, InvalidOperation
+
 from django.db.models import Sum
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError
+from django.core.exceptions import ValidationError
 
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
 
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 
 from manager.payroll.serializers import (
     PayrollRunSerializer,
     PayrollSummarySerializer,
     PayrollRunCreateSerializer,
+    PayrollJobSerializer,
+    PayrollSimulationSerializer,
 )
 
-from hr.payroll.models import PayrollRun, PayrollRunStatus
+from hr.payroll.models import PayrollRun, PayrollRunStatus, PayrollJob, PayrollJobKind
 from hr.org_structure.models import Company
 from accounts.permissions import IsAdminOrHR
-from hr.employees.models import Employee, EmployeeStatus
-from hr.payroll.services import generate_payroll_items
+from hr.payroll.jobs import enqueue_payroll_job
+from hr.payroll.services import transition_payroll_run
+from hr.payroll.exports import EXPORT_LAYOUTS, iter_csv, iter_export_rows, iter_xlsx
+from hr.payroll.reports import (
+    DIFF_ORDERINGS,
+    DIFF_STATUS_CHANGED,
+    DIFF_STATUS_JOINED,
+    DIFF_STATUS_LEFT,
+    REPORT_GROUPS,
+    payroll_breakdown_report,
+    payroll_run_diff_queryset,
+    payroll_run_diff_summary,
+    previous_payroll_run,
+    quantize_diff_rows,
+)
 
 
 class BaseCompanyMixin:
@@ -138,9 +158,29 @@ class PayrollRunCreateView(BaseCompanyMixin, APIView):
 
 
 class PayrollRunGenerateItemsView(BaseCompanyMixin, APIView):
-   
+    """
+    GET  → عدد الموظفين الـ dirty + آخر job.
+    POST → بيحط PayrollJob بالـ queue وبيرجع فوراً (202).
+           {"only_dirty": true} لإعادة حساب الـ dirty بس.
+           إذا في job شغالة لنفس الـ run منرجعها نفسها (deduplicated).
+    """
     permission_classes = [IsAuthenticated, IsAdminOrHR]
 
+    def get(self, request, pk):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        run = get_object_or_404(PayrollRun, pk=pk, company=company)
+        last_job = run.jobs.order_by("-created_at").first()
+
+        return Response({
+            "run_id": run.id,
+            "status": run.status,
+            "dirty_employees": run.dirty_employees.count(),
+            "last_job": PayrollJobSerializer(last_job).data if last_job else None,
+        })
+
     def post(self, request, pk):
         company = self.get_company(request)
         if not company:
@@ -154,11 +194,229 @@ class PayrollRunGenerateItemsView(BaseCompanyMixin, APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        
-        employees_qs = Employee.objects.filter(company=company, status=EmployeeStatus.ACTIVE)
+        only_dirty = request.data.get("only_dirty", request.query_params.get("only_dirty", False))
+        kind = PayrollJobKind.DIRTY if str(only_dirty).lower() in ("1", "true", "yes") else PayrollJobKind.GENERATE
+
+        job, created = enqueue_payroll_job(run, kind=kind, user=request.user)
+
+        data = PayrollJobSerializer(job).data
+        data["deduplicated"] = not created
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class PayrollRunTransitionView(BaseCompanyMixin, APIView):
+    """
+    POST → بينقل الـ run للحالة target_status (approve / post / pay)
+    وبيحدّث status الـ payslips كلها بـ UPDATE وحدة.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+    target_status = None
+
+    def post(self, request, pk):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        run = get_object_or_404(PayrollRun, pk=pk, company=company)
+
+        try:
+            result = transition_payroll_run(run, self.target_status)
+        except ValidationError as e:
+            return Response({"detail": " ".join(e.messages)}, status=status.HTTP_409_CONFLICT)
+
+        data = PayrollRunSerializer(run).data
+        data["payslips_updated"] = result["payslips_updated"]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class PayrollJobStatusView(BaseCompanyMixin, APIView):
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    def get(self, request, job_id):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = get_object_or_404(PayrollJob, pk=job_id, payroll_run__company=company)
+        return Response(PayrollJobSerializer(job).data)
+
+
+
+class PayrollRunSimulateView(BaseCompanyMixin, APIView):
+    """
+    What-if: بيحسب variants (multiplier / weekly holidays / زيادة لقسم) على مدخلات الدورة
+    وبيرجع الفرق عن القواعد الحالية، بدون ما يكتب PayrollItems.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    def post(self, request, pk):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        run = get_object_or_404(PayrollRun, pk=pk, company=company)
+
+        serializer = PayrollSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            from hr.payroll.simulation import PayrollVariant, simulate_payroll_run
+        except ImportError:
+            return Response(
+                {"detail": "Payroll simulation requires numpy."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        variants = []
+        for v in data["variants"]:
+            kwargs = {"name": v["name"]}
+            if "overtime_multiplier" in v:
+                kwargs["overtime_multiplier"] = v["overtime_multiplier"]
+            if "weekly_holidays" in v:
+                kwargs["weekly_holidays"] = frozenset(v["weekly_holidays"])
+            if "department_raises" in v:
+                kwargs["department_raises"] = v["department_raises"]
+            variants.append(PayrollVariant(**kwargs))
+
+        result = simulate_payroll_run(run, variants, include_employees=data["include_employees"])
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class PayrollRunExportView(BaseCompanyMixin, APIView):
+    """
+    GET runs/<pk>/export/<csv|xlsx>/?layout=register|bank
+    register: كل الأعمدة مع الـ breakdown (للمحاسبة). bank: كود، اسم، صافي، عملة (للتحويل).
+    الملف بينبعت streaming، فما في حد لعدد الـ items.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    CONTENT_TYPES = {
+        "csv": "text/csv; charset=utf-8",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    def get(self, request, pk, file_format):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if file_format not in self.CONTENT_TYPES:
+            return Response({"detail": "Format must be csv or xlsx."}, status=status.HTTP_400_BAD_REQUEST)
+
+        layout = request.query_params.get("layout", "register")
+        if layout not in EXPORT_LAYOUTS:
+            return Response(
+                {"detail": f"Layout must be one of: {', '.join(EXPORT_LAYOUTS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        run = get_object_or_404(PayrollRun, pk=pk, company=company)
+
+        rows = iter_export_rows(run, layout=layout)
+        if file_format == "csv":
+            content = iter_csv(rows)
+        else:
+            content = iter_xlsx(rows, sheet_name=f"{run.year}-{run.month:02d}")
+
+        filename = f"payroll-{company.code}-{run.year}-{run.month:02d}-{layout}.{file_format}"
+        response = StreamingHttpResponse(content, content_type=self.CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class PayrollBreakdownReportView(BaseCompanyMixin, APIView):
+    """
+    GET reports/breakdown/?year=2026&month=3&group_by=department|month|department_month
+    مجاميع التأخير/الغياب/الأوفرتايم... من الأعمدة الـ typed على PayrollItem.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    def get(self, request):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            year = int(request.query_params.get("year", ""))
+            month = int(request.query_params["month"]) if request.query_params.get("month") else None
+        except ValueError:
+            return Response({"detail": "year and month must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_by = request.query_params.get("group_by", "department")
+        if group_by not in REPORT_GROUPS:
+            return Response(
+                {"detail": f"group_by must be one of: {', '.join(REPORT_GROUPS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = payroll_breakdown_report(company, year, month=month, group_by=group_by)
+        return Response({"year": year, "month": month, "group_by": group_by, "results": rows})
+
+
+class PayrollRunDiffPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class PayrollRunDiffView(BaseCompanyMixin, APIView):
+    """
+    GET runs/<pk>/diff/?base=<run_id>
+    بيقارن الدورة pk مع base (افتراضياً الدورة اللي قبلها لنفس الشركة): فرق basic/overtime/deductions/net
+    لكل موظف + joined/left.
+    query params: threshold (افتراضي 0.01 على |delta_net|)، status=joined|left|changed،
+    ordering (مثلاً -abs_delta_net، delta_net، employee_code)، page، page_size.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrHR]
+
+    def get(self, request, pk):
+        company = self.get_company(request)
+        if not company:
+            return Response({"detail": "Company not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        target = get_object_or_404(PayrollRun, pk=pk, company=company)
+
+        base_id = request.query_params.get("base")
+        if base_id:
+            if not base_id.isdigit():
+                return Response({"detail": "base must be a payroll run id."}, status=status.HTTP_400_BAD_REQUEST)
+            base = get_object_or_404(PayrollRun, pk=int(base_id), company=company)
+        else:
+            base = previous_payroll_run(target)
+            if base is None:
+                return Response({"detail": "No previous payroll run to compare with."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            threshold = Decimal(request.query_params.get("threshold", "0.01"))
+        except InvalidOperation:
+            threshold = None
+        # NaN / Infinity بيمرقوا من Decimal() وبيوقّعوا الـ query
+        if threshold is None or not threshold.is_finite() or threshold < 0:
+            return Response({"detail": "threshold must be a non-negative number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        diff_status = request.query_params.get("status") or None
+        if diff_status not in (None, DIFF_STATUS_JOINED, DIFF_STATUS_LEFT, DIFF_STATUS_CHANGED):
+            return Response({"detail": "status must be joined, left or changed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ordering = request.query_params.get("ordering", "-abs_delta_net")
+        if ordering.lstrip("-") not in DIFF_ORDERINGS:
+            return Response(
+                {"detail": f"ordering must be one of: {', '.join(sorted(DIFF_ORDERINGS))} (optionally prefixed with -)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        qs = payroll_run_diff_queryset(base, target, threshold=threshold, status=diff_status, ordering=ordering)
 
-       
-        with transaction.atomic():
-            result = generate_payroll_items(run, employees_qs=employees_qs)
+        paginator = PayrollRunDiffPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
 
-        return Response(result, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({
+            "base_run": PayrollRunSerializer(base).data,
+            "target_run": PayrollRunSerializer(target).data,
+            "summary": payroll_run_diff_summary(base, target),
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": quantize_diff_rows(page),
+        })